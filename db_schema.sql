@@ -102,7 +102,8 @@ BEGIN
     CREATE TABLE temu_xml_export (
         id INT IDENTITY(1,1) PRIMARY KEY,
         bestell_id NVARCHAR(50) NOT NULL,
-        xml_content NVARCHAR(MAX) NOT NULL,
+        xml_content NVARCHAR(MAX) NULL,            -- Alt-Zeilen (vor Komprimierung)
+        xml_content_gz VARBINARY(MAX) NULL,        -- GZIP(UTF-16LE), kompatibel zu COMPRESS()/DECOMPRESS()
         status NVARCHAR(50) DEFAULT 'pending',
         verarbeitet BIT DEFAULT 0,
         created_at DATETIME DEFAULT GETDATE(),
@@ -153,3 +154,194 @@ BEGIN
     CREATE INDEX idx_temu_inventory_needs_sync ON temu_inventory(needs_sync);
 END
 GO
+
+-- Lokaler Spiegel der JTL Kunden-E-Mails (eazybusiness.Kunde.lvKunde)
+-- Inkrementell per kKunde-Watermark befüllt, Lookups laufen als Index-Seek in TOCI
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'jtl_customer_mirror')
+BEGIN
+    CREATE TABLE jtl_customer_mirror (
+        kKunde INT NOT NULL PRIMARY KEY,
+        email_normalized NVARCHAR(255) NOT NULL,   -- LOWER(TRIM(cEMail))
+        cKundenNr NVARCHAR(30) NULL,
+        synced_at DATETIME NOT NULL DEFAULT GETDATE()
+    );
+    CREATE INDEX idx_jtl_customer_mirror_email ON jtl_customer_mirror(email_normalized, kKunde DESC) INCLUDE (cKundenNr);
+END
+GO
+
+-- Watermarks für inkrementelle Syncs (z.B. JTL Change Tracking Version für den Bestands-Feed)
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'sync_watermarks')
+BEGIN
+    CREATE TABLE sync_watermarks (
+        sync_name VARCHAR(100) NOT NULL PRIMARY KEY,
+        last_value BIGINT NOT NULL,
+        updated_at DATETIME2 NOT NULL DEFAULT GETDATE()
+    );
+END
+GO
+
+-- Transactional Outbox für TEMU Pushes (TEMU_PUSH_MODE=outbox)
+-- Intents werden in der Workflow-Transaktion eingereiht, der Dispatcher sendet sie mit Status pro Item
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'temu_push_outbox')
+BEGIN
+    CREATE TABLE temu_push_outbox (
+        id BIGINT PRIMARY KEY IDENTITY(1,1),
+        push_type VARCHAR(20) NOT NULL,              -- 'stock' | 'tracking'
+        ref_id INT NOT NULL,                         -- temu_inventory.id | temu_orders.id
+        idempotency_key VARCHAR(200) NOT NULL,
+        ref_key VARCHAR(100) NULL,                   -- Einheit fürs Ersetzen: temu_inventory.id | orderSn
+        payload NVARCHAR(MAX) NOT NULL,              -- JSON
+        status VARCHAR(20) NOT NULL DEFAULT 'pending', -- pending | processing | done | failed | dead | superseded
+        attempts INT NOT NULL DEFAULT 0,
+        next_attempt_at DATETIME2 NOT NULL DEFAULT GETDATE(),
+        locked_until DATETIME2 NULL,
+        last_error NVARCHAR(MAX) NULL,
+        created_at DATETIME2 NOT NULL DEFAULT GETDATE(),
+        updated_at DATETIME2 NOT NULL DEFAULT GETDATE(),
+        processed_at DATETIME2 NULL
+    );
+    CREATE INDEX idx_temu_push_outbox_claim ON temu_push_outbox(push_type, status, next_attempt_at);
+    CREATE INDEX idx_temu_push_outbox_ref ON temu_push_outbox(push_type, ref_id);
+END
+GO
+
+-- Idempotency Key nur unter offenen Intents eindeutig: ein früher gesendeter Wert (Bestand 5 -> 3 -> 5)
+-- kann erneut eingereiht werden. 'dead' blockiert nicht: der nächste Lauf reiht neu ein,
+-- POST /api/temu/outbox/redrive setzt tote Intents sofort zurück.
+IF EXISTS (SELECT * FROM sys.objects WHERE name = 'uq_temu_push_outbox_key')
+    ALTER TABLE temu_push_outbox DROP CONSTRAINT uq_temu_push_outbox_key;
+GO
+
+IF EXISTS (SELECT * FROM sys.indexes WHERE name = 'uq_temu_push_outbox_open_key' AND filter_definition LIKE '%dead%')
+    DROP INDEX uq_temu_push_outbox_open_key ON temu_push_outbox;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'uq_temu_push_outbox_open_key')
+    CREATE UNIQUE INDEX uq_temu_push_outbox_open_key ON temu_push_outbox(idempotency_key)
+        WHERE status IN ('pending', 'processing', 'failed');
+GO
+
+-- Migration: ref_key - neuere Intents ersetzen ältere pro Bestellartikel (orderSn), nicht pro Order
+IF COL_LENGTH('dbo.temu_push_outbox', 'ref_key') IS NULL
+BEGIN
+    ALTER TABLE temu_push_outbox ADD ref_key VARCHAR(100) NULL;
+    EXEC('UPDATE temu_push_outbox SET ref_key = CASE push_type
+              WHEN ''tracking'' THEN JSON_VALUE(payload, ''$.order_sn'')
+              ELSE CAST(ref_id AS VARCHAR(100)) END');
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_temu_push_outbox_ref_key')
+    CREATE INDEX idx_temu_push_outbox_ref_key ON temu_push_outbox(push_type, ref_key);
+GO
+
+-- Migration: komprimierter XML Inhalt in temu_xml_export (bestehende Installationen)
+-- Alt-Zeilen werden vom Order Workflow batchweise komprimiert (OrderRepository.compress_xml_exports).
+-- Platz wird erst nach ALTER INDEX ALL ON temu_xml_export REBUILD freigegeben.
+IF COL_LENGTH('dbo.temu_xml_export', 'xml_content_gz') IS NULL
+BEGIN
+    ALTER TABLE temu_xml_export ADD xml_content_gz VARBINARY(MAX) NULL;
+    ALTER TABLE temu_xml_export ALTER COLUMN xml_content NVARCHAR(MAX) NULL;
+END
+GO
+
+-- Hot/Cold Archivierung (ORDER_ARCHIVE_ENABLED=true, OrderArchiveService)
+-- Versendete + an TEMU gemeldete Orders älter als ORDER_ARCHIVE_AFTER_DAYS werden inkl. Items und
+-- XML-Exporten batchweise per DELETE ... OUTPUT deleted.<spalten> INTO archiv (<spalten>) verschoben
+-- (explizite Spaltenlisten, Spaltenreihenfolge im Archiv egal). Archiv-Tabellen haben dieselben Spalten
+-- (ohne IDENTITY/FK); neue Hot-Spalten ergänzt OrderArchiveRepository.ensure_archive_tables im Archiv.
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'temu_orders_archive')
+BEGIN
+    SELECT * INTO temu_orders_archive FROM temu_orders WHERE 1 = 0
+    UNION ALL SELECT * FROM temu_orders WHERE 1 = 0;   -- UNION ALL: ohne IDENTITY
+    ALTER TABLE temu_orders_archive ADD CONSTRAINT pk_temu_orders_archive PRIMARY KEY (id);
+    CREATE INDEX idx_temu_orders_archive_bestell_id ON temu_orders_archive(bestell_id);
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'temu_order_items_archive')
+BEGIN
+    SELECT * INTO temu_order_items_archive FROM temu_order_items WHERE 1 = 0
+    UNION ALL SELECT * FROM temu_order_items WHERE 1 = 0;
+    ALTER TABLE temu_order_items_archive ADD CONSTRAINT pk_temu_order_items_archive PRIMARY KEY (id);
+    CREATE INDEX idx_temu_order_items_archive_bestell_id ON temu_order_items_archive(bestell_id);
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'temu_xml_export_archive')
+BEGIN
+    SELECT * INTO temu_xml_export_archive FROM temu_xml_export WHERE 1 = 0
+    UNION ALL SELECT * FROM temu_xml_export WHERE 1 = 0;
+    ALTER TABLE temu_xml_export_archive ADD CONSTRAINT pk_temu_xml_export_archive PRIMARY KEY (id);
+    CREATE INDEX idx_temu_xml_export_archive_bestell_id ON temu_xml_export_archive(bestell_id);
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_temu_orders_archive_scan')
+    CREATE INDEX idx_temu_orders_archive_scan ON temu_orders(status, temu_gemeldet, updated_at);
+GO
+
+-- Union Views für seltene historische Lookups (archiviert = 0 Hot, 1 Archiv), explizite Spaltenlisten
+EXEC('CREATE OR ALTER VIEW temu_orders_all AS
+          SELECT id, bestell_id, bestellstatus, kaufdatum, name_empfaenger, vorname_empfaenger,
+                 nachname_empfaenger, telefon_empfaenger, email, strasse, adresszusatz,
+                 plz, ort, bundesland, land, land_iso, versandkosten,
+                 versanddienstleister, trackingnummer, versanddatum, status, xml_erstellt,
+                 temu_gemeldet, created_at, updated_at,
+                 CAST(0 AS BIT) AS archiviert FROM temu_orders
+          UNION ALL
+          SELECT id, bestell_id, bestellstatus, kaufdatum, name_empfaenger, vorname_empfaenger,
+                 nachname_empfaenger, telefon_empfaenger, email, strasse, adresszusatz,
+                 plz, ort, bundesland, land, land_iso, versandkosten,
+                 versanddienstleister, trackingnummer, versanddatum, status, xml_erstellt,
+                 temu_gemeldet, created_at, updated_at,
+                 CAST(1 AS BIT) AS archiviert FROM temu_orders_archive');
+GO
+
+EXEC('CREATE OR ALTER VIEW temu_order_items_all AS
+          SELECT id, order_id, bestell_id, bestellartikel_id, produktname, sku, sku_id, variation, menge,
+                 netto_einzelpreis, brutto_einzelpreis, gesamtpreis_netto,
+                 gesamtpreis_brutto, mwst_satz, created_at,
+                 CAST(0 AS BIT) AS archiviert FROM temu_order_items
+          UNION ALL
+          SELECT id, order_id, bestell_id, bestellartikel_id, produktname, sku, sku_id, variation, menge,
+                 netto_einzelpreis, brutto_einzelpreis, gesamtpreis_netto,
+                 gesamtpreis_brutto, mwst_satz, created_at,
+                 CAST(1 AS BIT) AS archiviert FROM temu_order_items_archive');
+GO
+
+EXEC('CREATE OR ALTER VIEW temu_xml_export_all AS
+          SELECT id, bestell_id, xml_content, xml_content_gz, status, verarbeitet, created_at, processed_at,
+                 CAST(0 AS BIT) AS archiviert FROM temu_xml_export
+          UNION ALL
+          SELECT id, bestell_id, xml_content, xml_content_gz, status, verarbeitet, created_at, processed_at,
+                 CAST(1 AS BIT) AS archiviert FROM temu_xml_export_archive');
+GO
+
+-- Eine Zeile pro Job-Lauf (LogService.end_job_capture) - Dashboard-Statistiken (/api/logs/stats)
+-- lesen nur diese Tabelle statt über scheduler_logs zu aggregieren. step_timings/counters als JSON.
+IF OBJECT_ID('dbo.job_runs', 'U') IS NULL
+BEGIN
+    CREATE TABLE job_runs (
+        run_id BIGINT PRIMARY KEY IDENTITY(1,1),
+        job_id VARCHAR(255) NOT NULL,
+        job_type VARCHAR(100) NOT NULL,
+        started_at DATETIME2 NOT NULL,
+        finished_at DATETIME2 NOT NULL,
+        duration_seconds FLOAT NULL,
+        status VARCHAR(20) NOT NULL,
+        orders_imported INT NOT NULL DEFAULT 0,
+        skus_pushed INT NOT NULL DEFAULT 0,
+        api_calls INT NOT NULL DEFAULT 0,
+        errors INT NOT NULL DEFAULT 0,
+        warnings INT NOT NULL DEFAULT 0,
+        counters NVARCHAR(MAX) NULL,
+        step_timings NVARCHAR(MAX) NULL,
+        error_text NVARCHAR(MAX) NULL,
+
+        INDEX idx_job_runs_type_started (job_type, started_at),
+        INDEX idx_job_runs_started (started_at),
+        INDEX idx_job_runs_job_id (job_id)
+    );
+END
+GO
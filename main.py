@@ -17,7 +17,7 @@ from typing import List
 from fastapi import FastAPI, WebSocket, UploadFile, File, HTTPException
 from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from datetime import datetime
@@ -67,6 +67,9 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         app_logger.error(f"Fehler beim Stoppen des Schedulers: {e}", exc_info=True)
 
+    # Gepufferte DB-Logs schreiben, bevor der Prozess endet
+    log_service.shutdown()
+
 # ═══════════════════════════════════════════════════════════════
 # FastAPI App
 # ═══════════════════════════════════════════════════════════════
@@ -87,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ═══════════════════════════════════════════════════════════════
@@ -171,9 +175,20 @@ async def toggle_job(job_id: str, enabled: bool):
 # ═══════════════════════════════════════════════════════════════
 
 @app.get("/api/logs")
-async def get_logs(job_id: str = None, level: str = None, limit: int = 100, offset: int = 0):
-    """Logs mit Filtern"""
-    return log_service.get_logs(job_id, level, limit, offset)
+async def get_logs(response: Response, job_id: str = None, level: str = None,
+                   limit: int = 100, cursor: str = None):
+    """
+    Logs mit Filtern (neueste zuerst).
+    Nächste Seite: Header X-Next-Cursor als ?cursor=... mitschicken (fehlt auf der letzten Seite).
+    """
+    try:
+        # get_logs_page flusht den Log-Writer (bis zu 5 s) -> im Thread, nicht auf dem Event Loop
+        logs, next_cursor = await asyncio.to_thread(log_service.get_logs_page, job_id, level, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return logs
 
 @app.get("/api/logs/stats")
 async def get_log_stats(job_id: str = None, days: int = 7):
@@ -187,7 +202,7 @@ async def export_logs(job_id: str = None, format: str = "json", days: int = 7):
     from io import StringIO
 
     try:
-        logs = log_service.get_logs(job_id=job_id, limit=10000)
+        logs = await asyncio.to_thread(log_service.get_logs, job_id=job_id, limit=10000)
 
         if format == "csv":
             output = StringIO()
@@ -212,9 +227,9 @@ async def export_logs(job_id: str = None, format: str = "json", days: int = 7):
 
 @app.post("/api/logs/cleanup")
 async def cleanup_logs(days: int = 30):
-    """Lösche alte Logs"""
+    """Lösche alte Logs (batchweise im Thread, blockiert weder Event Loop noch Logging)"""
     try:
-        deleted = log_service.cleanup_old_logs(days)
+        deleted = await asyncio.to_thread(log_service.cleanup_old_logs, days)
         return {"status": "ok", "deleted": deleted}
     except Exception as e:
         app_logger.error(f"Cleanup Logs Fehler: {e}", exc_info=True)
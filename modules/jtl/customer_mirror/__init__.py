@@ -0,0 +1,5 @@
+"""JTL Customer Mirror Module"""
+
+from .customer_mirror_service import CustomerMirrorService
+
+__all__ = ['CustomerMirrorService']
@@ -0,0 +1,136 @@
+"""Customer Mirror Service - Inkrementeller Sync JTL Kunden → TOCI Spiegel"""
+
+import time
+from typing import Dict, List, Optional
+
+from modules.shared.config.settings import CUSTOMER_MIRROR_FULL_SYNC_HOURS
+from modules.shared.database.repositories.common.sync_state_repository import SyncStateRepository
+from modules.shared.database.repositories.jtl_common.customer_mirror_repository import CustomerMirrorRepository
+from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
+from modules.shared.logging.log_service import log_service
+
+# sync_watermarks: Unix-Zeit des letzten vollständigen Voll-Abgleichs
+CUSTOMER_MIRROR_FULL_WATERMARK = 'jtl_customer_mirror_full'
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Normalisierte E-Mail als Lookup-Key (trim + lowercase)"""
+    return (email or '').strip().lower()
+
+
+class CustomerMirrorService:
+    """Business Logic - Hält jtl_customer_mirror mit JTL synchron und beantwortet Kunden-Lookups lokal"""
+
+    def __init__(self, mirror_repo: CustomerMirrorRepository = None,
+                 jtl_repo: JtlRepository = None):
+        """
+        Args:
+            mirror_repo: CustomerMirrorRepository für TOCI
+            jtl_repo: JtlRepository für JTL DB Access (nur für den Sync nötig)
+        """
+        self.mirror_repo = mirror_repo or CustomerMirrorRepository()
+        self.jtl_repo = jtl_repo
+        self.sync_state_repo = SyncStateRepository()
+
+    def sync(self, job_id: Optional[str] = None, full: bool = False, batch_size: int = 5000) -> Dict:
+        """
+        Spiegle JTL Kunden nach TOCI: inkrementell ab dem kKunde-Watermark (neue Kunden).
+        Der Voll-Abgleich (full=True) übernimmt geänderte E-Mails bestehender Kunden und entfernt
+        Kunden ohne E-Mail / gelöschte Kunden - nur über reconcile_if_due (Wartungsjob), nicht im Export.
+
+        Args:
+            job_id: Optional - für strukturiertes Logging
+            full: True = Voll-Abgleich ab kKunde 0, False = nur inkrementell
+            batch_size: Kunden pro JTL Abfrage
+
+        Returns:
+            dict mit synced/watermark/full/success - success False = Spiegel evtl. veraltet
+        """
+        if not self.jtl_repo:
+            return {'synced': 0, 'watermark': None, 'full': False, 'success': False}
+
+        self.mirror_repo.ensure_table_exists()
+
+        started_at = self.mirror_repo.get_server_time() if full else None
+        watermark = 0 if full else self.mirror_repo.get_watermark()
+        synced = 0
+        success = True
+
+        while True:
+            customers = self.jtl_repo.get_customers_after(watermark, limit=batch_size)
+            if customers is None:
+                success = False
+                break
+            if not customers:
+                break
+
+            rows = [
+                {
+                    "kKunde": c["kKunde"],
+                    "email_normalized": normalize_email(c["cEMail"]),
+                    "cKundenNr": c["cKundenNr"]
+                }
+                for c in customers
+                if normalize_email(c["cEMail"])
+            ]
+            upserted = self.mirror_repo.upsert_customers(rows)
+            if rows and not upserted:
+                # Nicht weiterlesen: sonst springt MAX(kKunde) über die fehlende Seite hinweg
+                success = False
+                break
+            synced += upserted
+            watermark = customers[-1]["kKunde"]
+
+            if len(customers) < batch_size:
+                break
+
+        if not success:
+            log_service.log(job_id, "customer_mirror", "WARNING",
+                            f"  ⚠ Kunden-Spiegel Sync fehlgeschlagen (kKunde > {watermark}) - Spiegel evtl. veraltet")
+            return {'synced': synced, 'watermark': watermark, 'full': full, 'success': False}
+
+        if full and started_at is not None:
+            removed = self.mirror_repo.delete_not_synced_since(started_at)
+            self._set_full_sync_done()
+            log_service.log(job_id, "customer_mirror", "INFO",
+                            f"  ✓ Kunden-Spiegel Voll-Abgleich: {synced} Kunden, {removed} entfernt")
+        elif synced:
+            log_service.log(job_id, "customer_mirror", "INFO",
+                            f"  ✓ Kunden-Spiegel: {synced} Kunden synchronisiert (kKunde ≤ {watermark})")
+
+        return {'synced': synced, 'watermark': watermark, 'full': full, 'success': True}
+
+    @classmethod
+    def reconcile_if_due(cls, job_id: Optional[str] = None) -> Dict:
+        """
+        Wartungsjob: Voll-Abgleich, wenn der letzte älter als CUSTOMER_MIRROR_FULL_SYNC_HOURS ist.
+        Läuft außerhalb der Workflow-Transaktionen auf eigenen Connections - jede MERGE-Seite
+        committet für sich, Export-Lookups werden nicht für die ganze Dauer blockiert.
+        """
+        service = cls(CustomerMirrorRepository(), JtlRepository())
+        if not service._full_sync_due():
+            return {'synced': 0, 'watermark': None, 'full': False, 'success': True}
+        return service.sync(job_id=job_id, full=True)
+
+    def _full_sync_due(self) -> bool:
+        """Letzter Voll-Abgleich älter als CUSTOMER_MIRROR_FULL_SYNC_HOURS (oder noch keiner)"""
+        if CUSTOMER_MIRROR_FULL_SYNC_HOURS <= 0:
+            return False
+        self.sync_state_repo.ensure_table_exists()
+        last_full = self.sync_state_repo.get_watermark(CUSTOMER_MIRROR_FULL_WATERMARK)
+        return last_full is None or time.time() - last_full >= CUSTOMER_MIRROR_FULL_SYNC_HOURS * 3600
+
+    def _set_full_sync_done(self) -> None:
+        self.sync_state_repo.set_watermark(CUSTOMER_MIRROR_FULL_WATERMARK, int(time.time()))
+
+    def get_customer_numbers(self, emails: List[str]) -> Dict[str, str]:
+        """Hole Kundennummern für viele E-Mails aus dem Spiegel (Key = normalisierte E-Mail)"""
+        keys = [normalize_email(e) for e in emails if normalize_email(e)]
+        return self.mirror_repo.get_customer_numbers_by_emails(keys)
+
+    def get_customer_number(self, email: str) -> str:
+        """Hole Kundennummer für eine E-Mail aus dem Spiegel ('' wenn unbekannt)"""
+        key = normalize_email(email)
+        if not key:
+            return ''
+        return self.mirror_repo.get_customer_number_by_email(key) or ''
@@ -1,5 +1,6 @@
 """JTL XML Export Module"""
 
 from .xml_export_service import XmlExportService
+from .xml_archive import OrderXmlArchive
 
-__all__ = ['XmlExportService']
+__all__ = ['XmlExportService', 'OrderXmlArchive']
@@ -0,0 +1,143 @@
+"""XML Archive - Komprimiertes, rollierendes Archiv der Einzel-XMLs pro Bestellung"""
+
+import gzip
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from modules.shared.logging.log_service import log_service
+
+
+class OrderXmlArchive:
+    """
+    Archiv-Sink für Einzel-XMLs statt einer Datei pro Order.
+
+    Layout (Monats-Partitionen, Retention = Verzeichnis löschen):
+        <base_dir>/2026-10/temu_orders_20261019.xml.gz   Tages-Bundle, ein gzip-Member pro Export-Batch
+        <base_dir>/2026-10/index.jsonl                   eine Zeile pro Order: Bundle, Member-Offset/-Länge,
+                                                         Position der Order im entpackten Member
+    """
+
+    INDEX_FILE = 'index.jsonl'
+
+    # Ein Schreiber pro Prozess (Index und Bundle werden angehängt)
+    _write_lock = threading.Lock()
+
+    def __init__(self, base_dir: Path, retention_months: int = 24):
+        self.base_dir = Path(base_dir)
+        self.retention_months = retention_months
+
+    def append_batch(self, entries: Iterable[Tuple[str, bytes]], job_id: Optional[str] = None) -> int:
+        """
+        Hänge einen Batch als EIN gzip-Member an das heutige Bundle an.
+
+        Args:
+            entries: [(bestell_id, xml_bytes), ...]
+
+        Returns:
+            Anzahl archivierter Orders
+        """
+        entries = list(entries)
+        if not entries:
+            return 0
+
+        now = datetime.now()
+        partition = self.base_dir / now.strftime('%Y-%m')
+        bundle_name = f"temu_orders_{now.strftime('%Y%m%d')}.xml.gz"
+
+        payload = bytearray()
+        positions = []
+        for bestell_id, xml_bytes in entries:
+            positions.append((bestell_id, len(payload), len(xml_bytes)))
+            payload += xml_bytes
+        member = gzip.compress(bytes(payload))
+
+        with self._write_lock:
+            partition.mkdir(parents=True, exist_ok=True)
+            bundle_path = partition / bundle_name
+
+            with open(bundle_path, 'ab') as f:
+                offset = f.tell()
+                f.write(member)
+
+            archived_at = now.isoformat(timespec='seconds')
+            with open(partition / self.INDEX_FILE, 'a', encoding='utf-8') as f:
+                for bestell_id, start, size in positions:
+                    f.write(json.dumps({
+                        "bestell_id": bestell_id,
+                        "bundle": bundle_name,
+                        "offset": offset,
+                        "length": len(member),
+                        "start": start,
+                        "size": size,
+                        "archived_at": archived_at
+                    }) + "\n")
+
+        log_service.log(job_id, "xml_archive", "INFO",
+                        f"  ↳ {len(entries)} Einzel-XMLs archiviert: {bundle_path} "
+                        f"({len(payload) // 1024} KB → {len(member) // 1024} KB)")
+        return len(entries)
+
+    def fetch(self, bestell_id: str) -> Optional[bytes]:
+        """
+        Hole die zuletzt archivierte XML einer Bestellung (None wenn nicht im Archiv).
+        Sucht die Monats-Indizes vom neuesten zum ältesten.
+        """
+        if not self.base_dir.exists():
+            return None
+
+        for partition in sorted((p for p in self.base_dir.iterdir() if p.is_dir()), reverse=True):
+            entry = self._find_in_index(partition / self.INDEX_FILE, bestell_id)
+            if entry is None:
+                continue
+
+            with open(partition / entry["bundle"], 'rb') as f:
+                f.seek(entry["offset"])
+                member = f.read(entry["length"])
+            payload = gzip.decompress(member)
+            return payload[entry["start"]:entry["start"] + entry["size"]]
+
+        return None
+
+    def apply_retention(self, job_id: Optional[str] = None) -> int:
+        """Lösche Monats-Partitionen älter als retention_months. Returns: Anzahl gelöschter Partitionen"""
+        if not self.base_dir.exists() or self.retention_months <= 0:
+            return 0
+
+        now = datetime.now()
+        month_index = now.year * 12 + now.month - 1 - self.retention_months
+        cutoff = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+
+        removed = 0
+        for partition in self.base_dir.iterdir():
+            if partition.is_dir() and partition.name < cutoff:
+                try:
+                    shutil.rmtree(partition)
+                    removed += 1
+                except Exception as e:
+                    log_service.log(job_id, "xml_archive", "WARNING",
+                                    f"  ⚠ Archiv-Partition {partition.name} nicht gelöscht: {e}")
+
+        if removed:
+            log_service.log(job_id, "xml_archive", "INFO",
+                            f"  ✓ Archiv-Retention: {removed} Monats-Partitionen vor {cutoff} gelöscht")
+        return removed
+
+    def _find_in_index(self, index_path: Path, bestell_id: str) -> Optional[dict]:
+        """Letzter Index-Eintrag der Bestellung in einer Partition"""
+        if not index_path.exists():
+            return None
+
+        found = None
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Schneller Vorfilter ohne JSON-Parse
+                if bestell_id not in line:
+                    continue
+                entry = json.loads(line)
+                if entry.get("bestell_id") == bestell_id:
+                    found = entry
+        return found
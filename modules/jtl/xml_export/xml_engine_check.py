@@ -0,0 +1,133 @@
+"""
+XML Engine Check - Golden-File Vergleich Python-Generator vs. SQL Server FOR XML Engine
+
+Usage:
+    # 1) Golden Files mit dem Python-Generator schreiben (eine Datei pro Bestellung)
+    python -m modules.jtl.xml_export.xml_engine_check --write-golden data/temu/golden --limit 200
+
+    # 2) SQL Engine gegen die Golden Files prüfen (Exit-Code 1 bei Abweichungen)
+    python -m modules.jtl.xml_export.xml_engine_check --check data/temu/golden
+
+Verglichen werden die Bytes, die in die Sinks gehen (Deklaration, Einrückung, ISO-8859-1,
+<a/> vs. <a></a>): SQL Engine Ausgabe nach _parse_sql_xml + _serialize_xml gegen Golden File.
+"""
+
+import argparse
+import difflib
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from lxml import etree as ET
+
+from modules.shared.config.settings import JTL_WAEHRUNG, JTL_SPRACHE, JTL_K_BENUTZER, JTL_K_FIRMA
+from .xml_export_service import XmlExportService
+
+
+def write_golden(service: XmlExportService, golden_dir: Path, limit: int = 200) -> int:
+    """
+    Schreibe die Python-Generator Ausgabe der letzten `limit` Orders als Golden Files.
+
+    Returns:
+        Anzahl geschriebener Dateien
+    """
+    golden_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+
+    for status in ('importiert', 'xml_erstellt', 'versendet'):
+        orders = service.order_repo.find_by_status(status)[:limit - written]
+        service._prefetch_customer_numbers(orders)
+
+        for order in orders:
+            items = service.item_repo.find_by_order_id(order.id) or service.item_repo.find_by_bestell_id(order.bestell_id)
+            order_root = ET.Element('tBestellungen')
+            service._generate_order_xml(order, items, order_root)
+            (golden_dir / f"{order.bestell_id}.xml").write_bytes(service._serialize_xml(order_root))
+            written += 1
+
+        if written >= limit:
+            break
+
+    return written
+
+
+def check_golden(service: XmlExportService, golden_dir: Path) -> List[str]:
+    """
+    Rendere alle Bestellungen der Golden Files mit der SQL Engine und vergleiche byteweise.
+
+    Returns:
+        Liste der Abweichungen (leer = identisch)
+    """
+    golden_files = sorted(golden_dir.glob('*.xml'))
+    orders = {}
+    mismatches = []
+
+    for path in golden_files:
+        order = service.order_repo.find_by_bestell_id(path.stem)
+        if order is None:
+            mismatches.append(f"{path.stem}: Bestellung nicht (mehr) in temu_orders")
+            continue
+        orders[order.id] = (order, path)
+
+    rendered = service.order_repo.render_orders_xml(
+        list(orders.keys()),
+        k_firma=JTL_K_FIRMA, k_benutzer=JTL_K_BENUTZER,
+        sprache=JTL_SPRACHE, waehrung=JTL_WAEHRUNG
+    )
+
+    for order_id, (order, path) in orders.items():
+        xml_content = rendered.get(order_id)
+        if not xml_content:
+            mismatches.append(f"{order.bestell_id}: SQL Engine lieferte kein Dokument")
+            continue
+
+        expected = path.read_bytes()
+        try:
+            actual = service._serialize_xml(service._parse_sql_xml(xml_content))
+        except Exception as e:
+            mismatches.append(f"{order.bestell_id}: {e}")
+            continue
+        if expected != actual:
+            diff = _first_difference(expected, actual)
+            mismatches.append(f"{order.bestell_id}: {diff}")
+
+    return mismatches
+
+
+def _first_difference(expected: bytes, actual: bytes) -> str:
+    """Erste abweichende Zeile (eingerückte Ausgabe, ein Element pro Zeile) für die Ausgabe"""
+    expected_lines = expected.decode('ISO-8859-1').splitlines()
+    actual_lines = actual.decode('ISO-8859-1').splitlines()
+    for line in difflib.unified_diff(expected_lines, actual_lines, lineterm='', n=0):
+        if line.startswith(('-', '+')) and not line.startswith(('---', '+++')):
+            return line.strip()
+    return "Abweichung (Zeilenenden/Encoding)"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Golden-File Vergleich der XML Engines (Python vs. SQL)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--write-golden', type=Path, metavar='DIR', help="Golden Files mit dem Python-Generator schreiben")
+    group.add_argument('--check', type=Path, metavar='DIR', help="SQL Engine gegen Golden Files prüfen")
+    parser.add_argument('--limit', type=int, default=200, help="Anzahl Orders für --write-golden")
+    args = parser.parse_args(argv)
+
+    service = XmlExportService()
+
+    if args.write_golden:
+        count = write_golden(service, args.write_golden, args.limit)
+        print(f"✓ {count} Golden Files geschrieben: {args.write_golden}")
+        return 0
+
+    mismatches = check_golden(service, args.check)
+    for mismatch in mismatches:
+        print(f"✗ {mismatch}")
+    if mismatches:
+        print(f"✗ {len(mismatches)} Abweichungen")
+        return 1
+    print("✓ SQL Engine byte-identisch zum Python-Generator")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
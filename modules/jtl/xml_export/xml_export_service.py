@@ -1,33 +1,83 @@
 """XML Export Service - Business Logic für XML Generierung"""
 
-import xml.etree.ElementTree as ET
-from xml.dom import minidom
+import multiprocessing
+from lxml import etree as ET
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 
+from modules.shared.database import is_deadlock
 from modules.shared.database.repositories.temu.order_repository import OrderRepository
 from modules.shared.database.repositories.temu.order_item_repository import OrderItemRepository
 from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
+from modules.shared.database.repositories.jtl_common.customer_mirror_repository import CustomerMirrorRepository
+from modules.jtl.customer_mirror.customer_mirror_service import CustomerMirrorService, normalize_email
 from modules.shared.logging.log_service import log_service
 from modules.shared.config.settings import JTL_WAEHRUNG, JTL_SPRACHE, JTL_K_BENUTZER, JTL_K_FIRMA
-from modules.temu.services.config import XML_OUTPUT_PATH, TEMU_EXPORT_DIR
+from modules.temu.services.config import (
+    XML_OUTPUT_PATH, TEMU_EXPORT_DIR,
+    XML_ARCHIVE_MODE, XML_ARCHIVE_DIR, XML_ARCHIVE_RETENTION_MONTHS,
+    XML_EXPORT_PARALLEL_THRESHOLD, XML_EXPORT_WORKERS, XML_EXPORT_CHUNK_SIZE, XML_EXPORT_ENGINE
+)
+from .xml_stream_writer import XmlStreamWriter
+from .xml_archive import OrderXmlArchive
+from .xml_order_builder import build_order_xml, serialize_xml, render_orders, warm_up
+
+# Blatt-Elemente je Eltern-Element in der Reihenfolge des Python-Generators (_generate_order_xml)
+XML_LEAF_FIELDS = {
+    'tBestellung': ('cSprache', 'cWaehrung', 'cBestellNr', 'cExterneBestellNr', 'cVersandartName',
+                    'cVersandInfo', 'dVersandDatum', 'cTracking', 'dLieferDatum', 'cKommentar',
+                    'cBemerkung', 'dErstellt', 'cZahlungsartName', 'dBezahltDatum'),
+    'twarenkorbpos': ('cName', 'cArtNr', 'cBarcode', 'cEinheit', 'fPreisEinzelNetto', 'fPreis',
+                      'fMwSt', 'fAnzahl', 'cPosTyp', 'fRabatt'),
+    'tkunde': ('cKundenNr', 'cAnrede', 'cTitel', 'cVorname', 'cNachname', 'cFirma', 'cStrasse',
+               'cAdressZusatz', 'cPLZ', 'cOrt', 'cBundesland', 'cLand', 'cTel', 'cMobil', 'cFax',
+               'cMail', 'cUSTID', 'cWWW', 'cHerkunft', 'dErstellt'),
+    'tlieferadresse': ('cAnrede', 'cVorname', 'cNachname', 'cTitel', 'cFirma', 'cStrasse',
+                       'cAdressZusatz', 'cPLZ', 'cOrt', 'cBundesland', 'cLand', 'cTel', 'cMobil',
+                       'cFax', 'cMail'),
+    'tzahlungsinfo': ('cBankName', 'cBLZ', 'cKontoNr', 'cKartenNr', 'dGueltigkeit', 'cCVV',
+                      'cKartenTyp', 'cInhaber', 'cIBAN', 'cBIC'),
+}
+
+# Felder, deren .text der Python-Generator immer setzt (leer -> <x></x>); alle übrigen bleiben <x/>.
+# 'versandkosten' = twarenkorbpos mit cPosTyp versandkosten (ohne cArtNr)
+XML_TEXT_FIELDS = {
+    'tBestellung': {'cSprache', 'cWaehrung', 'cExterneBestellNr', 'cVersandartName',
+                    'dVersandDatum', 'cTracking', 'dErstellt', 'cZahlungsartName'},
+    'twarenkorbpos': {'cName', 'cArtNr', 'fPreisEinzelNetto', 'fPreis', 'fMwSt', 'fAnzahl',
+                      'cPosTyp', 'fRabatt'},
+    'versandkosten': {'cName', 'fPreisEinzelNetto', 'fPreis', 'fMwSt', 'fAnzahl', 'cPosTyp', 'fRabatt'},
+    'tkunde': {'cKundenNr', 'cVorname', 'cNachname', 'cStrasse', 'cAdressZusatz', 'cPLZ', 'cOrt',
+               'cBundesland', 'cLand', 'cTel', 'cMail', 'cHerkunft', 'dErstellt'},
+    'tlieferadresse': {'cVorname', 'cNachname', 'cStrasse', 'cAdressZusatz', 'cPLZ', 'cOrt',
+                       'cBundesland', 'cLand', 'cTel', 'cMail'},
+    'tzahlungsinfo': set(),
+}
 
 class XmlExportService:
     """Business Logic - XML Generierung für JTL"""
 
     def __init__(self, order_repo: OrderRepository = None,
                  item_repo: OrderItemRepository = None,
-                 jtl_repo: JtlRepository = None):
+                 jtl_repo: JtlRepository = None,
+                 customer_repo: CustomerMirrorRepository = None,
+                 render_pool: Optional[ProcessPoolExecutor] = None):
         """
         Args:
             order_repo: OrderRepository für TOCI
             item_repo: OrderItemRepository für TOCI
             jtl_repo: JtlRepository für JTL DB Access
+            customer_repo: CustomerMirrorRepository für Kunden-Lookups in TOCI
+            render_pool: Optional vorab gestarteter Process Pool (siehe create_render_pool)
         """
         self.order_repo = order_repo or OrderRepository()
         self.item_repo = item_repo or OrderItemRepository()
         self.jtl_repo = jtl_repo or JtlRepository()
+        self.customer_mirror = CustomerMirrorService(customer_repo, self.jtl_repo)
         self._customer_nr_cache = {}  # Cache Kundennummern pro Email
+        self._customer_mirror_stale = False  # letzter Spiegel-Sync fehlgeschlagen
+        self.render_pool = render_pool
 
     def export_to_xml(self, save_to_disk=True, import_to_jtl=True, save_to_db=True, job_id: Optional[str] = None) -> Dict:
         """
@@ -62,78 +112,58 @@ class XmlExportService:
                 log_service.log(job_id, "xml_export", "INFO",
                               f"  {len(orders)} Orders zum Exportieren gefunden")
 
-            # ===== Generate XML Root (für gesamt-export) =====
-            root = ET.Element('tBestellungen')
-            exported_count = 0
-            jtl_import_count = 0
-
-            # ===== Für jede Order: XML generieren =====
-            for order in orders:
-                try:
-                    # Hole Items für diese Order - versuche zuerst order_id, dann bestell_id
-                    items = self.item_repo.find_by_order_id(order.id)
-
-                    # Fallback: Wenn keine Items gefunden, versuche über bestell_id
-                    if not items:
-                        items = self.item_repo.find_by_bestell_id(order.bestell_id)
-                        if items:
-                            log_service.log(job_id, "xml_export", "WARNING",
-                                              f"  ⚠ {order.bestell_id}: Items via bestell_id gefunden (nicht over order_id)")
-
-                    # DEBUG: Logge Items
-                    log_service.log(job_id, "xml_export", "DEBUG",
-                                      f"  Order {order.bestell_id} (ID={order.id}): {len(items)} Items gefunden")
-
-                    # Generiere XML Element
-                    bestellung_elem = self._generate_order_xml(order, items, root)
-
-                    if bestellung_elem is not None:
-                        # ===== Step 0: Speichere Einzelne XML in TOCI DB =====
-                        if save_to_db:
-                            self._save_xml_to_db(order.bestell_id, bestellung_elem, job_id)
-
-                        # ===== Step 0b: Archiviere Einzel-XML in docs/exports =====
-                        if save_to_disk:
-                            self._archive_order_to_docs(order.bestell_id, bestellung_elem, job_id)
-
-                        # ===== Step 1: In JTL DB importieren =====
-                        if import_to_jtl and self.jtl_repo:
-                            jtl_success = self._import_to_jtl(order, bestellung_elem, job_id)
-                            if jtl_success:
-                                jtl_import_count += 1
-                                # Markiere Archiv-Eintrag als verarbeitet
-                                self.order_repo.mark_xml_export_processed(order.bestell_id)
-
-                        # ===== Step 2: Update Status in TOCI =====
-                        status_success = self._update_order_status(order.id, job_id)
-
-                        if status_success or not import_to_jtl:
-                            exported_count += 1
-
-                            log_service.log(job_id, "xml_export", "INFO",
-                                              f"  ✓ {order.bestell_id}: XML generiert")
-
-                        else:
-
-                            log_service.log(job_id, "xml_export", "WARNING",
-                                              f"  ⚠ {order.bestell_id}: Status Update fehlgeschlagen")
-                    else:
+            # ===== Kundennummern vorab aus lokalem Spiegel laden (statt JTL pro Order) =====
+            self._prefetch_customer_numbers(orders, job_id)
+
+            # ===== Gesamt-Export: jede tBestellung wird sofort in die Datei gestreamt =====
+            combined = self._open_combined_xml(job_id) if save_to_disk else None
+            combined_ok = False
+            try:
+                if XML_EXPORT_ENGINE == 'sql':
+                    generated = self._generate_batch_sql(orders, combined, job_id)
+                elif self._use_backlog_mode(orders):
+                    generated = self._generate_batch_parallel(orders, combined, job_id)
+                else:
+                    generated = self._generate_batch(orders, combined, job_id)
+                combined_ok = True
+            finally:
+                # ===== Step 3: Gesamt-XML abschließen (vor den Sinks, Orders sind vollständig geschrieben) =====
+                if combined:
+                    self._close_combined_xml(combined, combined_ok, job_id)
+
+
+            # ===== Phase 2: Sinks gebündelt schreiben =====
+            # Step 0: Einzel-XMLs in TOCI DB
+            if save_to_db:
+                self._save_xml_batch_to_db(generated, job_id)
+
+            # Step 0b: Einzel-XMLs archivieren
+            if save_to_disk:
+                self._archive_batch(generated, job_id)
 
-                        log_service.log(job_id, "xml_export", "WARNING",
-                                          f"  ⚠ {order.bestell_id}: XML Generation fehlgeschlagen")
+            # Step 1: In JTL DB importieren, danach Archiv-Einträge als verarbeitet markieren
+            jtl_imported = set()
+            if import_to_jtl and self.jtl_repo:
+                jtl_imported = self._import_batch_to_jtl(generated, job_id)
+                self.order_repo.mark_xml_exports_processed(list(jtl_imported))
+            jtl_import_count = len(jtl_imported)
 
-                except Exception as e:
-                    import traceback
-                    error_trace = traceback.format_exc()
+            # Step 2: Status in TOCI
+            exported_count = 0
+            if generated:
+                status_success = self._update_order_statuses([order.id for order, _, _ in generated], job_id)
 
-                    log_service.log(job_id, "xml_export", "ERROR",
-                                      f"  ✗ Fehler bei Order {order.bestell_id}: {str(e)}")
-                    log_service.log(job_id, "xml_export", "ERROR", error_trace)
+                for order, _, _ in generated:
+                    if status_success or not import_to_jtl:
+                        exported_count += 1
 
+                        log_service.log(job_id, "xml_export", "INFO",
+                                          f"  ✓ {order.bestell_id}: XML generiert", aggregate="xml_generated")
 
-            # ===== Step 3: Speichere komplette XML auf Festplatte =====
-            if save_to_disk:
-                self._save_xml_to_disk(root, job_id)
+                    else:
+
+                        log_service.log(job_id, "xml_export", "WARNING",
+                                          f"  ⚠ {order.bestell_id}: Status Update fehlgeschlagen")
 
 
             log_service.log(job_id, "xml_export", "INFO",
@@ -147,6 +177,8 @@ class XmlExportService:
             }
 
         except Exception as e:
+            if is_deadlock(e):
+                raise
             import traceback
             error_trace = traceback.format_exc()
 
@@ -157,6 +189,173 @@ class XmlExportService:
 
             return {'exported': 0, 'jtl_imported': 0, 'success': False}
 
+    def _generate_batch(self, orders: List, combined: Optional[XmlStreamWriter] = None,
+                        job_id: Optional[str] = None) -> List:
+        """
+        Phase 1: XML für alle Orders generieren und je Order einmal serialisieren.
+
+        Returns:
+            list: [(order, xml_bytes, xml_string), ...] für die gebündelten Sinks
+        """
+        generated = []
+        for order in orders:
+            try:
+                # Hole Items für diese Order - versuche zuerst order_id, dann bestell_id
+                items = self.item_repo.find_by_order_id(order.id)
+
+                # Fallback: Wenn keine Items gefunden, versuche über bestell_id
+                if not items:
+                    items = self.item_repo.find_by_bestell_id(order.bestell_id)
+                    if items:
+                        log_service.log(job_id, "xml_export", "WARNING",
+                                          f"  ⚠ {order.bestell_id}: Items via bestell_id gefunden (nicht over order_id)")
+
+                # DEBUG: Logge Items
+                log_service.log(job_id, "xml_export", "DEBUG",
+                                  f"  Order {order.bestell_id} (ID={order.id}): {len(items)} Items gefunden", aggregate="xml_items")
+
+                # Generiere XML Element (eigenes tBestellungen Root pro Order)
+                order_root = ET.Element('tBestellungen')
+                bestellung_elem = self._generate_order_xml(order, items, order_root)
+
+                if bestellung_elem is not None:
+                    # ===== Einmal serialisieren, Bytes für alle Sinks wiederverwenden =====
+                    xml_bytes = self._serialize_xml(order_root)
+                    generated.append((order, xml_bytes, xml_bytes.decode('ISO-8859-1')))
+
+                    # Gesamt-Datei: sofort schreiben, Element wird danach nicht mehr gehalten
+                    if combined:
+                        self._write_combined_xml(combined, bestellung_elem, job_id)
+                else:
+
+                    log_service.log(job_id, "xml_export", "WARNING",
+                                      f"  ⚠ {order.bestell_id}: XML Generation fehlgeschlagen")
+
+            except Exception as e:
+                if is_deadlock(e):
+                    raise
+                import traceback
+                error_trace = traceback.format_exc()
+
+                log_service.log(job_id, "xml_export", "ERROR",
+                                  f"  ✗ Fehler bei Order {order.bestell_id}: {str(e)}")
+                log_service.log(job_id, "xml_export", "ERROR", error_trace)
+
+        return generated
+
+    def _use_backlog_mode(self, orders: List) -> bool:
+        """Backlog-Modus nur bei großen Rückständen (Pool-Start lohnt sich erst dann)"""
+        return (XML_EXPORT_PARALLEL_THRESHOLD > 0
+                and XML_EXPORT_WORKERS > 1
+                and len(orders) >= XML_EXPORT_PARALLEL_THRESHOLD)
+
+    def _generate_batch_parallel(self, orders: List, combined: Optional[XmlStreamWriter] = None,
+                                 job_id: Optional[str] = None) -> List:
+        """
+        Backlog-Modus von _generate_batch: Items und Kundennummern werden gebündelt vorab geladen,
+        die XML-Dokumente in Chunks in einem Process Pool gebaut und serialisiert.
+        Reihenfolge der Orders bleibt erhalten; Ergebnis wie _generate_batch.
+        """
+        log_service.log(job_id, "xml_export", "INFO",
+                          f"  Backlog-Modus: {len(orders)} Orders auf {XML_EXPORT_WORKERS} Prozesse")
+
+        # ===== Items gebündelt laden (statt eine Query pro Order) =====
+        items_by_order = self.item_repo.find_by_order_ids([order.id for order in orders])
+
+        work = []
+        for order in orders:
+            items = items_by_order.get(order.id)
+            if not items:
+                items = self.item_repo.find_by_bestell_id(order.bestell_id)
+                if items:
+                    log_service.log(job_id, "xml_export", "WARNING",
+                                      f"  ⚠ {order.bestell_id}: Items via bestell_id gefunden (nicht over order_id)")
+            # Kundennummer im Hauptprozess auflösen (Cache), Worker brauchen keine DB
+            work.append((order, items or [], self._get_jtl_customer_number(order.email)))
+
+        chunks = [work[i:i + XML_EXPORT_CHUNK_SIZE] for i in range(0, len(work), XML_EXPORT_CHUNK_SIZE)]
+        orders_by_id = {order.id: order for order in orders}
+
+        generated = []
+        # Eigener Pool nur, wenn keiner vorab (außerhalb der Transaktion) gestartet wurde
+        own_pool = None
+        try:
+            pool = self.render_pool
+            if pool is None:
+                pool = own_pool = ProcessPoolExecutor(max_workers=XML_EXPORT_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            for results in pool.map(render_orders, chunks):
+                for order_id, xml_bytes, error in results:
+                    order = orders_by_id[order_id]
+                    if xml_bytes is None:
+                        log_service.log(job_id, "xml_export", "ERROR",
+                                          f"  ✗ Fehler bei Order {order.bestell_id}: {error}")
+                        continue
+
+                    generated.append((order, xml_bytes, xml_bytes.decode('ISO-8859-1')))
+
+                    # Gesamt-Datei: Element aus den fertigen Bytes (lxml Elemente sind nicht picklebar)
+                    if combined:
+                        self._write_combined_xml(combined, ET.fromstring(xml_bytes)[0], job_id)
+
+        except Exception as e:
+            # Pool nicht verfügbar/abgestürzt: Rest sequentiell erzeugen
+            log_service.log(job_id, "xml_export", "WARNING",
+                              f"  ⚠ Process Pool Fehler, sequentielle Generierung: {str(e)}")
+            done = {order.id for order, _, _ in generated}
+            generated += self._generate_batch([o for o in orders if o.id not in done], combined, job_id)
+        finally:
+            if own_pool is not None:
+                own_pool.shutdown()
+
+        return generated
+
+    def _generate_batch_sql(self, orders: List, combined: Optional[XmlStreamWriter] = None,
+                            job_id: Optional[str] = None) -> List:
+        """
+        SQL Engine: Dokumente entstehen set-basiert auf dem SQL Server (FOR XML PATH), Python
+        serialisiert nur noch einheitlich (Deklaration, Einrückung, ISO-8859-1) für die Sinks -
+        nach _parse_sql_xml byte-identisch zum Python-Generator.
+        Liefert die Engine nichts (Fehler), wird auf den Python-Generator zurückgefallen.
+        Ebenso bei veraltetem Kunden-Spiegel: die Engine liest cKundenNr direkt aus dem Spiegel.
+        """
+        if self._customer_mirror_stale:
+            log_service.log(job_id, "xml_export", "WARNING",
+                              "  ⚠ Kunden-Spiegel veraltet, Python-Generator übernimmt (Live-Lookup)")
+            return self._generate_batch(orders, combined, job_id)
+
+        rendered = self.order_repo.render_orders_xml(
+            [order.id for order in orders],
+            k_firma=JTL_K_FIRMA, k_benutzer=JTL_K_BENUTZER,
+            sprache=JTL_SPRACHE, waehrung=JTL_WAEHRUNG
+        )
+        if not rendered:
+            log_service.log(job_id, "xml_export", "WARNING",
+                              "  ⚠ SQL XML Engine ohne Ergebnis, Python-Generator übernimmt")
+            return self._generate_batch(orders, combined, job_id)
+
+        generated = []
+        for order in orders:
+            try:
+                xml_content = rendered.get(order.id)
+                if not xml_content:
+                    log_service.log(job_id, "xml_export", "WARNING",
+                                      f"  ⚠ {order.bestell_id}: XML Generation fehlgeschlagen")
+                    continue
+
+                order_root = self._parse_sql_xml(xml_content)
+                xml_bytes = self._serialize_xml(order_root)
+                generated.append((order, xml_bytes, xml_bytes.decode('ISO-8859-1')))
+
+                if combined:
+                    self._write_combined_xml(combined, order_root[0], job_id)
+
+            except Exception as e:
+                log_service.log(job_id, "xml_export", "ERROR",
+                                  f"  ✗ Fehler bei Order {order.bestell_id}: {str(e)}")
+
+        return generated
+
     def _get_orders_to_export(self, job_id: Optional[str] = None) -> List:
         """Hole Orders mit status='importiert' und xml_erstellt=0"""
         try:
@@ -169,313 +368,281 @@ class XmlExportService:
             return orders_to_export
 
         except Exception as e:
+            if is_deadlock(e):
+                raise
 
             log_service.log(job_id, "xml_export", "ERROR",
                               f"✗ Fehler beim Laden der Orders: {str(e)}")
             return []
 
-    def _generate_order_xml(self, order, items, parent_elem) -> Optional[ET.Element]:
-        """Generiere XML Element für eine Order"""
-
-        # ===== Haupt-Bestellung Element =====
-        bestellung = ET.SubElement(
-            parent_elem, 'tBestellung',
-            kFirma=JTL_K_FIRMA,
-            kBenutzer=JTL_K_BENUTZER
-        )
-
-        # ===== Header Daten =====
-        ET.SubElement(bestellung, 'cSprache').text = JTL_SPRACHE
-        ET.SubElement(bestellung, 'cWaehrung').text = JTL_WAEHRUNG
-        ET.SubElement(bestellung, 'cBestellNr')
-        ET.SubElement(bestellung, 'cExterneBestellNr').text = order.bestell_id
-        ET.SubElement(bestellung, 'cVersandartName').text = 'TEMU'
-        ET.SubElement(bestellung, 'cVersandInfo')
-
-        ET.SubElement(bestellung, 'dVersandDatum').text = (
-            order.versanddatum.strftime('%d.%m.%Y') if order.versanddatum else ''
-        )
-
-        ET.SubElement(bestellung, 'cTracking').text = order.trackingnummer or ''
-        ET.SubElement(bestellung, 'dLieferDatum')
-        ET.SubElement(bestellung, 'cKommentar')
-        ET.SubElement(bestellung, 'cBemerkung')
+    def _generate_order_xml(self, order, items, parent_elem, kunden_nr: Optional[str] = None) -> Optional[ET.Element]:
+        """Generiere XML Element für eine Order (kunden_nr=None: Lookup über Cache/Kunden-Spiegel)"""
+        if kunden_nr is None:
+            kunden_nr = self._get_jtl_customer_number(order.email)
+        return build_order_xml(order, items, parent_elem, kunden_nr)
 
-        ET.SubElement(bestellung, 'dErstellt').text = (
-            order.kaufdatum.strftime('%d.%m.%Y') if order.kaufdatum else ''
-        )
-
-        ET.SubElement(bestellung, 'cZahlungsartName').text = 'TEMU'
-        ET.SubElement(bestellung, 'dBezahltDatum')
-
-        # ===== KORREKTE REIHENFOLGE: Artikel ZUERST, dann Kunde =====
-        # ===== Artikel-Positionen =====
-        for item in items:
-            self._add_item_to_xml(bestellung, item)
-
-        # ===== Versandkosten =====
-        self._add_shipping_costs_to_xml(bestellung, order)
-
-        # ===== Hole Kundennummer aus JTL (falls Email existiert) =====
-        kunden_nr = self._get_jtl_customer_number(order.email)
-
-        # ===== Kunde =====
-        self._add_customer_to_xml(bestellung, order, kunden_nr)
-
-        # ===== Lieferadresse =====
-        self._add_delivery_address_to_xml(bestellung, order)
-
-        # ===== Zahlungsinfo =====
-        self._add_payment_info_to_xml(bestellung)
-
-        return bestellung
-
-    def _add_item_to_xml(self, bestellung_elem, item):
-        """Füge einen Artikel zur Order hinzu"""
-        pos = ET.SubElement(bestellung_elem, 'twarenkorbpos')
-
-        ET.SubElement(pos, 'cName').text = item.produktname or ''
-        ET.SubElement(pos, 'cArtNr').text = item.sku or ''
-        ET.SubElement(pos, 'cBarcode')
-        ET.SubElement(pos, 'cEinheit')
-
-        ET.SubElement(pos, 'fPreisEinzelNetto').text = f"{item.netto_einzelpreis:.5f}"
-        ET.SubElement(pos, 'fPreis').text = f"{item.brutto_einzelpreis:.2f}"
-
-        ET.SubElement(pos, 'fMwSt').text = f"{item.mwst_satz:.2f}"
-        ET.SubElement(pos, 'fAnzahl').text = f"{item.menge:.2f}"
-        ET.SubElement(pos, 'cPosTyp').text = 'standard'
-        ET.SubElement(pos, 'fRabatt').text = '0.00'
-
-    def _add_shipping_costs_to_xml(self, bestellung_elem, order):
-        """Füge Versandkosten als Position hinzu"""
-        versand_pos = ET.SubElement(bestellung_elem, 'twarenkorbpos')
-
-        versandkosten_netto = float(order.versandkosten or 0)
-        versandkosten_brutto = versandkosten_netto * 1.19
-
-        ET.SubElement(versand_pos, 'cName').text = 'TEMU Versand'
-        ET.SubElement(versand_pos, 'cArtNr')
-        ET.SubElement(versand_pos, 'cBarcode')
-        ET.SubElement(versand_pos, 'cEinheit')
-        ET.SubElement(versand_pos, 'fPreisEinzelNetto').text = f"{versandkosten_netto:.5f}"
-        ET.SubElement(versand_pos, 'fPreis').text = f"{versandkosten_brutto:.2f}"
-        ET.SubElement(versand_pos, 'fMwSt').text = '19.00'
-        ET.SubElement(versand_pos, 'fAnzahl').text = '1.00'
-        ET.SubElement(versand_pos, 'cPosTyp').text = 'versandkosten'
-        ET.SubElement(versand_pos, 'fRabatt').text = '0.00'
-
-    def _add_customer_to_xml(self, bestellung_elem, order, kunden_nr: str = ''):
-        """Füge Kundendaten hinzu"""
-        kunde = ET.SubElement(bestellung_elem, 'tkunde')
-
-        ET.SubElement(kunde, 'cKundenNr').text = kunden_nr or ''
-        ET.SubElement(kunde, 'cAnrede')
-        ET.SubElement(kunde, 'cTitel')
-        ET.SubElement(kunde, 'cVorname').text = order.vorname_empfaenger or ''
-        ET.SubElement(kunde, 'cNachname').text = order.nachname_empfaenger or ''
-        ET.SubElement(kunde, 'cFirma')
-        ET.SubElement(kunde, 'cStrasse').text = order.strasse or ''
-        ET.SubElement(kunde, 'cAdressZusatz').text = order.adresszusatz or ''
-        ET.SubElement(kunde, 'cPLZ').text = order.plz or ''
-        ET.SubElement(kunde, 'cOrt').text = order.ort or ''
-        ET.SubElement(kunde, 'cBundesland').text = order.bundesland or ''
-        ET.SubElement(kunde, 'cLand').text = order.land_iso or ''
-        ET.SubElement(kunde, 'cTel').text = order.telefon_empfaenger or ''
-        ET.SubElement(kunde, 'cMobil')
-        ET.SubElement(kunde, 'cFax')
-        ET.SubElement(kunde, 'cMail').text = order.email or ''
-        ET.SubElement(kunde, 'cUSTID')
-        ET.SubElement(kunde, 'cWWW')
-        ET.SubElement(kunde, 'cHerkunft').text = 'TEMU'
-        ET.SubElement(kunde, 'dErstellt').text = (
-            order.kaufdatum.strftime('%d.%m.%Y') if order.kaufdatum else ''
-        )
+    def _prefetch_customer_numbers(self, orders: List, job_id: Optional[str] = None) -> None:
+        """
+        Spiegel aktualisieren und Kundennummern aller Orders im Batch cachen.
+        Schlägt der Sync fehl, werden Nicht-Treffer live in JTL nachgeschlagen (wie vor dem Spiegel),
+        damit kein leeres cKundenNr einen doppelten Kunden in JTL anlegt.
+        """
+        self._customer_mirror_stale = False
+        try:
+            # Nur inkrementell - der Voll-Abgleich läuft als Wartungsjob außerhalb der Export-Transaktion
+            sync_result = self.customer_mirror.sync(job_id=job_id, full=False)
+            self._customer_mirror_stale = not sync_result.get('success')
+            emails = [order.email for order in orders if order.email]
+            found = self.customer_mirror.get_customer_numbers(emails)
+
+            # Auch Nicht-Treffer cachen -> kein Einzel-Lookup pro Order
+            for email in emails:
+                key = normalize_email(email)
+                if not key:
+                    continue
+                kunden_nr = found.get(key, '')
+                if not kunden_nr and self._customer_mirror_stale:
+                    kunden_nr = self.jtl_repo.get_customer_number_by_email(key) or ''
+                self._customer_nr_cache[key] = kunden_nr
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            self._customer_mirror_stale = True
+            log_service.log(job_id, "xml_export", "WARNING",
+                              f"  ⚠ Kunden-Spiegel nicht verfügbar: {str(e)}")
 
     def _get_jtl_customer_number(self, email: str) -> str:
-        """Hole JTL Kundennummer per E-Mail (mit einfachem Cache)."""
-        if not email:
-            return ''
-        key = email.strip().lower()
+        """Hole JTL Kundennummer per E-Mail (Cache → TOCI Kunden-Spiegel)."""
+        key = normalize_email(email)
         if not key:
             return ''
 
         if key in self._customer_nr_cache:
             return self._customer_nr_cache[key]
 
-        if not self.jtl_repo:
-            return ''
-
         try:
-            kunden_nr = self.jtl_repo.get_customer_number_by_email(key) or ''
+            kunden_nr = self.customer_mirror.get_customer_number(key)
+            if not kunden_nr and self._customer_mirror_stale:
+                kunden_nr = self.jtl_repo.get_customer_number_by_email(key) or ''
             self._customer_nr_cache[key] = kunden_nr
             return kunden_nr
-        except Exception:
+        except Exception as e:
+            if is_deadlock(e):
+                raise
             # Kein hartes Fail: bei Fehlern leeres Feld -> JTL legt neuen Kunden an
             return ''
 
-    def _add_delivery_address_to_xml(self, bestellung_elem, order):
-        """Füge Lieferadresse hinzu"""
-        lieferadresse = ET.SubElement(bestellung_elem, 'tlieferadresse')
-
-        ET.SubElement(lieferadresse, 'cAnrede')
-        ET.SubElement(lieferadresse, 'cVorname').text = order.vorname_empfaenger or ''
-        ET.SubElement(lieferadresse, 'cNachname').text = order.nachname_empfaenger or ''
-        ET.SubElement(lieferadresse, 'cTitel')
-        ET.SubElement(lieferadresse, 'cFirma')
-        ET.SubElement(lieferadresse, 'cStrasse').text = order.strasse or ''
-        ET.SubElement(lieferadresse, 'cAdressZusatz').text = order.adresszusatz or ''
-        ET.SubElement(lieferadresse, 'cPLZ').text = order.plz or ''
-        ET.SubElement(lieferadresse, 'cOrt').text = order.ort or ''
-        ET.SubElement(lieferadresse, 'cBundesland').text = order.bundesland or ''
-        ET.SubElement(lieferadresse, 'cLand').text = order.land_iso or ''
-        ET.SubElement(lieferadresse, 'cTel').text = order.telefon_empfaenger or ''
-        ET.SubElement(lieferadresse, 'cMobil')
-        ET.SubElement(lieferadresse, 'cFax')
-        ET.SubElement(lieferadresse, 'cMail').text = order.email or ''
-
-    def _add_payment_info_to_xml(self, bestellung_elem):
-        """Füge Zahlungsinfo hinzu (leer für TEMU)"""
-        zahlungsinfo = ET.SubElement(bestellung_elem, 'tzahlungsinfo')
-
-        ET.SubElement(zahlungsinfo, 'cBankName')
-        ET.SubElement(zahlungsinfo, 'cBLZ')
-        ET.SubElement(zahlungsinfo, 'cKontoNr')
-        ET.SubElement(zahlungsinfo, 'cKartenNr')
-        ET.SubElement(zahlungsinfo, 'dGueltigkeit')
-        ET.SubElement(zahlungsinfo, 'cCVV')
-        ET.SubElement(zahlungsinfo, 'cKartenTyp')
-        ET.SubElement(zahlungsinfo, 'cInhaber')
-        ET.SubElement(zahlungsinfo, 'cIBAN')
-        ET.SubElement(zahlungsinfo, 'cBIC')
-
-    def _import_to_jtl(self, order, bestellung_elem, job_id: Optional[str] = None) -> bool:
+    def _import_batch_to_jtl(self, generated: List, job_id: Optional[str] = None) -> set:
         """
-        Importiere XML in JTL DB
+        Importiere alle XMLs des Batches in JTL DB (Multi-Row INSERT).
+        Schlägt ein Chunk fehl, wird der Rest pro Order importiert, damit das Ergebnis pro Order stimmt.
 
         Args:
-            order: Order Domain Model
-            bestellung_elem: XML Element (einzelne Bestellung)
+            generated: [(order, xml_bytes, xml_string), ...]
             job_id: Optional - für strukturiertes Logging
 
         Returns:
-            bool: True wenn erfolgreich
+            set: bestell_ids die erfolgreich importiert wurden
         """
+        if not self.jtl_repo or not generated:
+            return set()
 
-        if not self.jtl_repo:
-            return False
-
-        try:
-            # ✅ WICHTIG: Wrap in Root Element!
-            root = ET.Element('tBestellungen')
-            root.append(bestellung_elem)
+        inserted = self.jtl_repo.insert_xml_imports([xml_string for _, _, xml_string in generated])
+        imported = {order.bestell_id for order, _, _ in generated[:inserted]}
 
-            # Konvertiere zu XML String
-            xml_string = self._prettify_xml(root)
-
-            # Schreibe in JTL DB
-            return self.jtl_repo.insert_xml_import(xml_string)
-
-        except Exception as e:
+        for order, _, xml_string in generated[inserted:]:
+            try:
+                if self.jtl_repo.insert_xml_import(xml_string):
+                    imported.add(order.bestell_id)
+                else:
+                    log_service.log(job_id, "xml_export", "WARNING",
+                                      f"  ⚠ JTL Import fehlgeschlagen für {order.bestell_id}")
+            except Exception as e:
+                if is_deadlock(e):
+                    raise
 
-            log_service.log(job_id, "xml_export", "WARNING",
-                              f"  ⚠ JTL Import Fehler für {order.bestell_id}: {str(e)}")
+                log_service.log(job_id, "xml_export", "WARNING",
+                                  f"  ⚠ JTL Import Fehler für {order.bestell_id}: {str(e)}")
 
-            return False
+        return imported
 
-    def _update_order_status(self, order_id: int, job_id: Optional[str] = None) -> bool:
+    def _update_order_statuses(self, order_ids: List[int], job_id: Optional[str] = None) -> bool:
         """
-        Setze xml_erstellt = 1 NACH erfolgreichem XML Export
+        Setze xml_erstellt = 1 NACH erfolgreichem XML Export (ein Bulk-Update für den Batch)
 
         Args:
-            order_id: Order Datenbank ID
+            order_ids: Order Datenbank IDs
             job_id: Optional - für strukturiertes Logging
 
         Returns:
             bool: True wenn erfolgreich
         """
         try:
-            success = self.order_repo.update_xml_export_status(order_id)
-            return success
+            updated = self.order_repo.update_xml_export_statuses(order_ids)
+            return updated == len(set(order_ids))
         except Exception as e:
+            if is_deadlock(e):
+                raise
 
             log_service.log(job_id, "xml_export", "ERROR",
                               f"✗ Status Update Fehler: {str(e)}")
 
             return False
 
-    def _save_xml_to_disk(self, root: ET.Element, job_id: Optional[str] = None):
-        """Speichere komplette XML auf Festplatte mit Zeitstempel"""
+    def _open_combined_xml(self, job_id: Optional[str] = None) -> Optional[XmlStreamWriter]:
+        """Öffne Gesamt-XML mit Zeitstempel als Stream (Fehler sind nicht fatal für den Export)"""
         try:
-            xml_string = self._prettify_xml(root)
-
             # Generiere Dateinamen mit Zeitstempel: jtl_temu_bestellungen_YYYYMMDD_HHMMSS.xml
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"jtl_temu_bestellungen_{timestamp}.xml"
             # XML_OUTPUT_PATH ist bereits ein Path Objekt, daher direkt .parent verwenden
             filepath = XML_OUTPUT_PATH.parent / filename
 
-            # Stelle sicher, dass das Verzeichnis existiert
-            filepath.parent.mkdir(parents=True, exist_ok=True)
+            return XmlStreamWriter(filepath).open()
+
+        except Exception as e:
+
+            log_service.log(job_id, "xml_export", "ERROR",
+                              f"✗ XML Speicher-Fehler: {str(e)}")
+            return None
 
-            with open(str(filepath), 'w', encoding='ISO-8859-1') as f:
-                f.write(xml_string)
+    def _write_combined_xml(self, combined: XmlStreamWriter, bestellung_elem, job_id: Optional[str] = None) -> None:
+        """Hänge eine tBestellung an die Gesamt-XML an"""
+        try:
+            combined.write(bestellung_elem)
+        except Exception as e:
 
+            log_service.log(job_id, "xml_export", "ERROR",
+                              f"✗ XML Speicher-Fehler: {str(e)}")
 
-            log_service.log(job_id, "xml_export", "INFO",
-                              f"  ✓ XML gespeichert: {filepath}")
+    def _close_combined_xml(self, combined: XmlStreamWriter, commit: bool, job_id: Optional[str] = None) -> None:
+        """Schließe Gesamt-XML (commit=False verwirft die halbe Datei)"""
+        try:
+            combined.close(commit=commit)
 
+            if commit:
+                log_service.log(job_id, "xml_export", "INFO",
+                                  f"  ✓ XML gespeichert: {combined.filepath} ({combined.count} Bestellungen)")
 
         except Exception as e:
 
             log_service.log(job_id, "xml_export", "ERROR",
                               f"✗ XML Speicher-Fehler: {str(e)}")
 
-    def _archive_order_to_docs(self, bestell_id: str, bestellung_elem: ET.Element, job_id: Optional[str] = None) -> None:
-        """Speichere Einzel-XML pro Bestellung in data/temu/export mit Zeitstempel und Bestell-ID."""
+    def _archive_batch(self, generated: List, job_id: Optional[str] = None) -> None:
+        """Einzel-XMLs archivieren: komprimiertes Tages-Bundle (Standard) oder eine Datei pro Order"""
+        if not generated:
+            return
+
+        if XML_ARCHIVE_MODE != 'bundle':
+            for order, xml_bytes, _ in generated:
+                self._archive_order_to_docs(order.bestell_id, xml_bytes, job_id)
+            return
+
         try:
-            root = ET.Element('tBestellungen')
-            root.append(bestellung_elem)
-            xml_string = self._prettify_xml(root)
+            archive = OrderXmlArchive(XML_ARCHIVE_DIR, XML_ARCHIVE_RETENTION_MONTHS)
+            archive.append_batch(((order.bestell_id, xml_bytes) for order, xml_bytes, _ in generated), job_id)
+            archive.apply_retention(job_id)
+        except Exception as e:
+            log_service.log(job_id, "xml_export", "WARNING",
+                              f"  ⚠ Einzel-XML Archiv-Fehler: {str(e)}")
 
+    def _archive_order_to_docs(self, bestell_id: str, xml_bytes: bytes, job_id: Optional[str] = None) -> None:
+        """Speichere Einzel-XML pro Bestellung in data/temu/export mit Zeitstempel und Bestell-ID."""
+        try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             TEMU_EXPORT_DIR.mkdir(parents=True, exist_ok=True)
             archive_file = TEMU_EXPORT_DIR / f"temu_order_{bestell_id}_{timestamp}.xml"
 
-            with open(str(archive_file), 'w', encoding='ISO-8859-1') as f:
-                f.write(xml_string)
+            with open(str(archive_file), 'wb') as f:
+                f.write(xml_bytes)
 
             log_service.log(job_id, "xml_export", "INFO",
-                              f"  ↳ Einzel-XML archiviert (data/temu/export): {archive_file}")
+                              f"  ↳ Einzel-XML archiviert (data/temu/export): {archive_file}", aggregate="xml_archived")
 
         except Exception as e:
             log_service.log(job_id, "xml_export", "WARNING",
                               f"  ⚠ Einzel-XML Archiv-Fehler für {bestell_id}: {str(e)}")
 
-    def _save_xml_to_db(self, bestell_id: str, bestellung_elem: ET.Element, job_id: Optional[str] = None) -> bool:
-        """Speichere einzelne XML in TOCI DB (temu_xml_export Tabelle)"""
+    def _save_xml_batch_to_db(self, generated: List, job_id: Optional[str] = None) -> int:
+        """
+        Speichere alle Einzel-XMLs des Batches in TOCI DB (temu_xml_export, komprimiert, Multi-Row INSERT).
+        Die Schema-Migration (xml_content_gz) läuft vor der Workflow-Transaktion, nicht hier.
+        """
+        if not generated:
+            return 0
         try:
-            # Wrap Element in Root für valides XML
-            root = ET.Element('tBestellungen')
-            # Kopiere das Element
-            root.append(bestellung_elem)
-
-            xml_string = self._prettify_xml(root)
-
-            # Speichere in TOCI Datenbank
-            return self.order_repo.insert_xml_export(bestell_id, xml_string)
+            saved = self.order_repo.insert_xml_exports([
+                {"bestell_id": order.bestell_id, "xml_content": xml_string}
+                for order, _, xml_string in generated
+            ])
+            if saved < len(generated):
+                log_service.log(job_id, "xml_export", "WARNING",
+                                  f"  ⚠ XML DB Speicher-Fehler: {len(generated) - saved} von {len(generated)} nicht gespeichert")
+            return saved
 
         except Exception as e:
+            if is_deadlock(e):
+                raise
             log_service.log(job_id, "xml_export", "WARNING",
-                              f"  ⚠ XML DB Speicher-Fehler für {bestell_id}: {str(e)}")
-            return False
+                              f"  ⚠ XML DB Speicher-Fehler: {str(e)}")
+            return 0
 
 
-    def _prettify_xml(self, elem: ET.Element) -> str:
-        """Formatiere XML schön"""
-        rough_string = ET.tostring(elem, 'utf-8')
-        reparsed = minidom.parseString(rough_string).toprettyxml(
-            indent="  ",
-            encoding="ISO-8859-1"
-        )
-        return reparsed.decode("ISO-8859-1")
+    def _parse_sql_xml(self, xml_content: str):
+        """
+        Parse ein Dokument der SQL Engine und gleiche es an den Python-Generator an.
+        FOR XML schreibt '' als <x></x>, nach dem Parsen ist der Text aber None (-> <x/>):
+        Felder aus XML_TEXT_FIELDS bekommen wieder '' als Text. NULL-Spalten ohne ISNULL fehlen
+        im FOR XML Ergebnis ganz - das ist ein Fehler wie im Python-Generator (z.B. Preis NULL).
+
+        Raises:
+            ValueError: Blatt-Elemente fehlen oder weichen von XML_LEAF_FIELDS ab
+        """
+        order_root = ET.fromstring(xml_content)
+        for parent in order_root.iter(*XML_LEAF_FIELDS):
+            leaves = [child for child in parent if len(child) == 0]
+            expected = XML_LEAF_FIELDS[parent.tag]
+            if tuple(child.tag for child in leaves) != expected:
+                missing = [tag for tag in expected if parent.find(tag) is None]
+                raise ValueError(f"SQL XML <{parent.tag}> unvollständig: {', '.join(missing) or 'Reihenfolge'}")
+
+            kind = parent.tag
+            if kind == 'twarenkorbpos' and parent.findtext('cPosTyp') == 'versandkosten':
+                kind = 'versandkosten'
+            for child in leaves:
+                if child.text is None and child.tag in XML_TEXT_FIELDS[kind]:
+                    child.text = ''
+        return order_root
+
+    def _serialize_xml(self, elem) -> bytes:
+        """Serialisiere XML (siehe xml_order_builder.serialize_xml)"""
+        return serialize_xml(elem)
+
+
+def create_render_pool(order_count: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Startet den Process Pool für den Backlog-Modus, falls order_count die Schwelle erreicht.
+    Aufruf außerhalb offener Transaktionen: Worker werden per 'spawn' gestartet (kein fork
+    des Multi-Thread-Prozesses mit Scheduler, Engine-Pools und Locks) und sofort hochgefahren.
+    Worker-Einstieg ist xml_order_builder.render_orders - ohne Service, Repositories und Kunden-Spiegel.
+
+    Returns:
+        ProcessPoolExecutor (Aufrufer ruft shutdown()) oder None unterhalb der Schwelle
+    """
+    if (XML_EXPORT_ENGINE == 'sql'
+            or XML_EXPORT_PARALLEL_THRESHOLD <= 0
+            or XML_EXPORT_WORKERS <= 1
+            or order_count < XML_EXPORT_PARALLEL_THRESHOLD):
+        return None
+
+    try:
+        pool = ProcessPoolExecutor(max_workers=XML_EXPORT_WORKERS,
+                                   mp_context=multiprocessing.get_context('spawn'))
+        # Worker starten sonst erst beim ersten submit (lazy) - also innerhalb der Transaktion
+        list(pool.map(warm_up, range(XML_EXPORT_WORKERS)))
+        return pool
+    except Exception as e:
+        log_service.log(None, "xml_export", "WARNING",
+                          f"  ⚠ Process Pool konnte nicht gestartet werden: {str(e)}")
+        return None
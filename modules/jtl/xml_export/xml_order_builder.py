@@ -0,0 +1,204 @@
+"""
+XML Order Builder - JTL Bestell-XML aus Order/Items bauen (ohne DB, ohne Services)
+
+Wird vom XmlExportService und von den Process-Pool Workern des Backlog-Modus genutzt.
+Die Worker laden nur dieses Modul: keine Repositories, kein Kunden-Spiegel, keine Log-Writer.
+"""
+
+import os
+from typing import List
+
+from lxml import etree as ET
+
+from modules.shared.config.settings import JTL_WAEHRUNG, JTL_SPRACHE, JTL_K_BENUTZER, JTL_K_FIRMA
+
+
+def build_order_xml(order, items, parent_elem, kunden_nr: str = '') -> ET.Element:
+    """Generiere XML Element für eine Order (Kundennummer bereits aufgelöst)"""
+
+    # ===== Haupt-Bestellung Element =====
+    bestellung = ET.SubElement(
+        parent_elem, 'tBestellung',
+        kFirma=JTL_K_FIRMA,
+        kBenutzer=JTL_K_BENUTZER
+    )
+
+    # ===== Header Daten =====
+    ET.SubElement(bestellung, 'cSprache').text = JTL_SPRACHE
+    ET.SubElement(bestellung, 'cWaehrung').text = JTL_WAEHRUNG
+    ET.SubElement(bestellung, 'cBestellNr')
+    ET.SubElement(bestellung, 'cExterneBestellNr').text = order.bestell_id
+    ET.SubElement(bestellung, 'cVersandartName').text = 'TEMU'
+    ET.SubElement(bestellung, 'cVersandInfo')
+
+    ET.SubElement(bestellung, 'dVersandDatum').text = (
+        order.versanddatum.strftime('%d.%m.%Y') if order.versanddatum else ''
+    )
+
+    ET.SubElement(bestellung, 'cTracking').text = order.trackingnummer or ''
+    ET.SubElement(bestellung, 'dLieferDatum')
+    ET.SubElement(bestellung, 'cKommentar')
+    ET.SubElement(bestellung, 'cBemerkung')
+
+    ET.SubElement(bestellung, 'dErstellt').text = (
+        order.kaufdatum.strftime('%d.%m.%Y') if order.kaufdatum else ''
+    )
+
+    ET.SubElement(bestellung, 'cZahlungsartName').text = 'TEMU'
+    ET.SubElement(bestellung, 'dBezahltDatum')
+
+    # ===== KORREKTE REIHENFOLGE: Artikel ZUERST, dann Kunde =====
+    # ===== Artikel-Positionen =====
+    for item in items:
+        add_item_to_xml(bestellung, item)
+
+    # ===== Versandkosten =====
+    add_shipping_costs_to_xml(bestellung, order)
+
+    # ===== Kunde =====
+    add_customer_to_xml(bestellung, order, kunden_nr)
+
+    # ===== Lieferadresse =====
+    add_delivery_address_to_xml(bestellung, order)
+
+    # ===== Zahlungsinfo =====
+    add_payment_info_to_xml(bestellung)
+
+    return bestellung
+
+
+def add_item_to_xml(bestellung_elem, item):
+    """Füge einen Artikel zur Order hinzu"""
+    pos = ET.SubElement(bestellung_elem, 'twarenkorbpos')
+
+    ET.SubElement(pos, 'cName').text = item.produktname or ''
+    ET.SubElement(pos, 'cArtNr').text = item.sku or ''
+    ET.SubElement(pos, 'cBarcode')
+    ET.SubElement(pos, 'cEinheit')
+
+    ET.SubElement(pos, 'fPreisEinzelNetto').text = f"{item.netto_einzelpreis:.5f}"
+    ET.SubElement(pos, 'fPreis').text = f"{item.brutto_einzelpreis:.2f}"
+
+    ET.SubElement(pos, 'fMwSt').text = f"{item.mwst_satz:.2f}"
+    ET.SubElement(pos, 'fAnzahl').text = f"{item.menge:.2f}"
+    ET.SubElement(pos, 'cPosTyp').text = 'standard'
+    ET.SubElement(pos, 'fRabatt').text = '0.00'
+
+
+def add_shipping_costs_to_xml(bestellung_elem, order):
+    """Füge Versandkosten als Position hinzu"""
+    versand_pos = ET.SubElement(bestellung_elem, 'twarenkorbpos')
+
+    versandkosten_netto = float(order.versandkosten or 0)
+    versandkosten_brutto = versandkosten_netto * 1.19
+
+    ET.SubElement(versand_pos, 'cName').text = 'TEMU Versand'
+    ET.SubElement(versand_pos, 'cArtNr')
+    ET.SubElement(versand_pos, 'cBarcode')
+    ET.SubElement(versand_pos, 'cEinheit')
+    ET.SubElement(versand_pos, 'fPreisEinzelNetto').text = f"{versandkosten_netto:.5f}"
+    ET.SubElement(versand_pos, 'fPreis').text = f"{versandkosten_brutto:.2f}"
+    ET.SubElement(versand_pos, 'fMwSt').text = '19.00'
+    ET.SubElement(versand_pos, 'fAnzahl').text = '1.00'
+    ET.SubElement(versand_pos, 'cPosTyp').text = 'versandkosten'
+    ET.SubElement(versand_pos, 'fRabatt').text = '0.00'
+
+
+def add_customer_to_xml(bestellung_elem, order, kunden_nr: str = ''):
+    """Füge Kundendaten hinzu"""
+    kunde = ET.SubElement(bestellung_elem, 'tkunde')
+
+    ET.SubElement(kunde, 'cKundenNr').text = kunden_nr or ''
+    ET.SubElement(kunde, 'cAnrede')
+    ET.SubElement(kunde, 'cTitel')
+    ET.SubElement(kunde, 'cVorname').text = order.vorname_empfaenger or ''
+    ET.SubElement(kunde, 'cNachname').text = order.nachname_empfaenger or ''
+    ET.SubElement(kunde, 'cFirma')
+    ET.SubElement(kunde, 'cStrasse').text = order.strasse or ''
+    ET.SubElement(kunde, 'cAdressZusatz').text = order.adresszusatz or ''
+    ET.SubElement(kunde, 'cPLZ').text = order.plz or ''
+    ET.SubElement(kunde, 'cOrt').text = order.ort or ''
+    ET.SubElement(kunde, 'cBundesland').text = order.bundesland or ''
+    ET.SubElement(kunde, 'cLand').text = order.land_iso or ''
+    ET.SubElement(kunde, 'cTel').text = order.telefon_empfaenger or ''
+    ET.SubElement(kunde, 'cMobil')
+    ET.SubElement(kunde, 'cFax')
+    ET.SubElement(kunde, 'cMail').text = order.email or ''
+    ET.SubElement(kunde, 'cUSTID')
+    ET.SubElement(kunde, 'cWWW')
+    ET.SubElement(kunde, 'cHerkunft').text = 'TEMU'
+    ET.SubElement(kunde, 'dErstellt').text = (
+        order.kaufdatum.strftime('%d.%m.%Y') if order.kaufdatum else ''
+    )
+
+
+def add_delivery_address_to_xml(bestellung_elem, order):
+    """Füge Lieferadresse hinzu"""
+    lieferadresse = ET.SubElement(bestellung_elem, 'tlieferadresse')
+
+    ET.SubElement(lieferadresse, 'cAnrede')
+    ET.SubElement(lieferadresse, 'cVorname').text = order.vorname_empfaenger or ''
+    ET.SubElement(lieferadresse, 'cNachname').text = order.nachname_empfaenger or ''
+    ET.SubElement(lieferadresse, 'cTitel')
+    ET.SubElement(lieferadresse, 'cFirma')
+    ET.SubElement(lieferadresse, 'cStrasse').text = order.strasse or ''
+    ET.SubElement(lieferadresse, 'cAdressZusatz').text = order.adresszusatz or ''
+    ET.SubElement(lieferadresse, 'cPLZ').text = order.plz or ''
+    ET.SubElement(lieferadresse, 'cOrt').text = order.ort or ''
+    ET.SubElement(lieferadresse, 'cBundesland').text = order.bundesland or ''
+    ET.SubElement(lieferadresse, 'cLand').text = order.land_iso or ''
+    ET.SubElement(lieferadresse, 'cTel').text = order.telefon_empfaenger or ''
+    ET.SubElement(lieferadresse, 'cMobil')
+    ET.SubElement(lieferadresse, 'cFax')
+    ET.SubElement(lieferadresse, 'cMail').text = order.email or ''
+
+
+def add_payment_info_to_xml(bestellung_elem):
+    """Füge Zahlungsinfo hinzu (leer für TEMU)"""
+    zahlungsinfo = ET.SubElement(bestellung_elem, 'tzahlungsinfo')
+
+    ET.SubElement(zahlungsinfo, 'cBankName')
+    ET.SubElement(zahlungsinfo, 'cBLZ')
+    ET.SubElement(zahlungsinfo, 'cKontoNr')
+    ET.SubElement(zahlungsinfo, 'cKartenNr')
+    ET.SubElement(zahlungsinfo, 'dGueltigkeit')
+    ET.SubElement(zahlungsinfo, 'cCVV')
+    ET.SubElement(zahlungsinfo, 'cKartenTyp')
+    ET.SubElement(zahlungsinfo, 'cInhaber')
+    ET.SubElement(zahlungsinfo, 'cIBAN')
+    ET.SubElement(zahlungsinfo, 'cBIC')
+
+
+def serialize_xml(elem) -> bytes:
+    """
+    Serialisiere XML in einem Durchgang (lxml, eingerückt, ISO-8859-1 mit Deklaration).
+    Zeichen außerhalb von Latin-1 werden als Zeichenreferenzen geschrieben.
+    """
+    return ET.tostring(elem, pretty_print=True, xml_declaration=True, encoding='ISO-8859-1')
+
+
+def warm_up(_) -> int:
+    """Process-Pool Worker: no-op zum Vorstarten der Prozesse."""
+    return os.getpid()
+
+
+def render_orders(chunk: List) -> List:
+    """
+    Process-Pool Worker (Backlog-Modus): baut und serialisiert die XML für einen Chunk Orders.
+    Läuft ohne DB-Zugriff - Items und Kundennummern kommen vorab geladen mit.
+
+    Args:
+        chunk: [(order, items, kunden_nr), ...]
+
+    Returns:
+        list: [(order_id, xml_bytes, None) | (order_id, None, fehler), ...]
+    """
+    results = []
+    for order, items, kunden_nr in chunk:
+        try:
+            order_root = ET.Element('tBestellungen')
+            build_order_xml(order, items, order_root, kunden_nr)
+            results.append((order.id, serialize_xml(order_root), None))
+        except Exception as e:
+            results.append((order.id, None, str(e)))
+    return results
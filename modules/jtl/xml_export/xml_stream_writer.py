@@ -0,0 +1,73 @@
+"""XML Stream Writer - Inkrementelles Schreiben der JTL Gesamt-XML (tBestellungen)"""
+
+import os
+from pathlib import Path
+
+from lxml import etree as ET
+
+
+class XmlStreamWriter:
+    """
+    Schreibt jede tBestellung sofort in die Datei (lxml xmlfile), statt den kompletten
+    Baum im Speicher aufzubauen. Speicherbedarf bleibt konstant, egal wie viele Orders.
+
+    Die Datei entsteht als .part und wird erst bei close(commit=True) umbenannt,
+    damit JTL/Importeure nie eine halbe Datei sehen.
+
+    Usage:
+        writer = XmlStreamWriter(path).open()
+        writer.write(bestellung_elem)
+        writer.close(commit=True)
+    """
+
+    def __init__(self, filepath: Path, root_tag: str = 'tBestellungen', encoding: str = 'ISO-8859-1'):
+        self.filepath = Path(filepath)
+        self.root_tag = root_tag
+        self.encoding = encoding
+        self.count = 0
+
+        self._part_path = self.filepath.with_name(self.filepath.name + '.part')
+        self._file_ctx = None
+        self._root_ctx = None
+        self._xf = None
+
+    def open(self) -> 'XmlStreamWriter':
+        """Öffne .part Datei und schreibe Deklaration + öffnendes Root-Tag"""
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file_ctx = ET.xmlfile(str(self._part_path), encoding=self.encoding)
+        self._xf = self._file_ctx.__enter__()
+        self._xf.write_declaration()
+        self._xf.write('\n')
+
+        self._root_ctx = self._xf.element(self.root_tag)
+        self._root_ctx.__enter__()
+        self._xf.write('\n')
+        return self
+
+    def write(self, elem) -> None:
+        """Schreibe ein tBestellung Element (wird danach nicht mehr gebraucht)"""
+        self._xf.write(elem, pretty_print=True)
+        self.count += 1
+
+    def close(self, commit: bool = True) -> None:
+        """
+        Schließe Root-Tag und Datei.
+
+        Args:
+            commit: True = .part zur Zieldatei umbenennen, False = verwerfen
+        """
+        try:
+            if self._root_ctx is not None:
+                self._root_ctx.__exit__(None, None, None)
+            if self._file_ctx is not None:
+                self._file_ctx.__exit__(None, None, None)
+        finally:
+            self._root_ctx = None
+            self._file_ctx = None
+            self._xf = None
+
+        if commit:
+            os.replace(self._part_path, self.filepath)
+        elif self._part_path.exists():
+            self._part_path.unlink()
@@ -28,8 +28,41 @@ JTL_SPRACHE = os.getenv('JTL_SPRACHE', 'ger')
 JTL_K_BENUTZER = os.getenv('JTL_K_BENUTZER', '1')
 JTL_K_FIRMA = os.getenv('JTL_K_FIRMA', '1')
 
+# TOCI Kunden-Spiegel (jtl_customer_mirror): inkrementell per kKunde im XML Export, zusätzlich alle
+# CUSTOMER_MIRROR_FULL_SYNC_HOURS ein Voll-Abgleich (geänderte/entfernte E-Mails bestehender Kunden)
+# als eigener Wartungsjob (stündlich geprüft, 0 = aus)
+CUSTOMER_MIRROR_FULL_SYNC_HOURS = int(os.getenv('CUSTOMER_MIRROR_FULL_SYNC_HOURS', '24'))
+
 # === TEMU API Credentials ===
 TEMU_APP_KEY = os.getenv('TEMU_APP_KEY', '')
 TEMU_APP_SECRET = os.getenv('TEMU_APP_SECRET', '')
 TEMU_ACCESS_TOKEN = os.getenv('TEMU_ACCESS_TOKEN', '')
 TEMU_API_ENDPOINT = os.getenv('TEMU_API_ENDPOINT', 'https://openapi-b-eu.temu.com/openapi/router')
+
+# === Log Writer (scheduler_logs) ===
+# Async: log() reiht nur in eine begrenzte Queue ein, ein Hintergrund-Thread schreibt gebündelt
+# (alle LOG_FLUSH_INTERVAL_MS oder LOG_FLUSH_BATCH_SIZE Einträge). Bei voller Queue fällt zuerst DEBUG weg.
+LOG_DB_ASYNC = os.getenv('LOG_DB_ASYNC', 'true').lower() == 'true'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv('LOG_FLUSH_INTERVAL_MS', '500'))
+LOG_FLUSH_BATCH_SIZE = int(os.getenv('LOG_FLUSH_BATCH_SIZE', '200'))
+
+# DB-Policy: Mindest-Level (global + pro job_type), Stichproben pro wiederkehrender Meldung,
+# Summary-Zeilen alle LOG_SUMMARY_INTERVAL_SECONDS und am Job-Ende. LOG_DB_VERBOSE / verbose-Lauf = alles schreiben.
+LOG_DB_MIN_LEVEL = os.getenv('LOG_DB_MIN_LEVEL', 'INFO').upper()
+LOG_DB_MIN_LEVEL_BY_JOB = os.getenv('LOG_DB_MIN_LEVEL_BY_JOB', 'temu_api=WARNING')
+LOG_SAMPLE_FIRST = int(os.getenv('LOG_SAMPLE_FIRST', '3'))
+LOG_SUMMARY_INTERVAL_SECONDS = int(os.getenv('LOG_SUMMARY_INTERVAL_SECONDS', '60'))
+LOG_DB_VERBOSE = os.getenv('LOG_DB_VERBOSE', 'false').lower() == 'true'
+
+# Ringpuffer der letzten Meldungen pro Job-Lauf (LogService.log_buffer)
+LOG_BUFFER_SIZE = int(os.getenv('LOG_BUFFER_SIZE', '500'))
+
+# Retention für scheduler_logs als Wartungsjob: DELETE in Batches (unter der Lock-Escalation-Schwelle
+# von ~5000 Locks) mit Pause dazwischen, damit laufende Inserts nie auf einen Table Lock warten.
+LOG_RETENTION_ENABLED = os.getenv('LOG_RETENTION_ENABLED', 'true').lower() == 'true'
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', '30'))
+LOG_RETENTION_BATCH_SIZE = int(os.getenv('LOG_RETENTION_BATCH_SIZE', '4000'))
+LOG_RETENTION_PAUSE_MS = int(os.getenv('LOG_RETENTION_PAUSE_MS', '200'))
+LOG_RETENTION_MAX_BATCHES = int(os.getenv('LOG_RETENTION_MAX_BATCHES', '500'))
+LOG_RETENTION_INTERVAL_HOURS = int(os.getenv('LOG_RETENTION_INTERVAL_HOURS', '6'))
@@ -73,7 +73,8 @@ class TemuApiClient:
         
         try:
 
-            log_service.log(job_id, "temu_api", "INFO", f"→ API Call: {api_type}")
+            log_service.log(job_id, "temu_api", "INFO", f"→ API Call: {api_type}", aggregate="api_call")
+            log_service.count("api_calls", job_id=job_id)
             
             # ===== DEBUG: Nur wenn --verbose! =====
             if self.verbose :
@@ -103,7 +104,7 @@ class TemuApiClient:
                               f"API Fehler ({error_code}): {error_msg}")
                 return None
             
-            log_service.log(job_id, "temu_api", "INFO", "✓ Response erfolgreich")  
+            log_service.log(job_id, "temu_api", "INFO", "✓ Response erfolgreich", aggregate="api_response")  
             
             return response_json
         
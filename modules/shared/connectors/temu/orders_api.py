@@ -1,6 +1,7 @@
 """TEMU Orders API - Get Orders"""
 
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 from .api_client import TemuApiClient
 from ...logging.log_service import log_service
 
@@ -83,82 +84,153 @@ class TemuOrdersApi:
         
         return self.client.call("bg.order.amount.query", request_params, job_id=job_id)
     
-    def upload_tracking_data(self, tracking_data_list, job_id: Optional[str] = None):
+    def upload_tracking_data(self, tracking_data_list, job_id: Optional[str] = None,
+                             batch_size: int = 50, max_workers: int = 4):
         """
         Lädt Tracking-Daten zu TEMU API hoch
         
         Args:
             tracking_data_list: Liste mit Tracking-Dicts
             job_id: Optional - für strukturiertes Logging
+            batch_size: Bestellartikel pro API-Call
+            max_workers: Parallele API-Calls (über Carrier und Chunks)
         
         Returns:
             Tuple: (success: bool, error_code: str, error_msg: str)
         """
+        result = self.upload_tracking_items(tracking_data_list, job_id=job_id,
+                                            batch_size=batch_size, max_workers=max_workers)
+        success = not result['failed']
+        return success, result['error_code'], result['error_msg']
+    
+    def upload_tracking_items(self, tracking_data_list, job_id: Optional[str] = None,
+                              batch_size: int = 50, max_workers: int = 4) -> Dict:
+        """
+        Lädt Tracking-Daten in Chunks pro Carrier hoch (parallel) und liefert das Ergebnis pro Item.
+        Schlägt ein Chunk fehl, wird er pro Bestellung wiederholt, damit eine fehlerhafte
+        Trackingnummer nicht die übrigen Bestellungen des Chunks blockiert.
+        
+        Args:
+            tracking_data_list: Liste mit Tracking-Dicts
+            job_id: Optional - für strukturiertes Logging
+            batch_size: Bestellartikel pro API-Call
+            max_workers: Parallele API-Calls
+        
+        Returns:
+            Dict: {'succeeded': [items], 'failed': [items], 'error_code': str, 'error_msg': str}
+        """
+        result = {'succeeded': [], 'failed': [], 'error_code': None, 'error_msg': None}
         
         if not tracking_data_list:
             log_service.log(job_id, "orders_api", "INFO", "Keine Tracking-Daten zum Upload")
-            return True, None, None
+            return result
         
-        # Gruppiere nach Carrier ID
-        by_carrier = {}
+        # Gruppiere nach Carrier ID, dann Chunks (Artikel einer Bestellung bleiben zusammen)
+        by_carrier: Dict[int, Dict[str, List[Dict]]] = {}
         for item in tracking_data_list:
             carrier_id = item.get('carrier_id', 960246690)
-            if carrier_id not in by_carrier:
-                by_carrier[carrier_id] = []
-            by_carrier[carrier_id].append(item)
+            by_carrier.setdefault(carrier_id, {}).setdefault(item['bestell_id'], []).append(item)
+        
+        chunks = []
+        for carrier_id, orders in by_carrier.items():
+            chunk: List[Dict] = []
+            for order_items in orders.values():
+                if chunk and len(chunk) + len(order_items) > batch_size:
+                    chunks.append((carrier_id, chunk))
+                    chunk = []
+                chunk.extend(order_items)
+            if chunk:
+                chunks.append((carrier_id, chunk))
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = [
+                executor.submit(self._upload_tracking_chunk, carrier_id, items, job_id)
+                for carrier_id, items in chunks
+            ]
+            for future in futures:
+                succeeded, failed, error_code, error_msg = future.result()
+                result['succeeded'].extend(succeeded)
+                result['failed'].extend(failed)
+                if failed:
+                    result['error_code'] = error_code
+                    result['error_msg'] = error_msg
         
-        success_count = 0
-        error_count = 0
-        last_error_code = None
-        last_error_msg = None
+        log_service.log(job_id, "orders_api", "INFO", 
+                          f"✓ Upload: {len(result['succeeded'])} erfolgreich, {len(result['failed'])} Fehler "
+                          f"({len(chunks)} Calls)")
         
-        for carrier_id, items in by_carrier.items():
-            send_request_list = []
-            
-            for item in items:
-                send_request_list.append({
-                    "carrierId": carrier_id,
-                    "orderSendInfoList": [
-                        {
-                            "orderSn": item['order_sn'],
-                            "parentOrderSn": item['bestell_id'],
-                            "quantity": item['quantity'],
-                        }
-                    ],
-                    "trackingNumber": item['tracking_number']
-                })
+        return result
+    
+    def _upload_tracking_chunk(self, carrier_id: int, items: List[Dict], job_id: Optional[str] = None):
+        """
+        Ein API-Call für einen Chunk; bei Fehler Einzel-Retry pro Bestellung.
+        
+        Returns:
+            Tuple: (succeeded: list, failed: list, error_code: str, error_msg: str)
+        """
+        ok, error_code, error_msg = self._confirm_shipment(carrier_id, items, job_id)
+        if ok:
+            return items, [], None, None
+        
+        by_order: Dict[str, List[Dict]] = {}
+        for item in items:
+            by_order.setdefault(item['bestell_id'], []).append(item)
+        if len(by_order) == 1:
+            return [], items, error_code, error_msg
+        
+        succeeded: List[Dict] = []
+        failed: List[Dict] = []
+        for order_items in by_order.values():
+            ok, code, msg = self._confirm_shipment(carrier_id, order_items, job_id)
+            if ok:
+                succeeded.extend(order_items)
+            else:
+                failed.extend(order_items)
+                error_code, error_msg = code, msg
+        return succeeded, failed, error_code, error_msg
+    
+    def _confirm_shipment(self, carrier_id: int, items: List[Dict], job_id: Optional[str] = None):
+        """
+        bg.logistics.shipment.v2.confirm für eine Liste von Bestellartikeln.
+        
+        Returns:
+            Tuple: (success: bool, error_code: str, error_msg: str)
+        """
+        send_request_list = []
+        
+        for item in items:
+            send_request_list.append({
+                "carrierId": carrier_id,
+                "orderSendInfoList": [
+                    {
+                        "orderSn": item['order_sn'],
+                        "parentOrderSn": item['bestell_id'],
+                        "quantity": item['quantity'],
+                    }
+                ],
+                "trackingNumber": item['tracking_number']
+            })
+        
+        request_params = {
+            "sendRequestList": send_request_list,
+            "sendType": 0
+        }
+        
+        try:
+            response = self.client.call("bg.logistics.shipment.v2.confirm", request_params, job_id=job_id)
             
-            request_params = {
-                "sendRequestList": send_request_list,
-                "sendType": 0
-            }
+            if response and response.get('success'):
+                for item in items:
+                    log_service.log(job_id, "orders_api", "INFO", 
+                                      f"✓ {item['order_sn']}: {item['tracking_number']}")
+                return True, None, None
             
-            try:
-                response = self.client.call("bg.logistics.shipment.v2.confirm", request_params, job_id=job_id)
+            error_code = response.get('errorCode', '?') if response else 'HTTP_ERROR'
+            error_msg = response.get('errorMsg', 'Unbekannter Fehler') if response else 'HTTP Error'
+            log_service.log(job_id, "orders_api", "ERROR", 
+                              f"API Fehler ({error_code}): {error_msg} [{len(items)} Artikel]")
+            return False, error_code, error_msg
                 
-                if response and response.get('success'):
-                    success_count += len(items)
-
-                    for item in items:
-                        log_service.log(job_id, "orders_api", "INFO", 
-                                          f"✓ {item['order_sn']}: {item['tracking_number']}")
-                else:
-                    error_count += len(items)
-                    last_error_code = response.get('errorCode', '?') if response else 'HTTP_ERROR'
-                    last_error_msg = response.get('errorMsg', 'Unbekannter Fehler') if response else 'HTTP Error'
-
-                    log_service.log(job_id, "orders_api", "ERROR", 
-                                      f"API Fehler ({last_error_code}): {last_error_msg}")
-                    
-            except Exception as e:
-                error_count += len(items)
-                last_error_msg = str(e)
-                log_service.log(job_id, "orders_api", "ERROR", f"Upload Fehler: {e}")
-
-        
-
-        log_service.log(job_id, "orders_api", "INFO", 
-                          f"✓ Upload: {success_count} erfolgreich, {error_count} Fehler")
-        
-        success = error_count == 0
-        return success, last_error_code, last_error_msg
\ No newline at end of file
+        except Exception as e:
+            log_service.log(job_id, "orders_api", "ERROR", f"Upload Fehler: {e}")
+            return False, None, str(e)
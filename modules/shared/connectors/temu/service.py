@@ -3,7 +3,7 @@
 import json
 from datetime import datetime, timedelta
 from typing import Dict, Optional
-from modules.temu.services.config import TEMU_API_RESPONSES_DIR
+from modules.temu.services.config import TEMU_API_RESPONSES_DIR, TRACKING_UPLOAD_BATCH_SIZE, TRACKING_UPLOAD_WORKERS
 from .api_client import TemuApiClient
 from .orders_api import TemuOrdersApi
 from .inventory_api import TemuInventoryApi
@@ -159,7 +159,25 @@ class TemuMarketplaceService(BaseMarketplaceConnector):
         Returns:
             Tuple: (success: bool, error_code: str, error_msg: str)
         """
-        return self.orders_api.upload_tracking_data(tracking_data, job_id=job_id)
+        return self.orders_api.upload_tracking_data(
+            tracking_data, job_id=job_id,
+            batch_size=TRACKING_UPLOAD_BATCH_SIZE, max_workers=TRACKING_UPLOAD_WORKERS
+        )
+    
+    def upload_tracking_items(self, tracking_data, job_id: Optional[str] = None) -> Dict:
+        """Upload Tracking-Daten zu TEMU API mit Ergebnis pro Bestellartikel
+        
+        Args:
+            tracking_data: Liste mit Tracking-Dicts
+            job_id: Optional - für strukturiertes Logging
+        
+        Returns:
+            Dict: {'succeeded': [items], 'failed': [items], 'error_code': str, 'error_msg': str}
+        """
+        return self.orders_api.upload_tracking_items(
+            tracking_data, job_id=job_id,
+            batch_size=TRACKING_UPLOAD_BATCH_SIZE, max_workers=TRACKING_UPLOAD_WORKERS
+        )
     
     # def fetch_inventory_skus(self, job_id: Optional[str] = None, page_size: int = 100) -> bool:
     #     """
@@ -6,7 +6,8 @@ from .connection import (
     get_engine,
     db_connect,
     close_all_engines,
+    is_deadlock,
     get_db  # Falls du die FastAPI Dependency auch exportieren willst
 )
 
-__all__ = ["get_engine", "db_connect", "close_all_engines", "get_db"]
\ No newline at end of file
+__all__ = ["get_engine", "db_connect", "close_all_engines", "get_db", "is_deadlock"]
\ No newline at end of file
@@ -71,6 +71,14 @@ def db_connect(database: str = 'toci'):
         conn.close()
 
 
+def is_deadlock(exc: BaseException) -> bool:
+    """True if exc is a SQL Server deadlock victim error (1205) - the transaction was rolled back."""
+    orig = getattr(exc, 'orig', exc)
+    sqlstate = orig.args[0] if getattr(orig, 'args', None) else None
+    message = str(orig).lower()
+    return sqlstate == '40001' or '(1205)' in message or 'deadlocked' in message
+
+
 def get_db(database: str = 'toci'):
     """FastAPI dependency yielding a Connection with transaction handling."""
     with db_connect(database) as conn:
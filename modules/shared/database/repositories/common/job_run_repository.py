@@ -0,0 +1,150 @@
+"""
+Job Run Repository - SQLAlchemy + Raw SQL
+Data Access Layer - Eine Zeile pro Job-Lauf (job_runs) für Dashboard-Statistiken
+"""
+
+import json
+from typing import Dict, Optional
+# Lazy import to avoid circular dependency
+def _get_log_service():
+    from ...logging.log_service import log_service
+    return log_service
+from ..base import BaseRepository
+
+class JobRunRepository(BaseRepository):
+    """
+    Data Access Layer - Job-Läufe mit Dauer, Status, Zählern und Step-Zeiten.
+    Erbt von BaseRepository (Standard DB = TOCI). Statistiken lesen nur job_runs,
+    nie scheduler_logs.
+    """
+
+    def ensure_table_exists(self) -> bool:
+        """Erstelle job_runs Tabelle wenn nicht vorhanden"""
+        try:
+            self._execute_stmt("""
+                IF OBJECT_ID('dbo.job_runs', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE [dbo].[job_runs] (
+                        [run_id] BIGINT PRIMARY KEY IDENTITY(1,1),
+                        [job_id] VARCHAR(255) NOT NULL,
+                        [job_type] VARCHAR(100) NOT NULL,
+                        [started_at] DATETIME2 NOT NULL,
+                        [finished_at] DATETIME2 NOT NULL,
+                        [duration_seconds] FLOAT NULL,
+                        [status] VARCHAR(20) NOT NULL,
+                        [orders_imported] INT NOT NULL DEFAULT 0,
+                        [skus_pushed] INT NOT NULL DEFAULT 0,
+                        [api_calls] INT NOT NULL DEFAULT 0,
+                        [errors] INT NOT NULL DEFAULT 0,
+                        [warnings] INT NOT NULL DEFAULT 0,
+                        [counters] NVARCHAR(MAX) NULL,
+                        [step_timings] NVARCHAR(MAX) NULL,
+                        [error_text] NVARCHAR(MAX) NULL,
+
+                        INDEX idx_job_runs_type_started (job_type, started_at),
+                        INDEX idx_job_runs_started (started_at),
+                        INDEX idx_job_runs_job_id (job_id)
+                    );
+                END
+            """)
+            return True
+        except Exception as e:
+            print(f"CRITICAL DB ERROR (job_runs Table): {e}")
+            return False
+
+    def insert_run(self, job_id: str, job_type: str, started_at, finished_at,
+                   duration_seconds: Optional[float], status: str,
+                   counters: Dict[str, int], step_timings: Dict[str, float],
+                   error_text: Optional[str] = None) -> bool:
+        """Speichere einen abgeschlossenen Job-Lauf"""
+        try:
+            self._execute_stmt("""
+                INSERT INTO [dbo].[job_runs]
+                (job_id, job_type, started_at, finished_at, duration_seconds, status,
+                 orders_imported, skus_pushed, api_calls, errors, warnings,
+                 counters, step_timings, error_text)
+                VALUES (:job_id, :job_type, :started_at, :finished_at, :duration_seconds, :status,
+                        :orders_imported, :skus_pushed, :api_calls, :errors, :warnings,
+                        :counters, :step_timings, :error_text)
+            """, {
+                "job_id": job_id,
+                "job_type": job_type,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "duration_seconds": duration_seconds,
+                "status": status,
+                "orders_imported": counters.get("orders_imported", 0),
+                "skus_pushed": counters.get("skus_pushed", 0),
+                "api_calls": counters.get("api_calls", 0),
+                "errors": counters.get("errors", 0),
+                "warnings": counters.get("warnings", 0),
+                "counters": json.dumps(counters),
+                "step_timings": json.dumps({k: round(v, 3) for k, v in step_timings.items()}),
+                "error_text": error_text
+            })
+            return True
+        except Exception as e:
+            # Nicht über log_service loggen: wird aus end_job_capture aufgerufen
+            print(f"JOB RUN INSERT FAILED: {e}")
+            return False
+
+    def get_statistics(self, job_filter: Optional[str] = None, days: int = 7) -> Dict:
+        """
+        Dashboard-Statistiken der letzten `days` Tage aus job_runs (Index auf started_at / job_type).
+
+        Args:
+            job_filter: job_type (z.B. 'sync_orders') oder job_id-Präfix (z.B. 'temu_orders')
+        """
+        try:
+            params = {"days": days}
+            where_sql = "WHERE started_at >= DATEADD(day, -:days, GETDATE())"
+            if job_filter:
+                where_sql += " AND (job_type = :job_type OR job_id LIKE :job_id_pattern)"
+                params["job_type"] = job_filter
+                params["job_id_pattern"] = job_filter if '%' in job_filter else f"{job_filter}%"
+
+            rows = self._fetch_all(f"""
+                SELECT job_type,
+                       COUNT(*) AS total_runs,
+                       SUM(CASE WHEN status = 'SUCCESS' THEN 1 ELSE 0 END) AS successful,
+                       SUM(CASE WHEN status <> 'SUCCESS' THEN 1 ELSE 0 END) AS failed,
+                       AVG(duration_seconds) AS avg_duration,
+                       MAX(duration_seconds) AS max_duration,
+                       MAX(started_at) AS last_run,
+                       SUM(orders_imported) AS orders_imported,
+                       SUM(skus_pushed) AS skus_pushed,
+                       SUM(api_calls) AS api_calls,
+                       SUM(errors) AS errors
+                FROM [dbo].[job_runs]
+                {where_sql}
+                GROUP BY job_type
+                ORDER BY job_type
+            """, params)
+            by_job_type = [dict(row._mapping) for row in rows]
+
+            totals = {
+                "total_runs": sum(r["total_runs"] for r in by_job_type),
+                "successful": sum(r["successful"] for r in by_job_type),
+                "failed": sum(r["failed"] for r in by_job_type),
+                "orders_imported": sum(r["orders_imported"] or 0 for r in by_job_type),
+                "skus_pushed": sum(r["skus_pushed"] or 0 for r in by_job_type),
+                "api_calls": sum(r["api_calls"] or 0 for r in by_job_type),
+                "errors": sum(r["errors"] or 0 for r in by_job_type),
+                "last_run": max((r["last_run"] for r in by_job_type), default=None)
+            }
+
+            last = self._fetch_one(f"""
+                SELECT TOP 1 job_id, job_type, started_at, duration_seconds, status, step_timings
+                FROM [dbo].[job_runs]
+                {where_sql}
+                ORDER BY started_at DESC
+            """, params)
+            last_run = dict(last._mapping) if last else None
+            if last_run and last_run.get("step_timings"):
+                last_run["step_timings"] = json.loads(last_run["step_timings"])
+
+            return {"days": days, **totals, "by_job_type": by_job_type, "last": last_run}
+
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "job_run_repository", "ERROR", f"JobRunRepository get_statistics: {e}")
+            return {}
@@ -3,13 +3,33 @@ Log Repository - SQLAlchemy + Raw SQL (Final)
 Data Access Layer - Strukturiertes Logging in SQL Server
 """
 
-from typing import Dict, List
+import base64
+import json
+import time
+from typing import Dict, List, Optional, Tuple
 # Lazy import to avoid circular dependency
 def _get_log_service():
     from ...logging.log_service import log_service
     return log_service
 from ..base import BaseRepository
 
+
+def _encode_cursor(timestamp: str, log_id: int) -> str:
+    """Opaker Cursor für get_logs_page (base64 von [timestamp, log_id])"""
+    raw = json.dumps([timestamp, log_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Gegenstück zu _encode_cursor. Raises: ValueError bei ungültigem Cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, log_id = json.loads(raw)
+        return str(timestamp), int(log_id)
+    except Exception:
+        raise ValueError(f"Ungültiger Cursor: {cursor}")
+
+
 class LogRepository(BaseRepository):
     """
     Data Access Layer - Strukturiertes Logging.
@@ -38,6 +58,19 @@ class LogRepository(BaseRepository):
                         INDEX idx_level (level)
                     );
                 END
+
+                -- Keyset-Pagination (ORDER BY timestamp DESC, log_id DESC), auch für bestehende Tabellen
+                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_scheduler_logs_keyset'
+                               AND object_id = OBJECT_ID('dbo.scheduler_logs'))
+                    CREATE INDEX idx_scheduler_logs_keyset
+                        ON [dbo].[scheduler_logs] (timestamp DESC, log_id DESC) INCLUDE (job_id, level);
+
+                -- job_id wird per Präfix (LIKE 'temu_orders%') gefiltert: über viele Läufe hinweg liefert
+                -- (job_id, timestamp, log_id) keine Sortierung -> Filter läuft als Rest-Prädikat auf
+                -- idx_scheduler_logs_keyset (job_id im INCLUDE), der eigene Index bringt nur Schreiblast
+                IF EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_scheduler_logs_job_keyset'
+                           AND object_id = OBJECT_ID('dbo.scheduler_logs'))
+                    DROP INDEX idx_scheduler_logs_job_keyset ON [dbo].[scheduler_logs];
             """)
             return True
         except Exception as e:
@@ -70,47 +103,122 @@ class LogRepository(BaseRepository):
             print(f"LOG INSERT FAILED: {e}")
             return False
 
-    def get_logs(self, job_id: str = None, level: str = None, 
-                 limit: int = 100, offset: int = 0) -> List[Dict]:
-        """Hole Logs mit optionalen Filtern (Read-Only)"""
+    def insert_logs(self, records: List[Dict]) -> int:
+        """
+        Speichere viele Log-Entries (Multi-Row INSERT, 200 Zeilen pro Statement).
+        Wird vom AsyncLogWriter Thread aufgerufen: Fehler nur per print, nie über log_service (Rekursion).
+
+        Args:
+            records: [{'job_id', 'job_type', 'level', 'message', 'status',
+                       'duration_seconds', 'error_text', 'timestamp'}, ...]
+        """
+        if not records:
+            return 0
+
+        chunk_size = 200  # 8 Parameter pro Zeile -> unter SQL Server 2100 Parameter Limit
+        columns = ("job_id", "job_type", "level", "message", "status",
+                   "duration_seconds", "error_text", "timestamp")
+        inserted = 0
+
+        try:
+            for i in range(0, len(records), chunk_size):
+                chunk = records[i:i + chunk_size]
+                values = ", ".join(
+                    "(" + ", ".join(f":{col}_{n}" for col in columns) + ")" for n in range(len(chunk))
+                )
+                params = {}
+                for n, record in enumerate(chunk):
+                    for col in columns:
+                        params[f"{col}_{n}"] = record.get(col)
+
+                self._execute_stmt(f"""
+                    INSERT INTO [dbo].[scheduler_logs]
+                    (job_id, job_type, level, message, status, duration_seconds, error_text, timestamp)
+                    VALUES {values}
+                """, params)
+                inserted += len(chunk)
+            return inserted
+        except Exception as e:
+            print(f"LOG BATCH INSERT FAILED: {e}")
+            return inserted
+
+    def get_logs(self, job_id: str = None, level: str = None,
+                 limit: int = 100, cursor: Optional[str] = None) -> List[Dict]:
+        """Hole Logs mit optionalen Filtern (Read-Only, eine Seite ab cursor)"""
+        logs, _ = self.get_logs_page(job_id, level, limit, cursor)
+        return logs
+
+    def get_logs_page(self, job_id: str = None, level: str = None,
+                      limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Keyset-Pagination über (timestamp, log_id) absteigend: jede Seite kostet gleich viel,
+        unabhängig von der Tiefe (kein OFFSET). Nutzt idx_scheduler_logs_keyset; der job_id
+        Präfix-Filter und level sind Rest-Prädikate auf dem sortierten Scan (beide im INCLUDE),
+        TOP bricht ab sobald die Seite voll ist.
+
+        Args:
+            cursor: next_cursor der vorherigen Seite (opak), None = neueste Einträge
+
+        Returns:
+            (logs, next_cursor) - next_cursor None auf der letzten Seite
+
+        Raises:
+            ValueError: ungültiger Cursor
+        """
+        where_clauses = []
+        params = {}
+
+        if job_id:
+            # job_id kommt vom Frontend bereits als LIKE-Pattern z.B. "temu_orders%"
+            # Wenn es kein % enthält, fügen wir % hinzu für Präfix-Matching
+            if '%' in job_id:
+                where_clauses.append("job_id LIKE :job_id_pattern")
+                params["job_id_pattern"] = job_id
+            else:
+                where_clauses.append("job_id LIKE :job_id_pattern")
+                params["job_id_pattern"] = f"{job_id}%"
+
+        if level:
+            where_clauses.append("level = :level")
+            params["level"] = level
+
+        if cursor:
+            # Zeitstempel als String mit voller DATETIME2 Präzision (Python datetime kennt nur µs)
+            params["cursor_ts"], params["cursor_id"] = _decode_cursor(cursor)
+            where_clauses.append(
+                "(timestamp < CAST(:cursor_ts AS DATETIME2)"
+                " OR (timestamp = CAST(:cursor_ts AS DATETIME2) AND log_id < :cursor_id))"
+            )
+
+        where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
+
+        # Eine Zeile mehr lesen, um zu wissen ob es eine nächste Seite gibt
+        params["limit"] = limit + 1
+
         try:
-            where_clauses = []
-            params = {}
-            
-            if job_id:
-                # job_id kommt vom Frontend bereits als LIKE-Pattern z.B. "temu_orders%"
-                # Wenn es kein % enthält, fügen wir % hinzu für Präfix-Matching
-                if '%' in job_id:
-                    where_clauses.append("job_id LIKE :job_id_pattern")
-                    params["job_id_pattern"] = job_id
-                else:
-                    where_clauses.append("job_id LIKE :job_id_pattern")
-                    params["job_id_pattern"] = f"{job_id}%"
-            
-            if level:
-                where_clauses.append("level = :level")
-                params["level"] = level
-            
-            where_sql = "WHERE " + " AND ".join(where_clauses) if where_clauses else ""
-            
-            params["limit"] = limit
-            params["offset"] = offset
-            
             sql = f"""
-                SELECT log_id, job_id, job_type, level, message, timestamp, 
-                       duration_seconds, status, error_text
+                SELECT TOP (:limit) log_id, job_id, job_type, level, message, timestamp,
+                       duration_seconds, status, error_text,
+                       CONVERT(VARCHAR(27), timestamp, 126) AS cursor_ts
                 FROM [dbo].[scheduler_logs]
                 {where_sql}
-                ORDER BY timestamp DESC
-                OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY
+                ORDER BY timestamp DESC, log_id DESC
             """
-            
-            rows = self._fetch_all(sql, params)
-            return [dict(row._mapping) for row in rows]
+
+            rows = [dict(row._mapping) for row in self._fetch_all(sql, params)]
 
         except Exception as e:
             _get_log_service().log("SYSTEM_ERROR", "log_repository", "ERROR", f"LogRepository get_logs: {e}")
-            return []
+            return [], None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]["cursor_ts"], rows[-1]["log_id"])
+
+        for row in rows:
+            row.pop("cursor_ts", None)
+        return rows, next_cursor
 
     def get_recent_logs(self, job_id: str, limit: int = 100) -> List[Dict]:
         """Hole aktuelle Logs für einen Job"""
@@ -151,15 +259,42 @@ class LogRepository(BaseRepository):
             _get_log_service().log("SYSTEM_ERROR", "log_repository", "ERROR", f"LogRepository get_job_stats: {e}")
             return {}
 
-    def clean_old_logs(self, days: int = 30) -> int:
-        """Lösche alte Logs"""
+    def clean_old_logs(self, days: int = 30, batch_size: int = 4000,
+                       pause_ms: int = 200, max_batches: Optional[int] = None) -> int:
+        """
+        Lösche alte Logs in Batches (je eigene kurze Transaktion, Pause dazwischen).
+        batch_size unter 5000 -> keine Lock Escalation auf die Tabelle, insert_log/insert_logs laufen weiter.
+
+        Returns:
+            Anzahl gelöschter Zeilen
+        """
+        deleted = 0
+        batches = 0
         try:
-            sql = """
-                DELETE FROM [dbo].[scheduler_logs]
-                WHERE timestamp < DATEADD(day, -:days, GETDATE())
-            """
-            result = self._execute_stmt(sql, {"days": days})
-            return result.rowcount
+            while max_batches is None or batches < max_batches:
+                count = self.delete_old_logs_batch(days, batch_size)
+                deleted += count
+                batches += 1
+                if count < batch_size:
+                    break
+                time.sleep(pause_ms / 1000)
+            return deleted
         except Exception as e:
             _get_log_service().log("SYSTEM_ERROR", "log_repository", "ERROR", f"LogRepository clean_old_logs: {e}")
-            return 0
\ No newline at end of file
+            return deleted
+
+    def delete_old_logs_batch(self, days: int, batch_size: int) -> int:
+        """
+        Ein Retention-Batch: älteste batch_size Zeilen vor dem Stichtag (Seek über idx_timestamp).
+        READPAST überspringt gesperrte Zeilen, ROWLOCK hält die Sperren klein.
+        """
+        result = self._execute_stmt("""
+            WITH old_logs AS (
+                SELECT TOP (:batch_size) log_id
+                FROM [dbo].[scheduler_logs] WITH (READPAST, ROWLOCK)
+                WHERE timestamp < DATEADD(day, -:days, GETDATE())
+                ORDER BY timestamp
+            )
+            DELETE FROM old_logs;
+        """, {"days": days, "batch_size": batch_size})
+        return result.rowcount
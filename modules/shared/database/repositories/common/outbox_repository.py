@@ -0,0 +1,296 @@
+"""
+Outbox Repository - SQLAlchemy + Raw SQL
+Data Access Layer - Transactional Outbox für Pushes zu Marktplätzen (temu_push_outbox)
+"""
+
+import json
+from typing import Dict, List, Optional, Set
+from sqlalchemy import text, bindparam
+# Lazy import to avoid circular dependency
+def _get_log_service():
+    from ...logging.log_service import log_service
+    return log_service
+from ..base import BaseRepository
+
+# Nicht abgeschlossene Intents: nur gegen diese wird per idempotency_key dedupliziert
+# (ein früher gesendeter Wert, z.B. Bestand 5 -> 3 -> 5, muss erneut eingereiht werden können).
+# 'dead' blockiert nicht: der nächste Lauf reiht denselben Wert neu ein und ersetzt den toten Intent.
+OPEN_STATUSES = "('pending', 'processing', 'failed')"
+
+# Noch nicht zugestellte Intents (inkl. 'dead'): halten Folge-Updates wie temu_gemeldet zurück
+UNDELIVERED_STATUSES = "('pending', 'processing', 'failed', 'dead')"
+
+class OutboxRepository(BaseRepository):
+    """
+    Data Access Layer - Push-Intents (Stock, Tracking) mit Idempotency Key und Status pro Item.
+    Erbt von BaseRepository (Standard DB = TOCI). Enqueue läuft in der Transaktion des Workflows,
+    Claim/Ergebnis in kurzen eigenen Transaktionen des Dispatchers.
+
+    Status-Flow: pending -> processing -> done | failed (Retry mit Backoff) -> dead
+                 pending/failed/dead -> superseded (neuerer Intent für denselben ref_key)
+                 dead -> pending (redrive_dead, manuell - sonst beim nächsten Enqueue ersetzt)
+
+    ref_key ist die Einheit, die ein neuer Intent ersetzt: Stock = Inventory-ID,
+    Tracking = orderSn (ein Intent pro Bestellartikel, ref_id ist die Order).
+    """
+
+    def ensure_table_exists(self) -> bool:
+        """Erstelle Outbox-Tabelle wenn nicht vorhanden"""
+        try:
+            self._execute_stmt("""
+                IF OBJECT_ID('dbo.temu_push_outbox', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE [dbo].[temu_push_outbox] (
+                        [id] BIGINT PRIMARY KEY IDENTITY(1,1),
+                        [push_type] VARCHAR(20) NOT NULL,
+                        [ref_id] INT NOT NULL,
+                        [idempotency_key] VARCHAR(200) NOT NULL,
+                        [ref_key] VARCHAR(100) NULL,
+                        [payload] NVARCHAR(MAX) NOT NULL,
+                        [status] VARCHAR(20) NOT NULL DEFAULT 'pending',
+                        [attempts] INT NOT NULL DEFAULT 0,
+                        [next_attempt_at] DATETIME2 NOT NULL DEFAULT GETDATE(),
+                        [locked_until] DATETIME2 NULL,
+                        [last_error] NVARCHAR(MAX) NULL,
+                        [created_at] DATETIME2 NOT NULL DEFAULT GETDATE(),
+                        [updated_at] DATETIME2 NOT NULL DEFAULT GETDATE(),
+                        [processed_at] DATETIME2 NULL,
+
+                        INDEX idx_temu_push_outbox_claim (push_type, status, next_attempt_at),
+                        INDEX idx_temu_push_outbox_ref (push_type, ref_id)
+                    );
+                END
+
+                -- Migration: Key nur unter offenen Intents eindeutig (früher UNIQUE über die ganze Historie)
+                IF EXISTS (SELECT * FROM sys.objects WHERE name = 'uq_temu_push_outbox_key'
+                           AND parent_object_id = OBJECT_ID('dbo.temu_push_outbox'))
+                    ALTER TABLE [dbo].[temu_push_outbox] DROP CONSTRAINT uq_temu_push_outbox_key;
+
+                -- Migration: 'dead' gehört nicht mehr zu den offenen Intents
+                IF EXISTS (SELECT * FROM sys.indexes WHERE name = 'uq_temu_push_outbox_open_key'
+                           AND object_id = OBJECT_ID('dbo.temu_push_outbox')
+                           AND filter_definition LIKE '%dead%')
+                    DROP INDEX uq_temu_push_outbox_open_key ON [dbo].[temu_push_outbox];
+
+                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'uq_temu_push_outbox_open_key'
+                               AND object_id = OBJECT_ID('dbo.temu_push_outbox'))
+                    CREATE UNIQUE INDEX uq_temu_push_outbox_open_key
+                        ON [dbo].[temu_push_outbox] (idempotency_key)
+                        WHERE status IN ('pending', 'processing', 'failed');
+
+                -- Migration: ref_key (Ersetzen pro Bestellartikel statt pro Order)
+                IF COL_LENGTH('dbo.temu_push_outbox', 'ref_key') IS NULL
+                BEGIN
+                    ALTER TABLE [dbo].[temu_push_outbox] ADD [ref_key] VARCHAR(100) NULL;
+                    EXEC('UPDATE [dbo].[temu_push_outbox] SET ref_key = CASE push_type
+                              WHEN ''tracking'' THEN JSON_VALUE(payload, ''$.order_sn'')
+                              ELSE CAST(ref_id AS VARCHAR(100)) END');
+                END
+
+                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'idx_temu_push_outbox_ref_key'
+                               AND object_id = OBJECT_ID('dbo.temu_push_outbox'))
+                    EXEC('CREATE INDEX idx_temu_push_outbox_ref_key ON [dbo].[temu_push_outbox] (push_type, ref_key)');
+            """)
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository ensure_table_exists: {e}")
+            return False
+
+    def enqueue(self, push_type: str, intents: List[Dict]) -> int:
+        """
+        Reiht Push-Intents ein (idempotent über idempotency_key unter den offenen Intents)
+        und markiert ältere, noch nicht gesendete Intents desselben ref_key als 'superseded'.
+        Abgeschlossene (done/superseded) und aufgegebene (dead) Intents mit gleichem Key blockieren nicht.
+
+        Args:
+            push_type: 'stock' oder 'tracking'
+            intents: [{'ref_id': 1, 'ref_key': '1', 'idempotency_key': 'stock:1:5', 'payload': {...}}, ...]
+        """
+        if not intents:
+            return 0
+
+        # Kein try/except: Enqueue ist Teil der Workflow-Transaktion und soll mit ihr zurückrollen
+        sql = f"""
+            MERGE [dbo].[temu_push_outbox] WITH (HOLDLOCK) AS t
+            USING (SELECT :idempotency_key AS idempotency_key) AS s
+            ON t.idempotency_key = s.idempotency_key AND t.status IN {OPEN_STATUSES}
+            WHEN NOT MATCHED THEN INSERT (push_type, ref_id, ref_key, idempotency_key, payload)
+                VALUES (:push_type, :ref_id, :ref_key, :idempotency_key, :payload);
+        """
+        params = [
+            {
+                "push_type": push_type,
+                "ref_id": it["ref_id"],
+                "ref_key": str(it["ref_key"]),
+                "idempotency_key": it["idempotency_key"],
+                "payload": json.dumps(it["payload"], ensure_ascii=False, default=str)
+            }
+            for it in intents
+        ]
+        self._execute_stmt(sql, params)
+
+        self._execute_stmt("""
+            UPDATE o SET status = 'superseded', updated_at = GETDATE()
+            FROM [dbo].[temu_push_outbox] o
+            WHERE o.push_type = :push_type
+              AND o.status IN ('pending', 'failed', 'dead')
+              AND EXISTS (
+                  SELECT 1 FROM [dbo].[temu_push_outbox] n
+                  WHERE n.push_type = o.push_type
+                    AND n.ref_key = o.ref_key
+                    AND n.id > o.id
+                    AND n.status IN ('pending', 'failed', 'processing')
+              )
+        """, {"push_type": push_type})
+        return len(params)
+
+    def claim_batch(self, push_type: str, limit: int = 500, lock_minutes: int = 5) -> List[Dict]:
+        """
+        Reserviert fällige Intents für diesen Dispatcher (READPAST: parallele Dispatcher
+        überspringen gesperrte Zeilen). Hängengebliebene 'processing' Zeilen werden nach
+        Ablauf von locked_until erneut vergeben.
+        """
+        try:
+            sql = f"""
+                WITH due AS (
+                    SELECT TOP ({int(limit)}) *
+                    FROM [dbo].[temu_push_outbox] WITH (ROWLOCK, READPAST, UPDLOCK)
+                    WHERE push_type = :push_type
+                      AND (
+                          (status IN ('pending', 'failed') AND next_attempt_at <= GETDATE())
+                          OR (status = 'processing' AND locked_until < GETDATE())
+                      )
+                    ORDER BY id
+                )
+                UPDATE due SET
+                    status = 'processing',
+                    attempts = attempts + 1,
+                    locked_until = DATEADD(minute, :lock_minutes, GETDATE()),
+                    updated_at = GETDATE()
+                OUTPUT inserted.id, inserted.ref_id, inserted.idempotency_key,
+                       inserted.payload, inserted.attempts;
+            """
+            rows = self._fetch_all(sql, {"push_type": push_type, "lock_minutes": lock_minutes})
+            return [
+                {**dict(row._mapping), "payload": json.loads(row._mapping["payload"])}
+                for row in rows
+            ]
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository claim_batch: {e}")
+            return []
+
+    def mark_done(self, ids: List[int]) -> int:
+        """Markiere Intents als erfolgreich gesendet"""
+        return self._update_status(ids, """
+            UPDATE [dbo].[temu_push_outbox] SET
+                status = 'done',
+                locked_until = NULL,
+                last_error = NULL,
+                processed_at = GETDATE(),
+                updated_at = GETDATE()
+            WHERE id IN :ids
+        """, {})
+
+    def mark_failed(self, ids: List[int], error: str, max_attempts: int = 10) -> int:
+        """Markiere Intents als fehlgeschlagen (exponentieller Backoff 30s..1h, danach 'dead')"""
+        return self._update_status(ids, """
+            UPDATE [dbo].[temu_push_outbox] SET
+                status = CASE WHEN attempts >= :max_attempts THEN 'dead' ELSE 'failed' END,
+                next_attempt_at = DATEADD(second,
+                    CASE WHEN attempts >= 8 THEN 3600 ELSE 30 * POWER(2, attempts - 1) END,
+                    GETDATE()),
+                locked_until = NULL,
+                last_error = :error,
+                updated_at = GETDATE()
+            WHERE id IN :ids
+        """, {"error": error, "max_attempts": max_attempts})
+
+    def get_open_refs(self, push_type: str, ref_ids: List[int]) -> Set[int]:
+        """Referenzen, für die noch nicht zugestellte Intents existieren (inkl. 'dead')"""
+        if not ref_ids:
+            return set()
+
+        refs = list(set(ref_ids))
+        open_refs: Set[int] = set()
+        chunk_size = 1000
+
+        try:
+            for i in range(0, len(refs), chunk_size):
+                chunk = refs[i:i + chunk_size]
+                sql = text(f"""
+                    SELECT DISTINCT ref_id
+                    FROM [dbo].[temu_push_outbox]
+                    WHERE push_type = :push_type
+                      AND ref_id IN :ref_ids
+                      AND status IN {UNDELIVERED_STATUSES}
+                """).bindparams(bindparam('ref_ids', expanding=True))
+                rows = self._fetch_all(sql, {"push_type": push_type, "ref_ids": chunk})
+                open_refs.update(int(row[0]) for row in rows)
+            return open_refs
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository get_open_refs: {e}")
+            return set(refs)
+
+    def redrive_dead(self, push_type: str, ref_ids: Optional[List[int]] = None) -> int:
+        """
+        Setzt 'dead' Intents zurück auf 'pending' (attempts = 0, sofort fällig), z.B. nachdem
+        die Ursache (Carrier-Mapping, Credentials, ...) behoben ist.
+
+        Args:
+            ref_ids: nur diese Referenzen (temu_orders.id / temu_inventory.id), None = alle
+        """
+        # Nicht, wenn derselbe Key inzwischen neu eingereiht ist (eindeutiger Index über offene Intents)
+        sql = f"""
+            UPDATE o SET
+                status = 'pending',
+                attempts = 0,
+                next_attempt_at = GETDATE(),
+                locked_until = NULL,
+                updated_at = GETDATE()
+            FROM [dbo].[temu_push_outbox] o
+            WHERE o.push_type = :push_type
+              AND o.status = 'dead'
+              AND NOT EXISTS (
+                  SELECT 1 FROM [dbo].[temu_push_outbox] n
+                  WHERE n.idempotency_key = o.idempotency_key
+                    AND n.status IN {OPEN_STATUSES}
+              )
+        """
+        if ref_ids is None:
+            try:
+                return self._execute_stmt(sql, {"push_type": push_type}).rowcount
+            except Exception as e:
+                _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository redrive_dead: {e}")
+                return 0
+
+        redriven = 0
+        chunk_size = 1000
+        refs = list(set(ref_ids))
+        try:
+            for i in range(0, len(refs), chunk_size):
+                stmt = text(sql + " AND o.ref_id IN :ref_ids").bindparams(bindparam('ref_ids', expanding=True))
+                result = self._execute_stmt(stmt, {"push_type": push_type, "ref_ids": refs[i:i + chunk_size]})
+                redriven += result.rowcount
+            return redriven
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository redrive_dead: {e}")
+            return redriven
+
+    def _update_status(self, ids: List[int], sql: str, params: Dict) -> int:
+        """Helper: Status-Update in 1.000er Chunks (SQL Server 2100 Parameter Limit)"""
+        if not ids:
+            return 0
+
+        chunk_size = 1000
+        updated = 0
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                stmt = text(sql).bindparams(bindparam('ids', expanding=True))
+                result = self._execute_stmt(stmt, {**params, "ids": chunk})
+                updated += result.rowcount
+            return updated
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "outbox_repository", "ERROR", f"OutboxRepository _update_status: {e}")
+            return 0
@@ -0,0 +1,62 @@
+"""
+Sync State Repository - SQLAlchemy + Raw SQL
+Data Access Layer - Watermarks für inkrementelle Syncs (z.B. JTL Change Tracking Version)
+"""
+
+from typing import Optional
+# Lazy import to avoid circular dependency
+def _get_log_service():
+    from ...logging.log_service import log_service
+    return log_service
+from ..base import BaseRepository
+
+class SyncStateRepository(BaseRepository):
+    """
+    Data Access Layer - Benannte Watermarks in TOCI.
+    Erbt von BaseRepository (Standard DB = TOCI), damit der Watermark in derselben
+    Transaktion wie die synchronisierten Daten committed wird.
+    """
+
+    def ensure_table_exists(self) -> bool:
+        """Erstelle Watermark-Tabelle wenn nicht vorhanden"""
+        try:
+            self._execute_stmt("""
+                IF OBJECT_ID('dbo.sync_watermarks', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE [dbo].[sync_watermarks] (
+                        [sync_name] VARCHAR(100) NOT NULL PRIMARY KEY,
+                        [last_value] BIGINT NOT NULL,
+                        [updated_at] DATETIME2 NOT NULL DEFAULT GETDATE()
+                    );
+                END
+            """)
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "sync_state_repository", "ERROR", f"SyncStateRepository ensure_table_exists: {e}")
+            return False
+
+    def get_watermark(self, sync_name: str) -> Optional[int]:
+        """Hole Watermark (None = noch kein Lauf)"""
+        try:
+            row = self._fetch_one("""
+                SELECT last_value FROM [dbo].[sync_watermarks] WHERE sync_name = :sync_name
+            """, {"sync_name": sync_name})
+            return int(row[0]) if row else None
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "sync_state_repository", "ERROR", f"SyncStateRepository get_watermark: {e}")
+            return None
+
+    def set_watermark(self, sync_name: str, value: int) -> bool:
+        """Setze Watermark (Upsert)"""
+        try:
+            self._execute_stmt("""
+                MERGE [dbo].[sync_watermarks] AS t
+                USING (SELECT :sync_name AS sync_name, :last_value AS last_value) AS s
+                ON t.sync_name = s.sync_name
+                WHEN MATCHED THEN UPDATE SET last_value = s.last_value, updated_at = GETDATE()
+                WHEN NOT MATCHED THEN INSERT (sync_name, last_value) VALUES (s.sync_name, s.last_value);
+            """, {"sync_name": sync_name, "last_value": value})
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "sync_state_repository", "ERROR", f"SyncStateRepository set_watermark: {e}")
+            return False
@@ -0,0 +1,168 @@
+"""Customer Mirror Repository - Lokale Kopie der JTL Kunden-E-Mails in TOCI"""
+
+from typing import Optional, Dict, List
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Connection
+# Lazy import to avoid circular dependency
+def _get_log_service():
+    from ...logging.log_service import log_service
+    return log_service
+from ...connection import is_deadlock
+from ....config.settings import DB_TOCI
+from ..base import BaseRepository
+
+class CustomerMirrorRepository(BaseRepository):
+    """
+    Data Access Layer - Spiegel von eazybusiness.Kunde.lvKunde (E-Mail → cKundenNr).
+    Liegt in TOCI, damit Kunden-Lookups lokale Index-Seeks sind und JTL nicht belasten.
+    """
+
+    def __init__(self, connection: Optional[Connection] = None):
+        """Optionale injizierte Connection; Tabelle liegt in TOCI."""
+        super().__init__(connection, db_name=DB_TOCI)
+
+    def ensure_table_exists(self) -> bool:
+        """Erstelle Spiegel-Tabelle wenn nicht vorhanden"""
+        try:
+            self._execute_stmt("""
+                IF OBJECT_ID('dbo.jtl_customer_mirror', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE [dbo].[jtl_customer_mirror] (
+                        [kKunde] INT NOT NULL PRIMARY KEY,
+                        [email_normalized] NVARCHAR(255) NOT NULL,
+                        [cKundenNr] NVARCHAR(30) NULL,
+                        [synced_at] DATETIME NOT NULL DEFAULT GETDATE()
+                    );
+
+                    CREATE INDEX idx_jtl_customer_mirror_email
+                        ON [dbo].[jtl_customer_mirror] (email_normalized, kKunde DESC)
+                        INCLUDE (cKundenNr);
+                END
+            """)
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository ensure_table_exists: {e}")
+            return False
+
+    def get_watermark(self) -> int:
+        """Höchster bereits gespiegelter kKunde (0 wenn leer)"""
+        try:
+            row = self._fetch_one("SELECT MAX(kKunde) FROM [dbo].[jtl_customer_mirror]")
+            return int(row[0]) if row and row[0] is not None else 0
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository get_watermark: {e}")
+            return 0
+
+    def get_server_time(self):
+        """Aktuelle DB-Zeit (gleiche Uhr wie synced_at) - Startmarke für den Voll-Abgleich"""
+        try:
+            row = self._fetch_one("SELECT GETDATE()")
+            return row[0] if row else None
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository get_server_time: {e}")
+            return None
+
+    def delete_not_synced_since(self, started_at) -> int:
+        """
+        Nach vollständigem Voll-Abgleich: Kunden entfernen, die JTL nicht mehr (mit E-Mail) liefert.
+        Nur aufrufen, wenn alle Seiten erfolgreich gespiegelt wurden.
+        """
+        try:
+            result = self._execute_stmt("""
+                DELETE FROM [dbo].[jtl_customer_mirror] WHERE synced_at < :started_at
+            """, {"started_at": started_at})
+            return result.rowcount
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository delete_not_synced_since: {e}")
+            return 0
+
+    def upsert_customers(self, customers: List[Dict]) -> int:
+        """
+        Upsert Kunden via MERGE (executemany).
+
+        Args:
+            customers: Liste von Dicts [{'kKunde': 1, 'email_normalized': 'a@b.de', 'cKundenNr': '10001'}, ...]
+        """
+        if not customers:
+            return 0
+
+        try:
+            sql = """
+                MERGE [dbo].[jtl_customer_mirror] AS t
+                USING (SELECT :kKunde AS kKunde, :email_normalized AS email_normalized,
+                              :cKundenNr AS cKundenNr) AS s
+                ON t.kKunde = s.kKunde
+                WHEN MATCHED THEN UPDATE SET
+                    email_normalized = s.email_normalized,
+                    cKundenNr = s.cKundenNr,
+                    synced_at = GETDATE()
+                WHEN NOT MATCHED THEN INSERT (kKunde, email_normalized, cKundenNr)
+                    VALUES (s.kKunde, s.email_normalized, s.cKundenNr);
+            """
+            self._execute_stmt(sql, customers)
+            return len(customers)
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository upsert_customers: {e}")
+            return 0
+
+    def get_customer_number_by_email(self, email: str) -> Optional[str]:
+        """Hole Kundennummer per normalisierter E-Mail (neuester Kunde gewinnt)."""
+        if not email:
+            return None
+        try:
+            sql = """
+                SELECT TOP 1 [cKundenNr]
+                FROM [dbo].[jtl_customer_mirror]
+                WHERE [email_normalized] = :email
+                ORDER BY [kKunde] DESC
+            """
+            row = self._fetch_one(sql, {"email": email})
+            return row[0] if row and row[0] else None
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository get_customer_number_by_email: {e}")
+            return None
+
+    def get_customer_numbers_by_emails(self, emails: List[str]) -> Dict[str, str]:
+        """
+        Hole Kundennummern für viele normalisierte E-Mails (Batch).
+        Chunking bei 1.000 Werten wegen SQL Server 2100 Parameter Limit.
+        """
+        if not emails:
+            return {}
+
+        keys = list(set(emails))
+        result_map: Dict[str, str] = {}
+        chunk_size = 1000
+
+        try:
+            for i in range(0, len(keys), chunk_size):
+                chunk = keys[i:i + chunk_size]
+
+                # Pro E-Mail der neueste Kunde (höchster kKunde), analog zum Einzel-Lookup
+                sql = text("""
+                    SELECT email_normalized, cKundenNr
+                    FROM (
+                        SELECT email_normalized, cKundenNr,
+                               ROW_NUMBER() OVER (PARTITION BY email_normalized ORDER BY kKunde DESC) AS rn
+                        FROM [dbo].[jtl_customer_mirror]
+                        WHERE email_normalized IN :emails
+                    ) x
+                    WHERE rn = 1
+                """).bindparams(bindparam('emails', expanding=True))
+                rows = self._fetch_all(sql, {"emails": chunk})
+                for row in rows:
+                    if row[1]:
+                        result_map[row[0]] = row[1]
+
+            return result_map
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "customer_mirror_repository", "ERROR", f"CustomerMirrorRepository get_customer_numbers_by_emails: {e}")
+            return {}
@@ -7,9 +7,19 @@ from sqlalchemy.engine import Connection
 def _get_log_service():
     from ...logging.log_service import log_service
     return log_service
+from ...connection import is_deadlock
 from ....config.settings import DB_JTL
 from ..base import BaseRepository
 
+
+def normalize_sku(sku: str) -> str:
+    """
+    Vergleichsschlüssel für cArtNr: SQL Server vergleicht case-insensitiv (CI Collation)
+    und ignoriert nachgestellte Leerzeichen - Python-Dicts müssen das nachbilden.
+    """
+    return (sku or "").rstrip().upper()
+
+
 class JtlRepository(BaseRepository):
     """Data Access Layer - ONLY JTL DB Operations"""
     
@@ -26,9 +36,38 @@ class JtlRepository(BaseRepository):
             """, {"xml_string": xml_string})
             return True
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL insert_xml_import: {e}")
             return False
     
+    def insert_xml_imports(self, xml_strings: List[str]) -> int:
+        """
+        Importiere viele XMLs in JTL tXMLBestellImport (Multi-Row INSERT, 500 Zeilen pro Statement).
+        Bei Fehler 0 - der Aufrufer fällt dann auf insert_xml_import pro Order zurück.
+        """
+        if not xml_strings:
+            return 0
+
+        chunk_size = 500
+        inserted = 0
+
+        try:
+            for i in range(0, len(xml_strings), chunk_size):
+                chunk = xml_strings[i:i + chunk_size]
+                values = ", ".join(f"(:xml_{n}, 5, 0)" for n in range(len(chunk)))
+                self._execute_stmt(f"""
+                    INSERT INTO [dbo].[tXMLBestellImport] (cText, nPlattform, nRechnung)
+                    VALUES {values}
+                """, {f"xml_{n}": xml for n, xml in enumerate(chunk)})
+                inserted += len(chunk)
+            return inserted
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL insert_xml_imports: {e}")
+            return inserted
+    
     def get_imported_orders(self) -> Dict[str, bool]:
         """Hole Orders die schon importiert wurden"""
         try:
@@ -108,6 +147,46 @@ class JtlRepository(BaseRepository):
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_article_id_by_sku: {e}")
             return None
     
+    def get_article_ids_by_skus(self, skus: List[str]) -> Dict[str, int]:
+        """
+        Hole JTL Artikel-IDs für viele SKUs gleichzeitig (Batch).
+        Chunking bei 1.000 SKUs wegen SQL Server 2100 Parameter Limit.
+
+        Returns:
+            {normalize_sku(cArtNr): kArtikel} - Lookup daher mit normalize_sku(sku)
+        """
+        if not skus:
+            return {}
+
+        # Deduplizieren (Schreibvarianten derselben SKU trifft SQL Server ohnehin gemeinsam)
+        sku_list = list({normalize_sku(sku): sku for sku in skus if sku}.values())
+        result_map = {}
+        chunk_size = 1000
+
+        try:
+            for i in range(0, len(sku_list), chunk_size):
+                chunk = sku_list[i:i + chunk_size]
+
+                # Bei doppelter cArtNr gewinnt (wie TOP 1) der erste Treffer
+                sql = text("""
+                    SELECT [cArtNr], MIN([kArtikel]) AS kArtikel
+                    FROM [eazybusiness].[dbo].[tArtikel]
+                    WHERE [cArtNr] IN :skus
+                    GROUP BY [cArtNr]
+                """).bindparams(bindparam('skus', expanding=True))
+                rows = self._fetch_all(sql, {"skus": chunk})
+                for row in rows:
+                    key = normalize_sku(row[0])
+                    # Mehrere cArtNr-Schreibweisen auf einen Schlüssel: kleinste kArtikel wie MIN()
+                    if key not in result_map or int(row[1]) < result_map[key]:
+                        result_map[key] = int(row[1])
+
+            return result_map
+
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_article_ids_by_skus: {e}")
+            return {}
+
     def get_stock_by_article_id(self, article_id: int) -> int:
         """Hole Bestand aus JTL pro Artikel-ID"""
         try:
@@ -131,11 +210,14 @@ class JtlRepository(BaseRepository):
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_stock_by_article_id: {e}")
             return 0
     
-    def get_stocks_by_article_ids(self, article_ids: List[int]) -> Dict[int, float]:
+    def get_stocks_by_article_ids(self, article_ids: List[int]) -> Optional[Dict[int, float]]:
         """
         Hole Bestände für viele Artikel gleichzeitig (Batch).
         Verhindert das N+1 Problem.
         Chunking bei 1.000 IDs wegen SQL Server 2100 Parameter Limit.
+        
+        Returns:
+            {kArtikel: verfügbarer Bestand} oder None bei Fehler (nicht mit "kein Bestand" verwechseln)
         """
         if not article_ids:
             return {}
@@ -172,8 +254,50 @@ class JtlRepository(BaseRepository):
             
         except Exception as e:
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_stocks_by_article_ids: {e}")
-            return {}
+            return None
     
+    def get_change_tracking_version(self) -> Optional[int]:
+        """Aktuelle Change Tracking Version der JTL DB (None wenn Change Tracking nicht aktiv)"""
+        try:
+            row = self._fetch_one("SELECT CHANGE_TRACKING_CURRENT_VERSION()")
+            return int(row[0]) if row and row[0] is not None else None
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_change_tracking_version: {e}")
+            return None
+
+    def get_changed_article_ids(self, since_version: int, tables: List[str]) -> Optional[List[int]]:
+        """
+        Hole kArtikel aller Artikel, deren Zeilen in den Tabellen seit since_version geändert wurden
+        (SQL Server Change Tracking, PK der Tabellen muss kArtikel sein).
+
+        Returns:
+            Liste der kArtikel, oder None wenn der Watermark nicht mehr gültig ist
+            (Change Tracking Retention abgelaufen / Tabelle nicht getrackt) -> Vollabgleich nötig
+        """
+        if not tables:
+            return None
+
+        try:
+            for table in tables:
+                row = self._fetch_one(
+                    "SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(:table_name))",
+                    {"table_name": table}
+                )
+                if not row or row[0] is None or int(row[0]) > since_version:
+                    return None
+
+            # Tabellennamen kommen aus der Konfiguration, nicht vom Benutzer
+            union_sql = "\n                UNION\n".join(
+                f"SELECT ct.[kArtikel] FROM CHANGETABLE(CHANGES {table}, :since_version) AS ct"
+                for table in tables
+            )
+            rows = self._fetch_all(union_sql, {"since_version": since_version})
+            return [int(row[0]) for row in rows]
+
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_changed_article_ids: {e}")
+            return None
+
     def get_tracking_from_lieferschein(self, bestell_id: str) -> Optional[Dict[str, str]]:
         """Hole Tracking aus JTL Lieferscheindaten"""
         try:
@@ -200,6 +324,9 @@ class JtlRepository(BaseRepository):
                 "tracking_number": tracking_id or ""
             }
         except Exception as e:
+            if is_deadlock(e):
+                # Deadlock-Opfer: Transaktion ist zurückgerollt -> Aufrufer wiederholt sie
+                raise
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_tracking_from_lieferschein: {e}")
             return None
 
@@ -221,5 +348,35 @@ class JtlRepository(BaseRepository):
             kunden_nr = row[0]
             return kunden_nr if kunden_nr else None
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_customer_number_by_email: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def get_customers_after(self, last_kunde_id: int, limit: int = 5000) -> Optional[List[Dict]]:
+        """
+        Hole Kunden mit E-Mail ab einem kKunde-Watermark (für den TOCI Kunden-Spiegel).
+        Sortiert nach kKunde, damit der Aufrufer seitenweise weiterlesen kann.
+
+        Returns:
+            Kunden-Dicts oder None bei Fehler (nicht mit "keine neuen Kunden" verwechseln)
+        """
+        try:
+            sql = f"""
+                SELECT TOP {int(limit)} [kKunde], [cKundenNr], [cEMail]
+                FROM [eazybusiness].[Kunde].[lvKunde]
+                WHERE [kKunde] > :last_kunde_id
+                  AND [cEMail] IS NOT NULL
+                  AND [cEMail] != ''
+                ORDER BY [kKunde]
+            """
+            rows = self._fetch_all(sql, {"last_kunde_id": last_kunde_id})
+            return [
+                {"kKunde": int(row[0]), "cKundenNr": row[1], "cEMail": row[2]}
+                for row in rows
+            ]
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "jtl_repository", "ERROR", f"JTL get_customers_after: {e}")
+            return None
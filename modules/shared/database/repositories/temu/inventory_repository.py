@@ -1,13 +1,13 @@
 """Inventory Repository - SQLAlchemy + Raw SQL (Final & Optimized)"""
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy import text
 # Lazy import to avoid circular dependency
 def _get_log_service():
     from ...logging.log_service import log_service
     return log_service
 from ...connection import get_engine
-from ....config.settings import DB_TOCI
+from ....config.settings import DB_TOCI, DB_JTL
 from ..base import BaseRepository
 
 class InventoryRepository(BaseRepository):
@@ -15,6 +15,9 @@ class InventoryRepository(BaseRepository):
         """
         Upsert inventory items via MERGE.
         Optimiert: Nutzt EINE Transaktion für alle Items (Batch).
+        
+        Returns:
+            {"inserted": n, "updated": n, "success": bool}
         """
         inserted, updated = 0, 0
         sql = text("""
@@ -60,11 +63,67 @@ class InventoryRepository(BaseRepository):
                         inserted, updated = process_items(conn)
                         # Commit passiert automatisch am Ende von conn.begin() wenn kein Fehler
             
-            return {"inserted": inserted, "updated": updated}
+            return {"inserted": inserted, "updated": updated, "success": True}
 
         except Exception as e:
             _get_log_service().log("SYSTEM_ERROR", "inventoryrepository" , "ERROR", f"InventoryRepository upsert_inventory: {e}")
-            return {"inserted": 0, "updated": 0}
+            return {"inserted": 0, "updated": 0, "success": False}
+
+    def refresh_from_jtl_set_based(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Set-basierter Abgleich direkt auf dem SQL Server (TOCI + eazybusiness auf derselben Instanz).
+        Ordnet fehlende JTL Artikel-IDs per SKU zu, berechnet den verfügbaren Bestand
+        (fBestand - nPuffer, min 0, Lager 2) und schreibt nur echte Änderungen zurück.
+
+        Returns:
+            Nur die geänderten Zeilen (action, product_id, old_stock, new_stock, needs_sync),
+            None bei Fehler (Zuordnungs-UPDATE evtl. schon ausgeführt -> Aufrufer rollt zurück)
+        """
+        try:
+            # COLLATE DATABASE_DEFAULT: TOCI und eazybusiness können unterschiedliche Collations haben
+            sql = text(f"""
+                SET NOCOUNT ON;
+
+                UPDATE p
+                   SET p.jtl_article_id = a.kArtikel,
+                       p.updated_at = GETDATE()
+                  FROM temu_products p
+                  JOIN [{DB_JTL}].[dbo].[tArtikel] a
+                    ON a.cArtNr COLLATE DATABASE_DEFAULT = p.sku
+                 WHERE p.jtl_article_id IS NULL;
+
+                MERGE temu_inventory AS t
+                USING (
+                    SELECT p.id AS product_id,
+                           p.jtl_article_id,
+                           CASE
+                               WHEN v.fBestand IS NULL THEN 0
+                               WHEN CAST(v.fBestand AS INT) - ISNULL(a.nPuffer, 0) < 0 THEN 0
+                               ELSE CAST(v.fBestand AS INT) - ISNULL(a.nPuffer, 0)
+                           END AS jtl_stock
+                    FROM temu_products p
+                    LEFT JOIN [{DB_JTL}].[dbo].[tArtikel] a
+                      ON a.kArtikel = p.jtl_article_id
+                    LEFT JOIN [{DB_JTL}].[dbo].[vLagerbestandProLager] v
+                      ON v.kArtikel = a.kArtikel
+                     AND v.kWarenlager = 2
+                ) AS s
+                ON t.product_id = s.product_id
+                WHEN MATCHED AND (t.jtl_stock <> s.jtl_stock
+                                  OR ISNULL(t.jtl_article_id, -1) <> ISNULL(s.jtl_article_id, -1)) THEN UPDATE SET
+                    jtl_article_id = s.jtl_article_id, jtl_stock = s.jtl_stock,
+                    needs_sync = CASE WHEN s.jtl_stock <> t.temu_stock THEN 1 ELSE 0 END,
+                    updated_at = GETDATE()
+                WHEN NOT MATCHED THEN INSERT (product_id, jtl_article_id, jtl_stock, temu_stock, needs_sync)
+                    VALUES (s.product_id, s.jtl_article_id, s.jtl_stock, s.jtl_stock, 0)
+                OUTPUT $action AS action, inserted.product_id, deleted.jtl_stock AS old_stock,
+                       inserted.jtl_stock AS new_stock, inserted.needs_sync;
+            """)
+            rows = self._fetch_all(sql)
+            return [dict(row._mapping) for row in rows]
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "inventoryrepository" , "ERROR", f"InventoryRepository refresh_from_jtl_set_based: {e}")
+            return None
 
     def get_needs_sync(self) -> List[Dict[str, Any]]:
         """Get inventory items that need sync"""
@@ -94,11 +153,12 @@ class InventoryRepository(BaseRepository):
             return 0
         
         try:
-            # WICHTIG: Wir setzen temu_stock = :temu_stock (der neue Wert aus JTL),
-            # damit needs_sync beim nächsten Check 0 bleibt.
+            # WICHTIG: Wir setzen temu_stock = :temu_stock (der gesendete Wert aus JTL),
+            # damit needs_sync beim nächsten Check 0 bleibt. Hat sich jtl_stock seit dem
+            # Snapshot geändert (Push läuft außerhalb der Transaktion), bleibt needs_sync = 1.
             sql = """
                 UPDATE temu_inventory 
-                SET needs_sync = 0, 
+                SET needs_sync = CASE WHEN jtl_stock <> :temu_stock THEN 1 ELSE 0 END, 
                     temu_stock = :temu_stock,
                     last_synced_to_temu = GETDATE(),
                     updated_at = GETDATE()
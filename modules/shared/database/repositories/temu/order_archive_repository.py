@@ -0,0 +1,186 @@
+"""
+Order Archive Repository - SQLAlchemy + Raw SQL
+Data Access Layer - Hot/Cold Archivierung abgeschlossener Orders (temu_orders, temu_order_items, temu_xml_export)
+"""
+
+from typing import Dict, List
+# Lazy import to avoid circular dependency
+def _get_log_service():
+    from ...logging.log_service import log_service
+    return log_service
+from ..base import BaseRepository
+
+# Hot-Tabelle -> Archiv-Tabelle
+ARCHIVE_TABLES = {
+    'temu_orders': 'temu_orders_archive',
+    'temu_order_items': 'temu_order_items_archive',
+    'temu_xml_export': 'temu_xml_export_archive',
+}
+
+# Union Views für seltene historische Lookups (Hot + Archiv, Spalte 'archiviert')
+ARCHIVE_VIEWS = {
+    'temu_orders': 'temu_orders_all',
+    'temu_order_items': 'temu_order_items_all',
+    'temu_xml_export': 'temu_xml_export_all',
+}
+
+
+def _column_type(type_name: str, max_length: int, precision: int, scale: int) -> str:
+    """SQL Typ-Deklaration aus sys.columns (für ALTER TABLE ... ADD im Archiv)"""
+    if type_name in ('nvarchar', 'nchar'):
+        return f"{type_name}(MAX)" if max_length == -1 else f"{type_name}({max_length // 2})"
+    if type_name in ('varchar', 'char', 'varbinary', 'binary'):
+        return f"{type_name}(MAX)" if max_length == -1 else f"{type_name}({max_length})"
+    if type_name in ('decimal', 'numeric'):
+        return f"{type_name}({precision},{scale})"
+    if type_name in ('datetime2', 'time', 'datetimeoffset'):
+        return f"{type_name}({scale})"
+    return type_name
+
+
+class OrderArchiveRepository(BaseRepository):
+    """
+    Data Access Layer - verschiebt abgeschlossene Orders (versendet + an TEMU gemeldet)
+    batchweise in Archiv-Tabellen. Erbt von BaseRepository (Standard DB = TOCI).
+
+    Archiv-Tabellen haben dieselben Spalten wie die Hot-Tabellen (ohne IDENTITY, ohne FK);
+    ensure_archive_tables ergänzt später hinzugekommene Spalten. Verschoben wird per
+    DELETE ... OUTPUT deleted.<spalten> INTO archiv (<spalten>) mit expliziten Spaltenlisten,
+    die Reihenfolge der Spalten im Archiv spielt also keine Rolle. IDs bleiben erhalten.
+    Ein Batch = eine Transaktion des Aufrufers (db_connect).
+    """
+
+    def _get_columns(self, table: str) -> List:
+        """Spalten einer Tabelle in Definitionsreihenfolge: (name, typ, max_length, precision, scale, nullable)"""
+        return self._fetch_all("""
+            SELECT c.name, TYPE_NAME(c.user_type_id), c.max_length, c.precision, c.scale, c.is_nullable
+            FROM sys.columns c
+            WHERE c.object_id = OBJECT_ID(:table)
+            ORDER BY c.column_id
+        """, {"table": f"dbo.{table}"})
+
+    def _sync_archive_columns(self, hot: str, archive: str) -> List[str]:
+        """
+        Ergänzt Spalten, die nach dem Anlegen des Archivs in die Hot-Tabelle kamen (immer NULL,
+        Alt-Zeilen haben keinen Wert), und lockert NOT NULL wo die Hot-Tabelle es gelockert hat.
+
+        Returns:
+            Spaltennamen der Hot-Tabelle (= gemeinsame Spaltenliste für OUTPUT INTO und Views)
+        """
+        hot_columns = self._get_columns(hot)
+        archive_columns = {row[0]: row for row in self._get_columns(archive)}
+
+        for name, type_name, max_length, precision, scale, nullable in hot_columns:
+            column_type = _column_type(type_name, max_length, precision, scale)
+            existing = archive_columns.get(name)
+            if existing is None:
+                self._execute_stmt(f"ALTER TABLE [dbo].[{archive}] ADD [{name}] {column_type} NULL")
+            elif nullable and not existing[5]:
+                self._execute_stmt(f"ALTER TABLE [dbo].[{archive}] ALTER COLUMN [{name}] {column_type} NULL")
+
+        return [row[0] for row in hot_columns]
+
+    def ensure_archive_tables(self) -> bool:
+        """
+        Erstelle Archiv-Tabellen wenn nicht vorhanden, gleiche neue Hot-Spalten ab und
+        lege die Union Views (neu) mit expliziten Spaltenlisten an
+        """
+        try:
+            for hot, archive in ARCHIVE_TABLES.items():
+                # UNION ALL mit leerem Ergebnis: gleiche Spalten, aber ohne IDENTITY-Eigenschaft
+                self._execute_stmt(f"""
+                    IF OBJECT_ID('dbo.{archive}', 'U') IS NULL
+                    BEGIN
+                        SELECT * INTO [dbo].[{archive}] FROM [dbo].[{hot}] WHERE 1 = 0
+                        UNION ALL
+                        SELECT * FROM [dbo].[{hot}] WHERE 1 = 0;
+
+                        ALTER TABLE [dbo].[{archive}] ADD CONSTRAINT pk_{archive} PRIMARY KEY (id);
+                        CREATE INDEX idx_{archive}_bestell_id ON [dbo].[{archive}](bestell_id);
+                    END
+                """)
+
+            for hot, view in ARCHIVE_VIEWS.items():
+                archive = ARCHIVE_TABLES[hot]
+                columns = ", ".join(f"[{name}]" for name in self._sync_archive_columns(hot, archive))
+                # CREATE VIEW muss allein im Batch stehen -> EXEC; CREATE OR ALTER übernimmt neue Spalten
+                self._execute_stmt(f"""
+                    EXEC('CREATE OR ALTER VIEW [dbo].[{view}] AS
+                          SELECT {columns}, CAST(0 AS BIT) AS archiviert FROM [dbo].[{hot}]
+                          UNION ALL
+                          SELECT {columns}, CAST(1 AS BIT) AS archiviert FROM [dbo].[{archive}]');
+                """)
+
+            # Auswahl der Archiv-Kandidaten ohne Scan über die ganze Hot-Tabelle
+            self._execute_stmt("""
+                IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                               WHERE name = 'idx_temu_orders_archive_scan'
+                                 AND object_id = OBJECT_ID('dbo.temu_orders'))
+                    CREATE INDEX idx_temu_orders_archive_scan
+                        ON [dbo].[temu_orders](status, temu_gemeldet, updated_at);
+            """)
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_archive_repository", "ERROR", f"OrderArchiveRepository ensure_archive_tables: {e}")
+            return False
+
+    def archive_batch(self, older_than_days: int, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Verschiebt bis zu batch_size abgeschlossene Orders inkl. Items und XML-Exporte.
+
+        Reihenfolge XML -> Items -> Orders: Items würden sonst per ON DELETE CASCADE
+        gelöscht statt archiviert. READPAST: parallele Workflows blockieren den Job nicht.
+
+        Returns:
+            {'orders': n, 'items': n, 'xml_exports': n}
+        """
+        # Kein try/except: Fehler sollen die Batch-Transaktion des Aufrufers zurückrollen
+        # Explizite Spaltenlisten (Hot-Spalten; ensure_archive_tables hat sie im Archiv ergänzt)
+        moves = {}
+        for hot in ARCHIVE_TABLES:
+            names = [col[0] for col in self._get_columns(hot)]
+            moves[hot] = (
+                ", ".join(f"deleted.[{name}]" for name in names),
+                ", ".join(f"[{name}]" for name in names),
+            )
+
+        row = self._fetch_one(f"""
+            SET NOCOUNT ON;
+
+            DECLARE @batch TABLE (id INT PRIMARY KEY, bestell_id NVARCHAR(50) NOT NULL);
+
+            INSERT INTO @batch (id, bestell_id)
+            SELECT TOP ({int(batch_size)}) id, bestell_id
+            FROM [dbo].[temu_orders] WITH (ROWLOCK, UPDLOCK, READPAST)
+            WHERE status = 'versendet'
+              AND temu_gemeldet = 1
+              AND updated_at < DATEADD(day, -:older_than_days, GETDATE())
+            ORDER BY id;
+
+            DELETE x
+            OUTPUT {moves['temu_xml_export'][0]}
+              INTO [dbo].[temu_xml_export_archive] ({moves['temu_xml_export'][1]})
+            FROM [dbo].[temu_xml_export] x
+            INNER JOIN @batch b ON b.bestell_id = x.bestell_id;
+            DECLARE @xml_exports INT = @@ROWCOUNT;
+
+            DELETE i
+            OUTPUT {moves['temu_order_items'][0]}
+              INTO [dbo].[temu_order_items_archive] ({moves['temu_order_items'][1]})
+            FROM [dbo].[temu_order_items] i
+            INNER JOIN @batch b ON b.id = i.order_id;
+            DECLARE @items INT = @@ROWCOUNT;
+
+            DELETE o
+            OUTPUT {moves['temu_orders'][0]}
+              INTO [dbo].[temu_orders_archive] ({moves['temu_orders'][1]})
+            FROM [dbo].[temu_orders] o
+            INNER JOIN @batch b ON b.id = o.id;
+            DECLARE @orders INT = @@ROWCOUNT;
+
+            SELECT @orders AS orders, @items AS items, @xml_exports AS xml_exports;
+        """, {"older_than_days": int(older_than_days)})
+
+        if not row:
+            return {'orders': 0, 'items': 0, 'xml_exports': 0}
+        return {'orders': row[0], 'items': row[1], 'xml_exports': row[2]}
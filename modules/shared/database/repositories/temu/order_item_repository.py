@@ -1,12 +1,12 @@
 """OrderItem Repository - SQLAlchemy + Raw SQL (Final)"""
 
-from typing import List, Optional
-from sqlalchemy import text
+from typing import Dict, List, Optional
+from sqlalchemy import text, bindparam
 # Lazy import to avoid circular dependency
 def _get_log_service():
     from ...logging.log_service import log_service
     return log_service
-from ...connection import get_engine
+from ...connection import get_engine, is_deadlock
 from ....config.settings import TABLE_ORDER_ITEMS, DB_TOCI
 from ..base import BaseRepository
 
@@ -110,6 +110,8 @@ class OrderItemRepository(BaseRepository):
                         return int(row[0]) if row else 0
         
         except Exception as e:
+            if is_deadlock(e):
+                raise
             # ✅ CRITICAL: Detailliertes Logging für Debugging
             bestellartikel_id = item.bestellartikel_id if item else "unknown"
             _get_log_service().log("SYSTEM_ERROR", "orderitem_repository" , "ERROR", f"OrderItemRepository save FAILED for item {bestellartikel_id}: {e}")
@@ -129,9 +131,44 @@ class OrderItemRepository(BaseRepository):
             rows = self._fetch_all(sql, {"order_id": order_id})
             return [self._map_to_item(row) for row in rows]
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "orderitem_repository" , "ERROR", f"OrderItemRepository find_by_order_id: {e}")
             return []
     
+    def find_by_order_ids(self, order_ids: List[int]) -> Dict[int, List[OrderItem]]:
+        """
+        Bulk-Variante von find_by_order_id (Chunks à 1.000 IDs wegen 2100-Parameter-Limit)
+
+        Returns:
+            {order_id: [OrderItem, ...]} - Orders ohne Items fehlen im Dict
+        """
+        ids = list(set(order_ids))
+        chunk_size = 1000
+        items_by_order: Dict[int, List[OrderItem]] = {}
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = text(f"""
+                    SELECT id, order_id, bestell_id, bestellartikel_id,
+                           produktname, sku, sku_id, variation, menge,
+                           netto_einzelpreis, brutto_einzelpreis,
+                           gesamtpreis_netto, gesamtpreis_brutto, mwst_satz
+                    FROM {TABLE_ORDER_ITEMS}
+                    WHERE order_id IN :order_ids
+                    ORDER BY order_id, id
+                """).bindparams(bindparam('order_ids', expanding=True))
+                for row in self._fetch_all(sql, {"order_ids": chunk}):
+                    item = self._map_to_item(row)
+                    items_by_order.setdefault(item.order_id, []).append(item)
+            return items_by_order
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "orderitem_repository" , "ERROR", f"OrderItemRepository find_by_order_ids: {e}")
+            return {}
+    
     def find_by_bestell_id(self, bestell_id: str) -> List[OrderItem]:
         """Hole alle Items für eine Bestellung (via bestell_id)"""
         try:
@@ -146,6 +183,8 @@ class OrderItemRepository(BaseRepository):
             rows = self._fetch_all(sql, {"bestell_id": bestell_id})
             return [self._map_to_item(row) for row in rows]
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "orderitem_repository" , "ERROR", f"OrderItemRepository find_by_bestell_id: {e}")
             return []
     
@@ -163,6 +202,8 @@ class OrderItemRepository(BaseRepository):
             row = self._fetch_one(sql, {"bestellartikel_id": bestellartikel_id})
             return self._map_to_item(row) if row else None
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "orderitem_repository" , "ERROR", f"OrderItemRepository find_by_bestellartikel_id: {e}")
             return None
     
@@ -1,11 +1,26 @@
 """Order Repository - SQLAlchemy + Raw SQL (FIXED)"""
 
+import gzip
 from typing import Optional, List, Dict
-from sqlalchemy import text
-from ...connection import get_engine
-from ....config.settings import TABLE_ORDERS, TABLE_ORDER_ITEMS, DB_TOCI
+from sqlalchemy import text, bindparam
+from ...connection import get_engine, is_deadlock
+from ....config.settings import TABLE_ORDERS, TABLE_ORDER_ITEMS, DB_TOCI, DB_JTL
 from ..base import BaseRepository
 
+
+def compress_xml(xml_content: str) -> bytes:
+    """
+    GZIP über UTF-16LE - dasselbe Format wie SQL Server COMPRESS(NVARCHAR),
+    d.h. CAST(DECOMPRESS(xml_content_gz) AS NVARCHAR(MAX)) funktioniert auch in Ad-hoc Queries.
+    """
+    return gzip.compress(xml_content.encode('utf-16-le'), compresslevel=6)
+
+
+def decompress_xml(xml_content_gz: bytes) -> str:
+    """Gegenstück zu compress_xml / SQL Server COMPRESS(NVARCHAR)"""
+    return gzip.decompress(xml_content_gz).decode('utf-16-le')
+
+
 # Lazy import to avoid circular dependency
 def _get_log_service():
     from ...logging.log_service import log_service
@@ -43,6 +58,9 @@ class Order:
 
 class OrderRepository(BaseRepository):
     """Data Access Layer - ONLY DB Operations"""
+
+    # Prozessweit: xml_content_gz existiert (einmal gesehen = bleibt so, nie negativ gecacht)
+    _xml_content_gz_ready = False
     
     def find_by_bestell_id(self, bestell_id: str) -> Optional[Order]:
         """Hole Order aus DB"""
@@ -59,6 +77,8 @@ class OrderRepository(BaseRepository):
             row = self._fetch_one(sql, {"bestell_id": bestell_id})
             return self._map_to_order(row) if row else None
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository find_by_bestell_id: {e}")
             return None
     
@@ -82,7 +102,7 @@ class OrderRepository(BaseRepository):
                         email = :email,
                         telefon_empfaenger = :telefon_empfaenger,
                         versandkosten = :versandkosten,
-                        status = :status,
+                        status = COALESCE(:status, status),
                         updated_at = GETDATE()
                     WHERE id = :id
                 """
@@ -156,6 +176,8 @@ class OrderRepository(BaseRepository):
                         return int(row[0]) if row else 0
         
         except Exception as e:
+            if is_deadlock(e):
+                raise
             # ✅ CRITICAL: Detailliertes Logging für Debugging
             bestell_id = order.bestell_id if order else "unknown"
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository save FAILED for order {bestell_id}: {e}")
@@ -177,9 +199,23 @@ class OrderRepository(BaseRepository):
             rows = self._fetch_all(sql, {"status": status})
             return [self._map_to_order(row) for row in rows]
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository find_by_status: {e}")
             return []
-    
+
+    def count_orders_to_export(self) -> int:
+        """Anzahl Orders mit status='importiert' und xml_erstellt=0 (vor dem XML Export)"""
+        try:
+            row = self._fetch_one(f"""
+                SELECT COUNT(*) FROM {TABLE_ORDERS}
+                WHERE status = 'importiert' AND xml_erstellt = 0
+            """)
+            return int(row[0]) if row else 0
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository count_orders_to_export: {e}")
+            return 0
+
     def update_order_tracking(self, order_id: int, tracking_number: str, 
                               versanddienstleister: str, status: str) -> bool:
         """Update Tracking-Daten in Order"""
@@ -202,9 +238,57 @@ class OrderRepository(BaseRepository):
             self._execute_stmt(sql, params)
             return True
         except Exception as e:
+            if is_deadlock(e):
+                # Deadlock-Opfer: Transaktion ist zurückgerollt -> Aufrufer wiederholt sie
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository update_order_tracking: {e}")
             return False
     
+    def import_tracking_from_jtl_set_based(self) -> Optional[List[Dict]]:
+        """
+        Übernimmt Tracking aus den JTL Versand-Views für alle offenen Orders in EINEM Statement
+        (Cross-DB UPDATE ... FROM, TOCI und eazybusiness liegen auf derselben Instanz).
+
+        Returns:
+            Die aktualisierten Orders (order_id, bestell_id, trackingnummer, versanddienstleister),
+            None bei Fehler (nicht mit "keine neuen Trackingnummern" verwechseln)
+        """
+        try:
+            # COLLATE DATABASE_DEFAULT: TOCI und eazybusiness können unterschiedliche Collations haben
+            sql = f"""
+                SET NOCOUNT ON;
+
+                UPDATE o SET
+                    trackingnummer = j.cTrackingId,
+                    versanddienstleister = ISNULL(j.cVersandartName, ''),
+                    versanddatum = GETDATE(),
+                    status = 'versendet',
+                    updated_at = GETDATE()
+                OUTPUT inserted.id AS order_id, inserted.bestell_id,
+                       inserted.trackingnummer, inserted.versanddienstleister
+                FROM {TABLE_ORDERS} o
+                CROSS APPLY (
+                    SELECT TOP 1
+                        lp.[cVersandartName],
+                        CAST(lp.[cTrackingId] AS VARCHAR(100)) AS cTrackingId
+                    FROM [{DB_JTL}].[Versand].[lvLieferschein] ls
+                    JOIN [{DB_JTL}].[Versand].[lvLieferscheinpaket] lp
+                      ON lp.[kLieferschein] = ls.[kLieferschein]
+                    WHERE ls.[cBestellungInetBestellNr] COLLATE DATABASE_DEFAULT = o.bestell_id
+                      AND lp.[cTrackingId] IS NOT NULL
+                      AND CAST(lp.[cTrackingId] AS VARCHAR(100)) != ''
+                ) j
+                WHERE o.xml_erstellt = 1
+                  AND (o.trackingnummer IS NULL OR o.trackingnummer = '');
+            """
+            rows = self._fetch_all(sql)
+            return [dict(row._mapping) for row in rows]
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository import_tracking_from_jtl_set_based: {e}")
+            return None
+
     def get_orders_for_tracking_export(self) -> List[Dict]:
         """Hole Orders mit Tracking für TEMU Export"""
         try:
@@ -251,6 +335,8 @@ class OrderRepository(BaseRepository):
             return result_list
         
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository get_orders_for_tracking_export: {e}")
             return []
     
@@ -269,6 +355,34 @@ class OrderRepository(BaseRepository):
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository update_temu_tracking_status: {e}")
             return False
 
+    def mark_temu_tracking_reported(self, order_ids: List[int]) -> int:
+        """
+        Markiere viele Orders als zu TEMU gemeldet (Bulk-Update).
+        Chunking bei 1.000 IDs wegen SQL Server 2100 Parameter Limit.
+        """
+        if not order_ids:
+            return 0
+
+        ids = list(set(order_ids))
+        chunk_size = 1000
+        updated = 0
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = text(f"""
+                    UPDATE {TABLE_ORDERS} SET
+                        temu_gemeldet = 1,
+                        updated_at = GETDATE()
+                    WHERE id IN :order_ids
+                """).bindparams(bindparam('order_ids', expanding=True))
+                result = self._execute_stmt(sql, {"order_ids": chunk})
+                updated += result.rowcount
+            return updated
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository mark_temu_tracking_reported: {e}")
+            return 0
+
     def update_xml_export_status(self, order_id: int) -> bool:
         """Setze xml_erstellt = 1"""
         try:
@@ -282,25 +396,194 @@ class OrderRepository(BaseRepository):
             self._execute_stmt(sql, {"order_id": order_id})
             return True
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository update_xml_export_status: {e}")
             return False
     
+    def ensure_xml_export_compression(self) -> bool:
+        """
+        Schema-Migration für komprimierten XML Inhalt (idempotent):
+        xml_content_gz VARBINARY(MAX) anlegen, xml_content nullable machen (reine Metadaten-Änderung).
+        Braucht einen Sch-M Lock -> nur standalone aufrufen, nie innerhalb einer Workflow-Transaktion.
+        """
+        if OrderRepository._xml_content_gz_ready:
+            return True
+        try:
+            self._execute_stmt("""
+                IF COL_LENGTH('dbo.temu_xml_export', 'xml_content_gz') IS NULL
+                BEGIN
+                    ALTER TABLE [dbo].[temu_xml_export] ADD [xml_content_gz] VARBINARY(MAX) NULL;
+                    ALTER TABLE [dbo].[temu_xml_export] ALTER COLUMN [xml_content] NVARCHAR(MAX) NULL;
+                END
+            """)
+            OrderRepository._xml_content_gz_ready = True
+            return True
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository ensure_xml_export_compression: {e}")
+            return False
+
+    def _has_xml_content_gz(self) -> bool:
+        """Existiert xml_content_gz? (reiner Metadaten-Read, ohne Schema-Lock)"""
+        if not OrderRepository._xml_content_gz_ready:
+            row = self._fetch_one("SELECT COL_LENGTH('dbo.temu_xml_export', 'xml_content_gz')")
+            OrderRepository._xml_content_gz_ready = bool(row and row[0] is not None)
+        return OrderRepository._xml_content_gz_ready
+
+    def compress_xml_exports(self, batch_size: int = 500) -> int:
+        """
+        Migriert einen Batch alter Zeilen: xml_content → COMPRESS() in xml_content_gz.
+        Kleine Batches halten Locks und Log-Wachstum klein; Aufrufer wiederholt bis 0.
+        """
+        try:
+            result = self._execute_stmt(f"""
+                UPDATE TOP ({int(batch_size)}) temu_xml_export
+                   SET xml_content_gz = COMPRESS(xml_content),
+                       xml_content = NULL
+                 WHERE xml_content IS NOT NULL
+                   AND xml_content_gz IS NULL
+            """)
+            return result.rowcount
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository compress_xml_exports: {e}")
+            return 0
+
+    def get_xml_export(self, bestell_id: str) -> Optional[str]:
+        """Hole die zuletzt gespeicherte XML einer Bestellung (transparent entpackt)"""
+        try:
+            row = self._fetch_one("""
+                SELECT TOP 1 xml_content, xml_content_gz
+                FROM temu_xml_export
+                WHERE bestell_id = :bestell_id
+                ORDER BY id DESC
+            """, {"bestell_id": bestell_id})
+            if not row:
+                return None
+            if row[1] is not None:
+                return decompress_xml(row[1])
+            return row[0]
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository get_xml_export: {e}")
+            return None
+
     def insert_xml_export(self, bestell_id: str, xml_content: str) -> bool:
-        """Speichere XML in temu_xml_export Tabelle"""
+        """Speichere XML in temu_xml_export Tabelle (komprimiert, vor der Migration als xml_content)"""
         try:
-            sql = """
-                INSERT INTO temu_xml_export (bestell_id, xml_content, status, verarbeitet, created_at)
-                VALUES (:bestell_id, :xml_content, 'pending', 0, GETDATE())
+            if self._has_xml_content_gz():
+                column, value = "xml_content_gz", compress_xml(xml_content)
+            else:
+                column, value = "xml_content", xml_content
+            sql = f"""
+                INSERT INTO temu_xml_export (bestell_id, {column}, status, verarbeitet, created_at)
+                VALUES (:bestell_id, :content, 'pending', 0, GETDATE())
             """
             self._execute_stmt(sql, {
                 "bestell_id": bestell_id,
-                "xml_content": xml_content
+                "content": value
             })
             return True
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository insert_xml_export: {e}")
             return False
 
+    def insert_xml_exports(self, exports: List[Dict]) -> int:
+        """
+        Speichere viele XMLs in temu_xml_export (Multi-Row INSERT, 500 Zeilen pro Statement).
+        Solange xml_content_gz fehlt (Migration noch nicht gelaufen), unkomprimiert in xml_content.
+
+        Args:
+            exports: Liste von Dicts [{'bestell_id': '...', 'xml_content': '...'}, ...]
+        """
+        if not exports:
+            return 0
+
+        chunk_size = 500  # 2 Parameter pro Zeile -> unter SQL Server 2100 Parameter Limit
+        inserted = 0
+
+        try:
+            compressed = self._has_xml_content_gz()
+            column = "xml_content_gz" if compressed else "xml_content"
+            for i in range(0, len(exports), chunk_size):
+                chunk = exports[i:i + chunk_size]
+                values = ", ".join(
+                    f"(:bestell_id_{n}, :content_{n}, 'pending', 0, GETDATE())" for n in range(len(chunk))
+                )
+                params = {}
+                for n, row in enumerate(chunk):
+                    params[f"bestell_id_{n}"] = row["bestell_id"]
+                    params[f"content_{n}"] = compress_xml(row["xml_content"]) if compressed else row["xml_content"]
+
+                self._execute_stmt(f"""
+                    INSERT INTO temu_xml_export (bestell_id, {column}, status, verarbeitet, created_at)
+                    VALUES {values}
+                """, params)
+                inserted += len(chunk)
+            return inserted
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository insert_xml_exports: {e}")
+            return inserted
+
+    def mark_xml_exports_processed(self, bestell_ids: List[str]) -> int:
+        """Bulk-Variante von mark_xml_export_processed (Chunks à 1.000 IDs)"""
+        if not bestell_ids:
+            return 0
+
+        ids = list(set(bestell_ids))
+        chunk_size = 1000
+        updated = 0
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = text("""
+                    UPDATE temu_xml_export
+                       SET status = 'processed',
+                           verarbeitet = 1,
+                           processed_at = GETDATE()
+                     WHERE bestell_id IN :bestell_ids
+                       AND status = 'pending'
+                """).bindparams(bindparam('bestell_ids', expanding=True))
+                result = self._execute_stmt(sql, {"bestell_ids": chunk})
+                updated += result.rowcount
+            return updated
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository mark_xml_exports_processed: {e}")
+            return 0
+
+    def update_xml_export_statuses(self, order_ids: List[int]) -> int:
+        """Bulk-Variante von update_xml_export_status (Chunks à 1.000 IDs)"""
+        if not order_ids:
+            return 0
+
+        ids = list(set(order_ids))
+        chunk_size = 1000
+        updated = 0
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = text(f"""
+                    UPDATE {TABLE_ORDERS} SET
+                        xml_erstellt = 1,
+                        status = 'xml_erstellt',
+                        updated_at = GETDATE()
+                    WHERE id IN :order_ids
+                """).bindparams(bindparam('order_ids', expanding=True))
+                result = self._execute_stmt(sql, {"order_ids": chunk})
+                updated += result.rowcount
+            return updated
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository update_xml_export_statuses: {e}")
+            return 0
+
     def mark_xml_export_processed(self, bestell_id: str) -> bool:
         """Setze status='processed', verarbeitet=1, processed_at=GETDATE() für eine Bestellung."""
         try:
@@ -315,9 +598,158 @@ class OrderRepository(BaseRepository):
             self._execute_stmt(sql, {"bestell_id": bestell_id})
             return True
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository mark_xml_export_processed: {e}")
             return False
 
+    def render_orders_xml(self, order_ids: List[int], k_firma: str, k_benutzer: str,
+                          sprache: str, waehrung: str) -> Dict[int, str]:
+        """
+        Set-basierte XML Engine: baut pro Order das JTL tBestellungen Dokument direkt auf dem
+        SQL Server (FOR XML PATH), Elementreihenfolge und Formate wie XmlExportService._generate_order_xml.
+        Textspalten mit ISNULL(..., '') wie `or ''` im Python-Generator; Preise/Mengen bewusst ohne
+        ISNULL (NULL -> Element fehlt -> XmlExportService._parse_sql_xml lehnt die Order ab).
+        Kundennummer kommt aus jtl_customer_mirror (neuester kKunde pro E-Mail).
+        Chunks à 1.000 IDs wegen SQL Server 2100 Parameter Limit.
+
+        Returns:
+            {order_id: xml_string} (ohne XML-Deklaration) - bei Fehler {}
+        """
+        ids = list(set(order_ids))
+        chunk_size = 1000
+        rendered: Dict[int, str] = {}
+
+        try:
+            for i in range(0, len(ids), chunk_size):
+                chunk = ids[i:i + chunk_size]
+                sql = text(f"""
+                    SELECT o.id, CAST((
+                        SELECT
+                            :k_firma AS [@kFirma],
+                            :k_benutzer AS [@kBenutzer],
+                            :sprache AS cSprache,
+                            :waehrung AS cWaehrung,
+                            '' AS cBestellNr,
+                            o.bestell_id AS cExterneBestellNr,
+                            'TEMU' AS cVersandartName,
+                            '' AS cVersandInfo,
+                            ISNULL(CONVERT(VARCHAR(10), o.versanddatum, 104), '') AS dVersandDatum,
+                            ISNULL(o.trackingnummer, '') AS cTracking,
+                            '' AS dLieferDatum,
+                            '' AS cKommentar,
+                            '' AS cBemerkung,
+                            ISNULL(CONVERT(VARCHAR(10), o.kaufdatum, 104), '') AS dErstellt,
+                            'TEMU' AS cZahlungsartName,
+                            '' AS dBezahltDatum,
+
+                            -- Artikel (Fallback über bestell_id wie im Python-Generator)
+                            (SELECT
+                                 ISNULL(i.produktname, '') AS cName,
+                                 ISNULL(i.sku, '') AS cArtNr,
+                                 '' AS cBarcode,
+                                 '' AS cEinheit,
+                                 CAST(i.netto_einzelpreis AS DECIMAL(18, 5)) AS fPreisEinzelNetto,
+                                 CAST(i.brutto_einzelpreis AS DECIMAL(18, 2)) AS fPreis,
+                                 CAST(i.mwst_satz AS DECIMAL(18, 2)) AS fMwSt,
+                                 CAST(i.menge AS DECIMAL(18, 2)) AS fAnzahl,
+                                 'standard' AS cPosTyp,
+                                 '0.00' AS fRabatt
+                             FROM {TABLE_ORDER_ITEMS} i
+                             WHERE i.order_id = o.id
+                                OR (i.bestell_id = o.bestell_id
+                                    AND NOT EXISTS (SELECT 1 FROM {TABLE_ORDER_ITEMS} x WHERE x.order_id = o.id))
+                             ORDER BY i.id
+                             FOR XML PATH('twarenkorbpos'), TYPE),
+
+                            -- Versandkosten (netto * 1,19 wie im Python-Generator als float gerechnet)
+                            (SELECT
+                                 'TEMU Versand' AS cName,
+                                 '' AS cArtNr,
+                                 '' AS cBarcode,
+                                 '' AS cEinheit,
+                                 CAST(ISNULL(o.versandkosten, 0) AS DECIMAL(18, 5)) AS fPreisEinzelNetto,
+                                 CAST(CAST(ISNULL(o.versandkosten, 0) AS FLOAT) * 1.19 AS DECIMAL(18, 2)) AS fPreis,
+                                 '19.00' AS fMwSt,
+                                 '1.00' AS fAnzahl,
+                                 'versandkosten' AS cPosTyp,
+                                 '0.00' AS fRabatt
+                             FOR XML PATH('twarenkorbpos'), TYPE),
+
+                            (SELECT
+                                 ISNULL(k.cKundenNr, '') AS cKundenNr,
+                                 '' AS cAnrede,
+                                 '' AS cTitel,
+                                 ISNULL(o.vorname_empfaenger, '') AS cVorname,
+                                 ISNULL(o.nachname_empfaenger, '') AS cNachname,
+                                 '' AS cFirma,
+                                 ISNULL(o.strasse, '') AS cStrasse,
+                                 ISNULL(o.adresszusatz, '') AS cAdressZusatz,
+                                 ISNULL(o.plz, '') AS cPLZ,
+                                 ISNULL(o.ort, '') AS cOrt,
+                                 ISNULL(o.bundesland, '') AS cBundesland,
+                                 ISNULL(o.land_iso, '') AS cLand,
+                                 ISNULL(o.telefon_empfaenger, '') AS cTel,
+                                 '' AS cMobil,
+                                 '' AS cFax,
+                                 ISNULL(o.email, '') AS cMail,
+                                 '' AS cUSTID,
+                                 '' AS cWWW,
+                                 'TEMU' AS cHerkunft,
+                                 ISNULL(CONVERT(VARCHAR(10), o.kaufdatum, 104), '') AS dErstellt
+                             FOR XML PATH('tkunde'), TYPE),
+
+                            (SELECT
+                                 '' AS cAnrede,
+                                 ISNULL(o.vorname_empfaenger, '') AS cVorname,
+                                 ISNULL(o.nachname_empfaenger, '') AS cNachname,
+                                 '' AS cTitel,
+                                 '' AS cFirma,
+                                 ISNULL(o.strasse, '') AS cStrasse,
+                                 ISNULL(o.adresszusatz, '') AS cAdressZusatz,
+                                 ISNULL(o.plz, '') AS cPLZ,
+                                 ISNULL(o.ort, '') AS cOrt,
+                                 ISNULL(o.bundesland, '') AS cBundesland,
+                                 ISNULL(o.land_iso, '') AS cLand,
+                                 ISNULL(o.telefon_empfaenger, '') AS cTel,
+                                 '' AS cMobil,
+                                 '' AS cFax,
+                                 ISNULL(o.email, '') AS cMail
+                             FOR XML PATH('tlieferadresse'), TYPE),
+
+                            (SELECT
+                                 '' AS cBankName, '' AS cBLZ, '' AS cKontoNr, '' AS cKartenNr,
+                                 '' AS dGueltigkeit, '' AS cCVV, '' AS cKartenTyp, '' AS cInhaber,
+                                 '' AS cIBAN, '' AS cBIC
+                             FOR XML PATH('tzahlungsinfo'), TYPE)
+
+                        FOR XML PATH('tBestellung'), ROOT('tBestellungen'), TYPE
+                    ) AS NVARCHAR(MAX)) AS xml_content
+                    FROM {TABLE_ORDERS} o
+                    OUTER APPLY (
+                        SELECT TOP 1 m.cKundenNr
+                        FROM [dbo].[jtl_customer_mirror] m
+                        WHERE m.email_normalized = LOWER(LTRIM(RTRIM(o.email)))
+                        ORDER BY m.kKunde DESC
+                    ) k
+                    WHERE o.id IN :order_ids
+                """).bindparams(bindparam('order_ids', expanding=True))
+                rows = self._fetch_all(sql, {
+                    "order_ids": chunk,
+                    "k_firma": k_firma,
+                    "k_benutzer": k_benutzer,
+                    "sprache": sprache,
+                    "waehrung": waehrung
+                })
+                for row in rows:
+                    rendered[row[0]] = row[1]
+            return rendered
+        except Exception as e:
+            if is_deadlock(e):
+                raise
+            _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository render_orders_xml: {e}")
+            return {}
+
     def find_orders_for_tracking(self) -> List[Order]:
         """Hole Orders für Tracking-Abgleich"""
         try:
@@ -335,6 +767,8 @@ class OrderRepository(BaseRepository):
             rows = self._fetch_all(sql)
             return [self._map_to_order(row) for row in rows]
         except Exception as e:
+            if is_deadlock(e):
+                raise
             _get_log_service().log("SYSTEM_ERROR", "order_repository", "ERROR", f"OrderRepository find_orders_for_tracking: {e}")
             return []
 
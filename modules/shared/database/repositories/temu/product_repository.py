@@ -1,7 +1,7 @@
 """Product Repository - SQLAlchemy + Raw SQL (Final & Optimized)"""
 
 from typing import List, Dict, Any
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 # Lazy import to avoid circular dependency
 def _get_log_service():
     from ...logging.log_service import log_service
@@ -104,4 +104,22 @@ class ProductRepository(BaseRepository):
             return True
         except Exception as e:
             _get_log_service().log("SYSTEM_ERROR", "productrepository" , "ERROR", f"ProductRepository update_jtl_article_id: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def update_jtl_article_ids(self, updates: List[Dict[str, Any]]) -> int:
+        """
+        Bulk-Update der JTL Artikel-IDs (executemany).
+
+        Args:
+            updates: Liste von Dicts [{'product_id': 1, 'jtl_id': 4711}, ...]
+        """
+        if not updates:
+            return 0
+
+        try:
+            sql = text("UPDATE temu_products SET jtl_article_id = :jtl_id, updated_at = GETDATE() WHERE id = :product_id")
+            self._execute_stmt(sql, updates)
+            return len(updates)
+        except Exception as e:
+            _get_log_service().log("SYSTEM_ERROR", "productrepository" , "ERROR", f"ProductRepository update_jtl_article_ids: {e}")
+            return 0
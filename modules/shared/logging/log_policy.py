@@ -0,0 +1,121 @@
+"""Log Policy - Entscheidet, welche Log-Einträge in scheduler_logs landen (Level, Sampling, Zusammenfassung)"""
+
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40, 'CRITICAL': 50}
+
+
+def parse_level_map(value: str) -> Dict[str, str]:
+    """'temu_api=WARNING,xml_export=INFO' -> {'temu_api': 'WARNING', 'xml_export': 'INFO'}"""
+    result = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            job_type, level = part.split('=', 1)
+            if job_type.strip() and level.strip().upper() in LEVELS:
+                result[job_type.strip()] = level.strip().upper()
+    return result
+
+
+class LogPolicy:
+    """
+    DB-Policy für LogService (Konsole/app.log bleiben unberührt):
+
+    - Mindest-Level pro job_type (Fallback min_level): darunter wird nur gezählt.
+    - Wiederkehrende Einträge pro Datensatz (log(..., aggregate='key')): die ersten
+      sample_first pro Job und Intervall werden geschrieben, der Rest nur gezählt.
+    - Gezähltes wird als Summary-Zeile geschrieben: periodisch (summary_interval) und am Job-Ende.
+    - Verbose (global oder pro Job-Lauf) schreibt alles.
+    WARNING und höher werden nie gesampelt.
+    """
+
+    def __init__(self, min_level: str = 'INFO', min_level_by_job: Optional[Dict[str, str]] = None,
+                 sample_first: int = 3, summary_interval: int = 60, verbose: bool = False):
+        self.min_level = min_level
+        self.min_level_by_job = min_level_by_job or {}
+        self.sample_first = sample_first
+        self.summary_interval = summary_interval
+        self.verbose = verbose
+
+        self._verbose_jobs: Set[str] = set()
+        # (job_id, job_type, key) -> [gesehen, nicht geschrieben]
+        self._counters: Dict[Tuple[str, str, str], List[int]] = {}
+        self._lock = threading.Lock()
+        self._last_summary = time.monotonic()
+
+    def set_verbose(self, job_id: str, verbose: bool) -> None:
+        """Verbose-Override für einen Job-Lauf (volle Details in der DB)"""
+        with self._lock:
+            if verbose:
+                self._verbose_jobs.add(job_id)
+            else:
+                self._verbose_jobs.discard(job_id)
+
+    def should_write(self, job_id: str, job_type: str, level: str, aggregate: Optional[str] = None) -> bool:
+        """True = Eintrag in die DB schreiben, False = nur zählen"""
+        if self.verbose or job_id in self._verbose_jobs:
+            return True
+
+        rank = LEVELS.get(level, LEVELS['INFO'])
+        if rank >= LEVELS['WARNING']:
+            return True
+
+        min_level = self.min_level_by_job.get(job_type, self.min_level)
+        if rank < LEVELS.get(min_level, LEVELS['INFO']):
+            self._count(job_id, job_type, level, sampled=False)
+            return False
+
+        if aggregate:
+            return self._count(job_id, job_type, aggregate, sampled=True)
+
+        return True
+
+    def drain(self, job_id: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        """
+        Summary-Zeilen für gezählte Einträge abholen und Zähler zurücksetzen.
+
+        Args:
+            job_id: nur diesen Job (Job-Ende), None = alle
+
+        Returns:
+            [(job_id, job_type, message), ...]
+        """
+        with self._lock:
+            keys = [k for k in self._counters if job_id is None or k[0] == job_id]
+            drained = [(k, self._counters.pop(k)) for k in keys]
+            if job_id is None:
+                self._last_summary = time.monotonic()
+
+        summaries = []
+        for (jid, job_type, key), (seen, skipped) in drained:
+            if not skipped:
+                continue
+            if key in LEVELS:
+                min_level = self.min_level_by_job.get(job_type, self.min_level)
+                message = f"Σ {skipped} {key}-Einträge unter DB-Level {min_level} (nicht gespeichert)"
+            else:
+                message = f"Σ {key}: {seen}× ({skipped} zusammengefasst, erste {seen - skipped} oben)"
+            summaries.append((jid, job_type, message))
+        return summaries
+
+    def drain_due(self) -> List[Tuple[str, str, str]]:
+        """Periodische Summaries (leer, solange summary_interval nicht abgelaufen ist)"""
+        if time.monotonic() - self._last_summary < self.summary_interval:
+            return []
+        return self.drain()
+
+    def end_job(self, job_id: str) -> List[Tuple[str, str, str]]:
+        """Job-Ende: restliche Summaries des Jobs, Verbose-Override entfernen"""
+        self.set_verbose(job_id, False)
+        return self.drain(job_id)
+
+    def _count(self, job_id: str, job_type: str, key: str, sampled: bool) -> bool:
+        """Zähle Eintrag; Returns: True wenn er als Stichprobe trotzdem geschrieben wird"""
+        with self._lock:
+            counter = self._counters.setdefault((job_id, job_type, key), [0, 0])
+            counter[0] += 1
+            if sampled and counter[0] <= self.sample_first:
+                return True
+            counter[1] += 1
+            return False
@@ -1,40 +1,195 @@
 """Log Service - Zentrale Log-Verwaltung mit Console Capture"""
 
-from typing import Optional, List, Dict
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional, List, Dict, Tuple
 from ..database.repositories.common.log_repository import LogRepository
+from ..database.repositories.common.job_run_repository import JobRunRepository
+from ..config.settings import (
+    LOG_DB_ASYNC, LOG_QUEUE_SIZE, LOG_FLUSH_INTERVAL_MS, LOG_FLUSH_BATCH_SIZE,
+    LOG_DB_MIN_LEVEL, LOG_DB_MIN_LEVEL_BY_JOB, LOG_SAMPLE_FIRST, LOG_SUMMARY_INTERVAL_SECONDS, LOG_DB_VERBOSE,
+    LOG_BUFFER_SIZE, LOG_RETENTION_DAYS, LOG_RETENTION_BATCH_SIZE, LOG_RETENTION_PAUSE_MS
+)
+from .log_writer import AsyncLogWriter
+from .log_policy import LogPolicy, parse_level_map
 from . import app_logger
 
+
+class JobContext:
+    """Kontext eines Job-Laufs: ID, Typ, Ringpuffer der letzten Meldungen, Zähler und Step-Zeiten"""
+
+    def __init__(self, job_id: str, job_type: str, buffer_size: int = LOG_BUFFER_SIZE,
+                 parent: Optional['JobContext'] = None):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.buffer = deque(maxlen=buffer_size)
+        self.parent = parent  # äußerer Job (z.B. Scheduler-Lauf um den Workflow)
+        self.token = None
+        
+        # Für job_runs: eine Zeile pro Lauf statt Aggregation über scheduler_logs
+        self.started_at = datetime.now()
+        self.counters = Counter()
+        self.steps: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+    
+    def add_step(self, name: str, seconds: float):
+        with self._lock:
+            self.steps[name] = self.steps.get(name, 0.0) + seconds
+    
+    def merge_into(self, other: 'JobContext'):
+        """Zähler und Step-Zeiten an den äußeren Job weitergeben"""
+        with self._lock:
+            counters, steps = Counter(self.counters), dict(self.steps)
+        with other._lock:
+            other.counters.update(counters)
+            for name, seconds in steps.items():
+                other.steps[name] = other.steps.get(name, 0.0) + seconds
+
+
+# job_type-Teilstrings, die in scheduler_logs landen: TEMU-Jobs und die Wartungsjobs des Schedulers
+DB_LOG_JOB_TYPES = (
+    "order", "inventory", "stock", "tracking", "temu",
+    "log_retention", "xml_archive", "customer_mirror", "push_outbox",
+)
+
+
+# Pro Thread/asyncio-Task eigener Job-Kontext -> parallele Jobs überschreiben sich nicht.
+# Für Worker-Threads eines Jobs mit contextvars.copy_context().run(...) weitergeben.
+_job_context: ContextVar[Optional[JobContext]] = ContextVar('log_job_context', default=None)
+
+
 class LogService:
     """Verwaltet strukturiertes Logging"""
     
     def __init__(self):
         self.repo = LogRepository()
-        self.repo.ensure_table_exists()
-        self.current_job_id: Optional[str] = None
-        self.current_job_type: Optional[str] = None
-        self.log_buffer: List[str] = []
+        self.run_repo = JobRunRepository()
+        
+        # Laufende Jobs nach job_id (Zähler aus Threads ohne Job-Kontext, z.B. API-Client)
+        self._active_runs: Dict[str, JobContext] = {}
+        
+        # DB-Inserts im Hintergrund-Thread (None = synchron pro Eintrag wie bisher).
+        # Tabellen-Checks und Writer-Thread erst beim ersten DB-Zugriff (_ensure_started) -
+        # Prozesse, die log_service nur importieren (spawn-Worker des XML Process Pools), bleiben ohne DDL/Thread
+        self._writer: Optional[AsyncLogWriter] = None
+        self._started = False
+        self._start_lock = threading.Lock()
+        
+        # Was landet in der DB (Level pro job_type, Sampling, Summaries)
+        self.policy = LogPolicy(
+            min_level=LOG_DB_MIN_LEVEL,
+            min_level_by_job=parse_level_map(LOG_DB_MIN_LEVEL_BY_JOB),
+            sample_first=LOG_SAMPLE_FIRST,
+            summary_interval=LOG_SUMMARY_INTERVAL_SECONDS,
+            verbose=LOG_DB_VERBOSE
+        )
+    
+    def _ensure_started(self):
+        """Einmalig: Log-Tabellen sicherstellen und ggf. den Writer-Thread starten"""
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self.repo.ensure_table_exists()
+            self.run_repo.ensure_table_exists()
+            if LOG_DB_ASYNC:
+                self._writer = AsyncLogWriter(
+                    self.repo.insert_logs,
+                    max_queue=LOG_QUEUE_SIZE,
+                    flush_interval_ms=LOG_FLUSH_INTERVAL_MS,
+                    batch_size=LOG_FLUSH_BATCH_SIZE
+                )
+            self._started = True
+    
+    @property
+    def current_job_id(self) -> Optional[str]:
+        """Job-ID im aktuellen Kontext (Thread/Task)"""
+        ctx = _job_context.get()
+        return ctx.job_id if ctx else None
     
-    def start_job_capture(self, job_id: str, job_type: str):
-        """Starte Capturing für einen Job"""
-        self.current_job_id = job_id
-        self.current_job_type = job_type
-        self.log_buffer = []
+    @property
+    def current_job_type(self) -> Optional[str]:
+        """Job-Typ im aktuellen Kontext (Thread/Task)"""
+        ctx = _job_context.get()
+        return ctx.job_type if ctx else None
+    
+    @property
+    def log_buffer(self) -> List[str]:
+        """Letzte Meldungen des aktuellen Jobs (Ringpuffer, max. LOG_BUFFER_SIZE)"""
+        ctx = _job_context.get()
+        return list(ctx.buffer) if ctx else []
+    
+    def start_job_capture(self, job_id: str, job_type: str, verbose: bool = False):
+        """Starte Capturing für einen Job (verbose = alle Details dieses Laufs in die DB)"""
+        ctx = JobContext(job_id, job_type, parent=_job_context.get())
+        ctx.token = _job_context.set(ctx)
+        self._active_runs[job_id] = ctx
+        self.policy.set_verbose(job_id, verbose)
         
         self.log(job_id, job_type, "INFO", f"Job gestartet: {job_type}")
     
     def log(self, job_id: str, job_type: str, level: str, message: str,
-            status: str = None, duration: float = None, error_text: str = None):
-        """Speichere Log-Eintrag in DB und Fehler-Datei"""
+            status: str = None, duration: float = None, error_text: str = None,
+            aggregate: str = None):
+        """
+        Speichere Log-Eintrag in DB und Fehler-Datei
+        
+        Args:
+            aggregate: Key für wiederkehrende Meldungen pro Datensatz (z.B. 'order_updated') -
+                       in der DB nur Stichproben + Summary-Zeile, außer im verbose-Lauf
+        """
         
-        # In Memory Buffer
-        self.log_buffer.append(message)
+        # In Memory Buffer (nur im Kontext des laufenden Jobs)
+        ctx = _job_context.get()
+        if ctx:
+            ctx.buffer.append(message)
+        
+        # Fehler/Warnungen des Laufs für job_runs zählen
+        if level in ("ERROR", "WARNING"):
+            run = self._active_runs.get(job_id)
+            if run:
+                run.count("errors" if level == "ERROR" else "warnings")
         
         # In SQL Server
-        # TEMU-Jobs + SYSTEM_ERROR → DB-Logging
-        is_temu_job = job_type and any(t in job_type.lower() for t in ["order", "inventory", "stock", "tracking", "temu"])
+        # TEMU-Jobs + Wartungsjobs + SYSTEM_ERROR → DB-Logging
+        is_db_job = job_type and any(t in job_type.lower() for t in DB_LOG_JOB_TYPES)
         is_system_error = job_id == "SYSTEM_ERROR"
         
-        if is_temu_job or is_system_error:
+        if (is_db_job or is_system_error) and self.policy.should_write(job_id, job_type, level, aggregate):
+            self._write_db(job_id, job_type, level, message, status, duration, error_text)
+        
+        # Periodische Summary-Zeilen für gezählte Einträge
+        self._write_summaries(self.policy.drain_due())
+        
+        # ERROR-Level immer in zentrale app.log schreiben
+        if level == "ERROR":
+            app_logger.error(message)
+    
+    def _write_db(self, job_id: str, job_type: str, level: str, message: str,
+                  status: str = None, duration: float = None, error_text: str = None):
+        """Ein Eintrag in scheduler_logs (async über den Writer oder synchron)"""
+        self._ensure_started()
+        if self._writer:
+            self._writer.submit({
+                "job_id": job_id,
+                "job_type": job_type,
+                "level": level,
+                "message": message,
+                "status": status,
+                "duration_seconds": duration,
+                "error_text": error_text,
+                "timestamp": datetime.now()
+            })
+        else:
             self.repo.insert_log(
                 job_id=job_id,
                 job_type=job_type,
@@ -44,40 +199,141 @@ class LogService:
                 duration_seconds=duration,
                 error_text=error_text
             )
-        
-        # ERROR-Level immer in zentrale app.log schreiben
-        if level == "ERROR":
-            app_logger.error(message)
+    
+    def _write_summaries(self, summaries):
+        """Summary-Zeilen der LogPolicy schreiben (an der Policy vorbei)"""
+        for job_id, job_type, message in summaries:
+            self._write_db(job_id, job_type, "INFO", message)
     
     def end_job_capture(self, success: bool = True, duration: float = 0, error: str = None):
         """Beende Job Capturing"""
         
-        if not self.current_job_id:
+        ctx = _job_context.get()
+        if not ctx:
             return
         
+        # Ab hier keine Zähler mehr (Abschlusszeile zählt nicht als Fehler des Laufs)
+        self._active_runs.pop(ctx.job_id, None)
+        
+        # Restliche Summaries des Jobs vor der Abschlusszeile
+        self._write_summaries(self.policy.end_job(ctx.job_id))
+        
         status = "SUCCESS" if success else "FAILED"
         self.log(
-            self.current_job_id,
-            self.current_job_type,
+            ctx.job_id,
+            ctx.job_type,
             "ERROR" if not success else "INFO",
             f"Job beendet: {status}",
             status=status,
             duration=duration,  # ✅ KORRIGIERT: duration statt duration_seconds
             error_text=error
         )
+        
+        # Eine Zeile pro Lauf in job_runs; verschachtelte Läufe zählen beim äußeren Job mit
+        if ctx.parent:
+            ctx.merge_into(ctx.parent)
+        else:
+            self._write_run(ctx, status, duration, error)
+        
+        # Äußeren Job-Kontext wiederherstellen
+        try:
+            _job_context.reset(ctx.token)
+        except ValueError:
+            # Token stammt aus einem anderen Kontext (Ende in anderem Thread/Task)
+            _job_context.set(ctx.parent)
+    
+    def count(self, name: str, n: int = 1, job_id: str = None):
+        """
+        Zähler des laufenden Jobs erhöhen (z.B. 'orders_imported', 'skus_pushed', 'api_calls')
+        
+        Args:
+            job_id: expliziter Job (Aufrufe aus Worker-Threads ohne Job-Kontext), sonst aktueller Kontext
+        """
+        ctx = self._active_runs.get(job_id) if job_id else _job_context.get()
+        if ctx and n:
+            ctx.count(name, n)
+    
+    @contextmanager
+    def step_timer(self, name: str):
+        """Misst die Dauer eines Workflow-Schritts für job_runs.step_timings"""
+        ctx = _job_context.get()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if ctx:
+                ctx.add_step(name, time.perf_counter() - start)
+    
+    def _write_run(self, ctx: JobContext, status: str, duration: float, error: str = None):
+        """Abgeschlossenen Lauf in job_runs speichern"""
+        finished_at = datetime.now()
+        if not duration:
+            duration = (finished_at - ctx.started_at).total_seconds()
+        with ctx._lock:
+            counters, steps = dict(ctx.counters), dict(ctx.steps)
+        self._ensure_started()
+        self.run_repo.insert_run(
+            job_id=ctx.job_id,
+            job_type=ctx.job_type,
+            started_at=ctx.started_at,
+            finished_at=finished_at,
+            duration_seconds=duration,
+            status=status,
+            counters=counters,
+            step_timings=steps,
+            error_text=error
+        )
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Warte bis eingereihte Logs in der DB sind (no-op im synchronen Modus)"""
+        if not self._writer:
+            return True
+        return self._writer.flush(timeout)
+    
+    def shutdown(self):
+        """Restliche Logs schreiben und Writer-Thread beenden (App Shutdown)"""
+        if self._writer:
+            self._writer.close()
     
     def get_recent_logs(self, job_id: str, limit: int = 50) -> List[Dict]:
         """Hole letzte Logs für Job (für Dashboard)"""
+        self._ensure_started()
+        self.flush()
         return self.repo.get_recent_logs(job_id, limit)
     
     def get_logs(self, job_id: str = None, level: str = None, 
-                 limit: int = 100, offset: int = 0) -> List[Dict]:
+                 limit: int = 100, cursor: str = None) -> List[Dict]:
         """Hole Logs mit Filtern"""
-        return self.repo.get_logs(job_id, level, limit, offset)
+        self._ensure_started()
+        self.flush()
+        return self.repo.get_logs(job_id, level, limit, cursor)
     
-    def cleanup_old_logs(self, days: int = 30) -> int:
-        """Lösche alte Logs"""
-        return self.repo.clean_old_logs(days)
+    def get_logs_page(self, job_id: str = None, level: str = None,
+                      limit: int = 100, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Eine Seite Logs + Cursor für die nächste (Keyset-Pagination, Raises: ValueError bei ungültigem Cursor)"""
+        self._ensure_started()
+        if not cursor:
+            self.flush()
+        return self.repo.get_logs_page(job_id, level, limit, cursor)
+    
+    def get_statistics(self, job_id: str = None, days: int = 7) -> Dict:
+        """Dashboard-Statistiken aus job_runs (job_id = job_type oder job_id-Präfix)"""
+        self._ensure_started()
+        return self.run_repo.get_statistics(job_id, days)
+    
+    def cleanup_old_logs(self, days: int = LOG_RETENTION_DAYS, max_batches: int = None) -> int:
+        """Lösche alte Logs (batchweise mit Pausen, blockiert laufendes Logging nicht)"""
+        self._ensure_started()
+        deleted = self.repo.clean_old_logs(
+            days,
+            batch_size=LOG_RETENTION_BATCH_SIZE,
+            pause_ms=LOG_RETENTION_PAUSE_MS,
+            max_batches=max_batches
+        )
+        if deleted:
+            self.log("log_retention", "log_retention", "INFO",
+                     f"✓ {deleted} Log-Einträge gelöscht (älter als {days} Tage)")
+        return deleted
 
 # Globale LogService Instanz
 log_service = LogService()
@@ -0,0 +1,161 @@
+"""Async Log Writer - Gebündeltes Schreiben der DB-Logs in einem Hintergrund-Thread"""
+
+import atexit
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List
+
+# WARNING/ERROR warten bei voller Queue kurz auf Platz, statt sofort verworfen zu werden
+BLOCKING_LEVELS = ('WARNING', 'ERROR')
+BLOCK_TIMEOUT_SECONDS = 1.0
+
+# Ab diesem Füllstand wird DEBUG verworfen (Platz für INFO und höher)
+DEBUG_HIGH_WATERMARK = 0.8
+
+
+class _FlushRequest:
+    """Marker in der Queue: Writer schreibt alles davor und setzt done"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class AsyncLogWriter:
+    """
+    Bounded Queue + Writer-Thread für scheduler_logs.
+
+    submit() blockiert nicht (außer WARNING/ERROR bei voller Queue, max. 1s).
+    Der Thread schreibt, sobald batch_size Einträge da sind oder flush_interval_ms
+    seit dem ersten Eintrag des Batches vergangen sind.
+
+    Backpressure: DEBUG fällt ab 80% Füllstand weg, INFO bei voller Queue,
+    WARNING/ERROR erst nach Timeout. Verworfene Einträge werden gezählt und mit dem
+    nächsten Batch als eine WARNING-Zeile gemeldet.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Dict]], int], max_queue: int = 10000,
+                 flush_interval_ms: int = 500, batch_size: int = 200):
+        """
+        Args:
+            write_batch: schreibt eine Liste von Log-Records (z.B. LogRepository.insert_logs)
+        """
+        self._write_batch = write_batch
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._debug_limit = int(max_queue * DEBUG_HIGH_WATERMARK)
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+
+        self._dropped = Counter()
+        self._dropped_lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict) -> bool:
+        """Reiht einen Log-Record ein. Returns: False wenn verworfen"""
+        if self._closed:
+            return False
+
+        level = record.get('level')
+        try:
+            if level == 'DEBUG':
+                if self._queue.qsize() >= self._debug_limit:
+                    raise queue.Full
+                self._queue.put_nowait(record)
+            elif level in BLOCKING_LEVELS:
+                self._queue.put(record, timeout=BLOCK_TIMEOUT_SECONDS)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped[level] += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Warte, bis alles bisher Eingereihte geschrieben ist (z.B. vor dem Lesen der Job-Logs)"""
+        if self._closed or not self._thread.is_alive():
+            return False
+
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Restliche Einträge schreiben und Thread beenden (Shutdown)"""
+        if self._closed:
+            return
+        self._closed = True
+
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Writer-Thread: sammelt Batches und schreibt sie"""
+        batch: List[Dict] = []
+        deadline = 0.0
+
+        while True:
+            try:
+                # Leerer Batch: warten bis etwas kommt; sonst nur bis zum Flush-Zeitpunkt
+                timeout = max(0.0, deadline - time.monotonic()) if batch else None
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(batch)
+                return
+
+            if isinstance(item, _FlushRequest):
+                self._write(batch)
+                batch = []
+                item.done.set()
+                continue
+
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            self._write(batch)
+            batch = []
+
+    def _write(self, batch: List[Dict]) -> None:
+        """Schreibe einen Batch (+ Meldung verworfener Einträge); Fehler dürfen den Thread nie beenden"""
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, Counter()
+
+        if dropped:
+            details = ", ".join(f"{level}: {count}" for level, count in sorted(dropped.items(), key=lambda x: str(x[0])))
+            batch = batch + [{
+                "job_id": "SYSTEM_ERROR",
+                "job_type": "log_service",
+                "level": "WARNING",
+                "message": f"Log-Queue voll: {sum(dropped.values())} Einträge verworfen ({details})",
+                "timestamp": datetime.now()
+            }]
+
+        if not batch:
+            return
+
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            print(f"LOG WRITER FAILED: {e}")
@@ -8,6 +8,7 @@ REST API Endpoints für TEMU Integration:
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
 from typing import Optional
 from datetime import datetime
 
@@ -132,6 +133,27 @@ async def trigger_inventory_sync(
         "message": "Inventory Sync Workflow wurde gestartet. Siehe /api/jobs für Status."
     }
 
+@router.post("/outbox/redrive")
+async def redrive_outbox(push_type: str = "tracking", ref_id: Optional[int] = None):
+    """
+    Aufgegebene ('dead') Push-Intents erneut einreihen (TEMU_PUSH_MODE=outbox).
+    Der Dispatcher sendet sie beim nächsten Lauf.
+
+    Query Params:
+    - push_type: "tracking" oder "stock" (default: tracking)
+    - ref_id: nur diese Referenz (temu_orders.id / temu_inventory.id), sonst alle
+    """
+    from .services.push_outbox_service import PushOutboxService, PUSH_STOCK, PUSH_TRACKING
+
+    if push_type not in [PUSH_STOCK, PUSH_TRACKING]:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid push_type. Must be 'stock' or 'tracking'"
+        )
+
+    count = PushOutboxService().redrive_dead(push_type, [ref_id] if ref_id is not None else None)
+    return {"status": "ok", "push_type": push_type, "redriven": count}
+
 # ═══════════════════════════════════════════════════════════════
 # STATISTICS & MONITORING
 # ═══════════════════════════════════════════════════════════════
@@ -164,6 +186,21 @@ async def get_stats():
         }
     }
 
+# ═══════════════════════════════════════════════════════════════
+# XML ARCHIV
+# ═══════════════════════════════════════════════════════════════
+
+@router.get("/orders/{bestell_id}/xml")
+async def get_order_xml(bestell_id: str):
+    """Einzel-XML einer Bestellung aus dem komprimierten Archiv (data/temu/export/archive)"""
+    from modules.jtl.xml_export.xml_archive import OrderXmlArchive
+    from .services.config import XML_ARCHIVE_DIR, XML_ARCHIVE_RETENTION_MONTHS
+
+    xml_bytes = OrderXmlArchive(XML_ARCHIVE_DIR, XML_ARCHIVE_RETENTION_MONTHS).fetch(bestell_id)
+    if xml_bytes is None:
+        raise HTTPException(status_code=404, detail=f"Keine archivierte XML für {bestell_id}")
+    return Response(content=xml_bytes, media_type="application/xml; charset=ISO-8859-1")
+
 # ═══════════════════════════════════════════════════════════════
 # EXPORT FUNCTION (für Gateway Integration)
 # ═══════════════════════════════════════════════════════════════
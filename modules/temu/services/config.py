@@ -15,11 +15,82 @@ TEMU_XML_DIR = TEMU_DATA_DIR / 'xml'
 TEMU_EXPORT_DIR = TEMU_DATA_DIR / 'export'
 TEMU_API_RESPONSES_DIR = TEMU_DATA_DIR / 'api_responses'
 
+# Einzel-XML Archiv (data/temu/export): 'bundle' = komprimierte Tages-Bundles mit Index pro Monat,
+# 'files' = eine XML-Datei pro Order (alt). Monats-Partitionen älter als die Retention werden gelöscht.
+XML_ARCHIVE_MODE = os.getenv('XML_ARCHIVE_MODE', 'bundle')
+XML_ARCHIVE_DIR = TEMU_EXPORT_DIR / 'archive'
+XML_ARCHIVE_RETENTION_MONTHS = int(os.getenv('XML_ARCHIVE_RETENTION_MONTHS', '24'))
+
+# XML Backlog-Modus: ab dieser Anzahl offener Orders werden Items/Kundennummern vorab geladen und
+# die XML-Dokumente in einem Process Pool erzeugt (0 = immer sequentiell)
+XML_EXPORT_PARALLEL_THRESHOLD = int(os.getenv('XML_EXPORT_PARALLEL_THRESHOLD', '500'))
+XML_EXPORT_WORKERS = int(os.getenv('XML_EXPORT_WORKERS', str(os.cpu_count() or 1)))
+XML_EXPORT_CHUNK_SIZE = int(os.getenv('XML_EXPORT_CHUNK_SIZE', '100'))
+
+# temu_xml_export: Alt-Zeilen (NVARCHAR) pro Order-Lauf in Batches nach xml_content_gz komprimieren
+XML_EXPORT_COMPRESS_BATCH_SIZE = int(os.getenv('XML_EXPORT_COMPRESS_BATCH_SIZE', '500'))
+XML_EXPORT_COMPRESS_MAX_BATCHES = int(os.getenv('XML_EXPORT_COMPRESS_MAX_BATCHES', '20'))
+
 # File Paths
 CSV_INPUT_PATH = DATA_DIR / os.getenv('CSV_INPUT_PATH', 'order_export.csv')
 XML_OUTPUT_PATH = TEMU_XML_DIR / os.getenv('XML_OUTPUT_PATH', 'jtl_temu_bestellungen.xml')
 TRACKING_EXPORT_PATH = DATA_DIR / os.getenv('TRACKING_EXPORT_PATH', 'temu_tracking_export.xlsx')
 
+# Engines
+# 'python' = Bestände nach Python laden und abgleichen, 'sql' = set-basiert auf dem SQL Server (Cross-DB Join)
+# Unterschied bei needs_sync: 'python' markiert bei jedem Lauf alle Artikel mit jtl_stock > 0 (Bestand 0
+# wird nie gepusht), 'sql' schreibt nur geänderte Zeilen und markiert sie bei jtl_stock <> temu_stock
+# (auch ein Abfall auf 0 wird gepusht, unveränderte Bestände nicht erneut).
+INVENTORY_STOCK_ENGINE = os.getenv('INVENTORY_STOCK_ENGINE', 'python')
+# 'python' = XML mit lxml aus Order-/Item-Objekten bauen, 'sql' = set-basiert per FOR XML PATH auf dem SQL Server
+# (Abgleich gegen den Python-Generator: python -m modules.jtl.xml_export.xml_engine_check)
+XML_EXPORT_ENGINE = os.getenv('XML_EXPORT_ENGINE', 'python')
+# 'python' = Tracking pro Order aus JTL holen, 'sql' = ein Cross-DB UPDATE ... FROM für alle offenen Orders
+TRACKING_IMPORT_ENGINE = os.getenv('TRACKING_IMPORT_ENGINE', 'python')
+
+# Inkrementeller Bestandsabgleich (Quick Mode) über SQL Server Change Tracking in JTL.
+# Voraussetzung: ALTER DATABASE eazybusiness SET CHANGE_TRACKING = ON
+#                ALTER TABLE <tabelle> ENABLE CHANGE_TRACKING  (für jede Tabelle unten, PK = kArtikel)
+INVENTORY_CHANGE_FEED = os.getenv('INVENTORY_CHANGE_FEED', 'false').lower() == 'true'
+JTL_STOCK_CHANGE_TABLES = [
+    t.strip() for t in os.getenv('JTL_STOCK_CHANGE_TABLES', 'dbo.tArtikel,dbo.tlagerbestand').split(',') if t.strip()
+]
+JTL_STOCK_WATERMARK = 'jtl_stock_change_tracking'
+
+# Stock Change Watcher (workers/stock_change_watcher.py): pollt den JTL Change Feed und
+# pusht geänderte Bestände sofort; der sync_inventory Intervall-Job bleibt als Sicherheitsnetz.
+STOCK_WATCHER_ENABLED = os.getenv('STOCK_WATCHER_ENABLED', 'false').lower() == 'true'
+STOCK_WATCHER_POLL_SECONDS = int(os.getenv('STOCK_WATCHER_POLL_SECONDS', '5'))
+STOCK_WATCHER_DEBOUNCE_SECONDS = int(os.getenv('STOCK_WATCHER_DEBOUNCE_SECONDS', '10'))
+STOCK_WATCHER_MAX_DELAY_SECONDS = int(os.getenv('STOCK_WATCHER_MAX_DELAY_SECONDS', '60'))
+
+# Order Workflow Pipeline: Tracking-Block (Steps 4-5) läuft parallel zum Import-Block (Steps 1-3)
+# auf eigenen Connections. Gesamtdauer = max(Import, Tracking) statt Summe.
+ORDER_WORKFLOW_PIPELINE = os.getenv('ORDER_WORKFLOW_PIPELINE', 'false').lower() == 'true'
+
+# Tracking Upload (bg.logistics.shipment.v2.confirm): Bestellartikel pro Call, parallele Calls
+TRACKING_UPLOAD_BATCH_SIZE = int(os.getenv('TRACKING_UPLOAD_BATCH_SIZE', '50'))
+TRACKING_UPLOAD_WORKERS = int(os.getenv('TRACKING_UPLOAD_WORKERS', '4'))
+
+# TEMU Pushes (Bestände, Tracking): 'inline' = direkt im Workflow senden,
+# 'outbox' = Intents in der Workflow-Transaktion in temu_push_outbox schreiben, Dispatcher sendet
+# (parallel, idempotent, Retry pro Item mit Backoff). Der Scheduler leert die Outbox zusätzlich periodisch.
+TEMU_PUSH_MODE = os.getenv('TEMU_PUSH_MODE', 'inline')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '500'))
+OUTBOX_DISPATCH_WORKERS = int(os.getenv('OUTBOX_DISPATCH_WORKERS', '4'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '10'))
+OUTBOX_DISPATCH_SECONDS = int(os.getenv('OUTBOX_DISPATCH_SECONDS', '60'))
+
+
+# Hot/Cold Archivierung: versendete + an TEMU gemeldete Orders älter als N Tage wandern
+# (inkl. Items und XML-Exporte) in *_archive Tabellen; Lookups über die Views *_all.
+# Muss deutlich größer als das Import-Fenster (days_back) sein, sonst importiert der Workflow Orders erneut.
+ORDER_ARCHIVE_ENABLED = os.getenv('ORDER_ARCHIVE_ENABLED', 'false').lower() == 'true'
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '90'))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', '500'))
+ORDER_ARCHIVE_MAX_BATCHES = int(os.getenv('ORDER_ARCHIVE_MAX_BATCHES', '200'))
+ORDER_ARCHIVE_INTERVAL_HOURS = int(os.getenv('ORDER_ARCHIVE_INTERVAL_HOURS', '24'))
+
 
 def ensure_directories():
     """Create all required directories if they don't exist."""
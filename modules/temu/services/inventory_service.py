@@ -1,8 +1,9 @@
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set
 from pathlib import Path
-from .config import TEMU_API_RESPONSES_DIR
+from .config import TEMU_API_RESPONSES_DIR, JTL_STOCK_CHANGE_TABLES, JTL_STOCK_WATERMARK
 from modules.shared import log_service
+from modules.shared.database.repositories.jtl_common.jtl_repository import normalize_sku
 
 
 class InventoryService:
@@ -89,42 +90,51 @@ class InventoryService:
                       f"Produkte: {result['inserted']} neu, {result['updated']} aktualisiert")
         return result
     
-    def refresh_inventory_from_jtl(self, product_repo, inventory_repo, jtl_repo, job_id: str) -> Dict[str, int]:
+    def refresh_inventory_from_jtl(self, product_repo, inventory_repo, jtl_repo, job_id: str,
+                                   changed_article_ids: Optional[Set[int]] = None) -> Dict[str, int]:
         """
         Liest JTL-Bestände und aktualisiert temu_inventory.
-        Optimiert: Batch-Abfrage statt N+1 Queries.
+        Optimiert: Batch-Abfrage statt N+1 Queries (auch für noch nicht gemappte SKUs).
+        
+        Args:
+            changed_article_ids: Optional - nur diese JTL Artikel (plus neu gemappte) abgleichen
+                                 (Change Feed). None = alle Produkte.
+        
+        Returns:
+            {"inserted": n, "updated": n, "success": bool} - success False, wenn Bestände nicht
+            gelesen oder nicht geschrieben werden konnten (dann wird nichts übernommen)
         """
         products = product_repo.fetch_all()
         items_to_upsert = []
         
-        # 1. Sammle alle JTL Artikel-IDs, die wir schon kennen
+        # 1. Fehlende JTL Artikel-IDs im Batch auflösen (cArtNr IN (...)) und in einem Bulk-Update speichern
+        newly_mapped = self._resolve_missing_article_ids(products, product_repo, jtl_repo, job_id)
+        
+        # Change Feed: nur geänderte + gerade erst gemappte Artikel
+        if changed_article_ids is not None:
+            products = [
+                p for p in products
+                if p["id"] in newly_mapped or p.get("jtl_article_id") in changed_article_ids
+            ]
+        
+        # 2. Sammle alle JTL Artikel-IDs (inkl. der gerade aufgelösten)
         known_jtl_ids = [p["jtl_article_id"] for p in products if p.get("jtl_article_id")]
         
-        # 2. Batch-Abfrage der Bestände für alle bekannten IDs (nur 1-x SQL Queries statt 5000)
+        # 3. Batch-Abfrage der Bestände für alle IDs (nur 1-x SQL Queries statt 5000)
         stock_map = {}
         if known_jtl_ids:
             log_service.log(job_id, "jtl_to_inventory", "INFO", 
                           f"→ Lade Bestände für {len(known_jtl_ids)} Artikel im Batch...")
             stock_map = jtl_repo.get_stocks_by_article_ids(known_jtl_ids)
+            if stock_map is None:
+                # Kein Bestand 0 für alle schreiben, nur weil die JTL Abfrage fehlschlug
+                log_service.log(job_id, "jtl_to_inventory", "ERROR", 
+                              "✗ JTL Bestände konnten nicht gelesen werden - Abgleich übersprungen")
+                return {"inserted": 0, "updated": 0, "success": False}
         
         for p in products:
-            sku = p.get("sku")
             jtl_article_id = p.get("jtl_article_id")
-            
-            # Fall A: JTL ID fehlt -> Einzeln nachladen (passiert nur selten/initial)
-            if not jtl_article_id and sku:
-                jtl_article_id = jtl_repo.get_article_id_by_sku(sku)
-                if jtl_article_id:
-                    # Update Product Table sofort, damit wir es beim nächsten Mal haben
-                    product_repo.update_jtl_article_id(p["id"], jtl_article_id)
-                    # Wenn wir es gerade erst gefunden haben, müssen wir den Stock einzeln holen
-                    stock = jtl_repo.get_stock_by_article_id(jtl_article_id)
-                else:
-                    stock = 0
-            
-            # Fall B: JTL ID bekannt -> Aus der Batch-Map holen (Superschnell)
-            else:
-                stock = stock_map.get(jtl_article_id, 0) if jtl_article_id else 0
+            stock = stock_map.get(jtl_article_id, 0) if jtl_article_id else 0
             
             # Items für den Upsert vorbereiten
             items_to_upsert.append({
@@ -134,11 +144,118 @@ class InventoryService:
             })
         
         if not items_to_upsert:
-            return {"inserted": 0, "updated": 0}
+            return {"inserted": 0, "updated": 0, "success": True}
         
-        # 3. Batch-Upsert in temu_inventory
+        # 4. Batch-Upsert in temu_inventory
         result = inventory_repo.upsert_inventory(items_to_upsert)
+        if not result.get("success", True):
+            return result
         
         log_service.log(job_id, "jtl_to_inventory", "INFO", 
                       f"Bestände abgeglichen: {result['inserted']} neu, {result['updated']} aktualisiert")
-        return result
\ No newline at end of file
+        return result
+    
+    def refresh_inventory_incremental(self, product_repo, inventory_repo, jtl_repo, sync_state_repo,
+                                      job_id: str, force_full: bool = False) -> Dict[str, int]:
+        """
+        Bestandsabgleich über den JTL Change Feed (SQL Server Change Tracking).
+        Liest nur Artikel, deren Bestand/nPuffer sich seit dem letzten Lauf geändert hat.
+        Fällt auf den Vollabgleich zurück, wenn kein gültiger Watermark existiert.
+        
+        Args:
+            sync_state_repo: SyncStateRepository (gleiche TOCI Transaktion wie inventory_repo)
+            force_full: Vollabgleich erzwingen (Watermark wird trotzdem fortgeschrieben)
+        
+        Der Watermark wird nur fortgeschrieben, wenn Lesen und Upsert erfolgreich waren - in der
+        Transaktion von sync_state_repo/inventory_repo, d.h. er committet mit den Beständen.
+        """
+        # Version VOR dem Lesen merken -> Änderungen während des Laufs kommen beim nächsten Mal
+        version = jtl_repo.get_change_tracking_version()
+        if version is None:
+            log_service.log(job_id, "jtl_to_inventory", "WARNING", 
+                          "⚠ Change Tracking in JTL nicht aktiv → Vollabgleich")
+            return self.refresh_inventory_from_jtl(product_repo, inventory_repo, jtl_repo, job_id=job_id)
+        
+        sync_state_repo.ensure_table_exists()
+        last_version = None if force_full else sync_state_repo.get_watermark(JTL_STOCK_WATERMARK)
+        
+        changed_ids = None
+        if last_version is not None:
+            changed_ids = jtl_repo.get_changed_article_ids(last_version, JTL_STOCK_CHANGE_TABLES)
+        
+        if changed_ids is None:
+            if not force_full:
+                log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                              "Kein gültiger Change-Feed Watermark → Vollabgleich")
+            result = self.refresh_inventory_from_jtl(product_repo, inventory_repo, jtl_repo, job_id=job_id)
+        else:
+            log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                          f"→ Change Feed: {len(changed_ids)} geänderte JTL Artikel seit Version {last_version}")
+            result = self.refresh_inventory_from_jtl(
+                product_repo, inventory_repo, jtl_repo, job_id=job_id,
+                changed_article_ids=set(changed_ids)
+            )
+        
+        if not result.get("success", True):
+            log_service.log(job_id, "jtl_to_inventory", "WARNING", 
+                          f"⚠ Bestandsabgleich fehlgeschlagen - Change-Feed Watermark bleibt auf {last_version}")
+            return result
+        
+        sync_state_repo.set_watermark(JTL_STOCK_WATERMARK, version)
+        return result
+    
+    def _resolve_missing_article_ids(self, products: List[Dict[str, Any]], product_repo, jtl_repo,
+                                     job_id: str) -> Set[int]:
+        """
+        Löst fehlende JTL Artikel-IDs im Batch auf und speichert sie per Bulk-Update.
+        Setzt jtl_article_id direkt in den übergebenen Produkt-Dicts.
+        
+        Returns:
+            product_ids der neu gemappten Produkte
+        """
+        unmapped = [p for p in products if not p.get("jtl_article_id") and p.get("sku")]
+        if not unmapped:
+            return set()
+        
+        log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                      f"→ Löse {len(unmapped)} SKUs ohne JTL Artikel-ID im Batch auf...")
+        article_ids = jtl_repo.get_article_ids_by_skus([p["sku"] for p in unmapped])
+        
+        updates = []
+        for p in unmapped:
+            jtl_article_id = article_ids.get(normalize_sku(p["sku"]))
+            if jtl_article_id:
+                p["jtl_article_id"] = jtl_article_id
+                updates.append({"product_id": p["id"], "jtl_id": jtl_article_id})
+        
+        if updates:
+            product_repo.update_jtl_article_ids(updates)
+            log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                          f"  ✓ {len(updates)} JTL Artikel-IDs zugeordnet")
+        
+        return {u["product_id"] for u in updates}
+    
+    def refresh_inventory_set_based(self, inventory_repo, job_id: str) -> Dict[str, int]:
+        """
+        Wie refresh_inventory_from_jtl, aber komplett auf dem SQL Server (ein Round Trip).
+        Es kommen nur geänderte Zeilen zurück, Python hält keine Bestandslisten im Speicher.
+        
+        Returns:
+            {"inserted": n, "updated": n, "success": bool} - bei success False muss der Aufrufer
+            die Transaktion zurückrollen (Artikel-Zuordnung evtl. geschrieben, MERGE nicht)
+        """
+        log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                      "→ Gleiche Bestände set-basiert auf dem SQL Server ab...")
+        changed = inventory_repo.refresh_from_jtl_set_based()
+        if changed is None:
+            log_service.log(job_id, "jtl_to_inventory", "ERROR", 
+                          "✗ Set-basierter Bestandsabgleich fehlgeschlagen")
+            return {"inserted": 0, "updated": 0, "success": False}
+        
+        inserted = sum(1 for c in changed if c["action"] == "INSERT")
+        updated = len(changed) - inserted
+        to_push = sum(1 for c in changed if c["needs_sync"])
+        
+        log_service.log(job_id, "jtl_to_inventory", "INFO", 
+                      f"Bestände abgeglichen: {inserted} neu, {updated} geändert, {to_push} zu TEMU")
+        return {"inserted": inserted, "updated": updated, "success": True}
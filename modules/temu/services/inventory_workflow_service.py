@@ -1,7 +1,8 @@
 """TEMU Inventory Workflow Service - 4-Schritt Orchestrierung (Final)"""
 
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from modules.shared.config.settings import TEMU_APP_KEY, TEMU_APP_SECRET, TEMU_ACCESS_TOKEN, TEMU_API_ENDPOINT, DB_TOCI, DB_JTL
 from modules.shared import log_service
@@ -9,14 +10,21 @@ from modules.shared import db_connect
 from modules.shared.database.repositories.temu.product_repository import ProductRepository
 from modules.shared.database.repositories.temu.inventory_repository import InventoryRepository
 from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
+from modules.shared.database.repositories.common.sync_state_repository import SyncStateRepository
+from modules.shared.database.repositories.common.outbox_repository import OutboxRepository
 from modules.shared.connectors.temu.service import TemuMarketplaceService
 from .inventory_service import InventoryService
 from .stock_sync_service import StockSyncService
+from .push_outbox_service import PushOutboxService, PUSH_STOCK
+from .config import INVENTORY_STOCK_ENGINE, INVENTORY_CHANGE_FEED, TEMU_PUSH_MODE
 
 
 class InventoryWorkflowService:
     """TEMU Inventory Workflow mit Dependency Injection und Lazy Caches."""
     
+    # Prozessweit nur ein Inventory-Lauf gleichzeitig (Intervall-Job + Stock Change Watcher teilen Watermark)
+    _run_lock = threading.Lock()
+    
     def __init__(
         self,
         temu_service: TemuMarketplaceService | None = None,
@@ -36,15 +44,24 @@ class InventoryWorkflowService:
         self._inventory_repo = None
         self._jtl_repo = None
     
-    def run_complete_workflow(self, mode: str = "quick", verbose: bool = False) -> bool:
+    def run_complete_workflow(self, mode: str = "quick", verbose: bool = False,
+                              change_feed: Optional[bool] = None) -> bool:
         """
         Führe kompletten TEMU Inventory Sync aus (4 Schritte)
-        Transaktionssicher: Alles oder nichts.
+        Jeder DB-Schritt committet in einer eigenen kurzen Transaktion, TEMU API Calls laufen außerhalb.
+        
+        Args:
+            change_feed: Optional - JTL Change Feed für Step 3 erzwingen/abschalten
+                         (None = INVENTORY_CHANGE_FEED aus der Config)
         """
+        with self._run_lock:
+            return self._run_workflow(mode, verbose, change_feed)
+    
+    def _run_workflow(self, mode: str, verbose: bool, change_feed: Optional[bool]) -> bool:
         start_time = datetime.now()
         job_id = f"temu_inventory_{int(start_time.timestamp())}"
         
-        log_service.start_job_capture(job_id, "inventory_workflow")
+        log_service.start_job_capture(job_id, "inventory_workflow", verbose=verbose)
 
         # Credential Guard
         if not all([TEMU_APP_KEY, TEMU_APP_SECRET, TEMU_ACCESS_TOKEN]):
@@ -53,41 +70,58 @@ class InventoryWorkflowService:
             return False
         
         try:
-            # --- TRANSAKTIONS-START ---
-            # Wir öffnen beide Connections. Wenn eine crasht, rollen beide zurück.
-            with db_connect(DB_TOCI) as toci_conn:
+            # Kurze Transaktionen: TEMU API Calls laufen NIE innerhalb einer offenen DB Transaktion,
+            # damit Locks auf temu_products/temu_inventory und die JTL Connection sofort frei werden.
+            
+            # Step 1 & 2: Full Mode (SKU Import)
+            if mode == "full":
+                log_service.log(job_id, "inventory_workflow", "INFO", "[1/4] TEMU API → JSON")
+                # Step 1 braucht keine DB Transaction, ist nur API Call
+                with log_service.step_timer("api_to_json"):
+                    fetched = self._step_1_api_to_json(job_id, verbose)
+                if not fetched:
+                    raise Exception("API Fetch fehlgeschlagen")
+                log_service.log(job_id, "inventory_workflow", "INFO", "✓ [1/4] API → JSON erfolgreich")
+                
+                log_service.log(job_id, "inventory_workflow", "INFO", "[2/4] JSON → Datenbank")
+                # Step 2 schreibt in DB_TOCI (eigene kurze Transaktion)
+                with log_service.step_timer("json_to_db"), db_connect(DB_TOCI) as toci_conn:
+                    self._toci_conn = toci_conn
+                    self._step_2_json_to_db(job_id)
+                self._reset_connections()
+                log_service.log(job_id, "inventory_workflow", "INFO", "✓ [2/4] JSON → DB erfolgreich")
+            else:
+                log_service.log(job_id, "inventory_workflow", "INFO", 
+                              f"Quick Mode: Überspringe Steps 1+2 (SKU-Import)")
+            
+            # Step 3: JTL Stock → Inventory (Lesen von JTL, Schreiben in TOCI) - reine DB-Arbeit
+            log_service.log(job_id, "inventory_workflow", "INFO", "[3/4] JTL → Inventory Update")
+            with log_service.step_timer("jtl_to_inventory"), db_connect(DB_TOCI) as toci_conn:
                 self._toci_conn = toci_conn
                 
-                with db_connect(DB_JTL) as jtl_conn:
-                    self._jtl_conn = jtl_conn
-                    
-                    # Step 1 & 2: Full Mode (SKU Import)
-                    if mode == "full":
-                        log_service.log(job_id, "inventory_workflow", "INFO", "[1/4] TEMU API → JSON")
-                        # Step 1 braucht keine DB Transaction, ist nur API Call
-                        if not self._step_1_api_to_json(job_id, verbose):
-                            raise Exception("API Fetch fehlgeschlagen")
-                        log_service.log(job_id, "inventory_workflow", "INFO", "✓ [1/4] API → JSON erfolgreich")
-                        
-                        log_service.log(job_id, "inventory_workflow", "INFO", "[2/4] JSON → Datenbank")
-                        # Step 2 schreibt in DB_TOCI
-                        self._step_2_json_to_db(job_id)
-                        log_service.log(job_id, "inventory_workflow", "INFO", "✓ [2/4] JSON → DB erfolgreich")
-                    else:
-                        log_service.log(job_id, "inventory_workflow", "INFO", 
-                                      f"Quick Mode: Überspringe Steps 1+2 (SKU-Import)")
-                    
-                    # Step 3: JTL Stock → Inventory (Lesen von JTL, Schreiben in TOCI)
-                    log_service.log(job_id, "inventory_workflow", "INFO", "[3/4] JTL → Inventory Update")
-                    self._step_3_jtl_stock_to_inventory(job_id)
-                    log_service.log(job_id, "inventory_workflow", "INFO", "✓ [3/4] JTL → Inventory erfolgreich")
-                    
-                    # Step 4: Inventory → TEMU API (Lesen von TOCI, API Upload, Update TOCI)
-                    log_service.log(job_id, "inventory_workflow", "INFO", "[4/4] Inventory → TEMU API")
-                    self._step_4_sync_to_temu(job_id)
-                    log_service.log(job_id, "inventory_workflow", "INFO", "✓ [4/4] Sync → API erfolgreich")
+                if INVENTORY_STOCK_ENGINE == "sql":
+                    # Set-basiert über die TOCI Connection, keine JTL Connection nötig
+                    self._step_3_jtl_stock_to_inventory(job_id, mode, change_feed)
+                else:
+                    with db_connect(DB_JTL) as jtl_conn:
+                        self._jtl_conn = jtl_conn
+                        self._step_3_jtl_stock_to_inventory(job_id, mode, change_feed)
+                
+                if TEMU_PUSH_MODE == "outbox":
+                    # Push-Intents in derselben Transaktion wie die Bestände (atomar, rollt mit zurück)
+                    PushOutboxService().enqueue_stock(
+                        OutboxRepository(connection=toci_conn),
+                        self._get_inventory_repo().get_needs_sync(),
+                        job_id=job_id
+                    )
+            self._reset_connections()
+            log_service.log(job_id, "inventory_workflow", "INFO", "✓ [3/4] JTL → Inventory erfolgreich")
             
-            # --- TRANSAKTIONS-ENDE (Auto-Commit) ---
+            # Step 4: Inventory → TEMU API (Snapshot lesen, API Upload ohne Transaktion, Ergebnis kompakt schreiben)
+            log_service.log(job_id, "inventory_workflow", "INFO", "[4/4] Inventory → TEMU API")
+            with log_service.step_timer("inventory_to_api"):
+                self._step_4_sync_to_temu(job_id)
+            log_service.log(job_id, "inventory_workflow", "INFO", "✓ [4/4] Sync → API erfolgreich")
 
             # Erfolg
             duration = (datetime.now() - start_time).total_seconds()
@@ -106,11 +140,15 @@ class InventoryWorkflowService:
             return False
         finally:
             # Aufräumen für nächsten Run
-            self._toci_conn = None
-            self._jtl_conn = None
-            self._product_repo = None
-            self._inventory_repo = None
-            self._jtl_repo = None
+            self._reset_connections()
+    
+    def _reset_connections(self):
+        """Setzt Connection- und Repo-Caches zurück (nach jeder kurzen Transaktion)."""
+        self._toci_conn = None
+        self._jtl_conn = None
+        self._product_repo = None
+        self._inventory_repo = None
+        self._jtl_repo = None
     
     # ... (Step Methoden bleiben fast gleich, nur Aufrufe sind jetzt sicher) ...
 
@@ -136,31 +174,76 @@ class InventoryWorkflowService:
         inv_service = self._get_inventory_service()
         inv_service.import_products_from_raw(product_repo, job_id=job_id)
     
-    def _step_3_jtl_stock_to_inventory(self, job_id: str) -> None:
-        """Step 3: JTL -> Toci"""
+    def _step_3_jtl_stock_to_inventory(self, job_id: str, mode: str = "quick",
+                                       change_feed: Optional[bool] = None) -> None:
+        """Step 3: JTL -> Toci (Fehler -> Exception, die Step-3 Transaktion rollt komplett zurück)"""
+        if INVENTORY_STOCK_ENGINE == "sql":
+            # Set-basiert: Cross-DB MERGE auf dem SQL Server, nur Deltas kommen zurück
+            result = self._get_inventory_service().refresh_inventory_set_based(
+                self._get_inventory_repo(),
+                job_id=job_id
+            )
+            self._raise_on_failed_refresh(result)
+            return
+
         product_repo = self._get_product_repo()
         inventory_repo = self._get_inventory_repo()
         jtl_repo = self._get_jtl_repo()
         inv_service = self._get_inventory_service()
 
-        inv_service.refresh_inventory_from_jtl(
+        use_change_feed = INVENTORY_CHANGE_FEED if change_feed is None else change_feed
+        if use_change_feed:
+            # Change Feed: Quick Mode liest nur geänderte Artikel, Full Mode setzt den Watermark neu
+            result = inv_service.refresh_inventory_incremental(
+                product_repo,
+                inventory_repo,
+                jtl_repo,
+                SyncStateRepository(connection=self._toci_conn),
+                job_id=job_id,
+                force_full=(mode == "full")
+            )
+            self._raise_on_failed_refresh(result)
+            return
+
+        result = inv_service.refresh_inventory_from_jtl(
             product_repo, 
             inventory_repo, 
             jtl_repo, 
             job_id=job_id
         )
+        self._raise_on_failed_refresh(result)
+
+    def _raise_on_failed_refresh(self, result: Dict) -> None:
+        """Kein Teil-Commit (Artikel-Zuordnung ohne Bestände) und keine Push-Intents aus altem Stand"""
+        if not result.get("success", True):
+            raise Exception("JTL Bestandsabgleich fehlgeschlagen")
     
     def _step_4_sync_to_temu(self, job_id: str) -> None:
-        """Step 4: Toci -> API"""
-        inventory_repo = self._get_inventory_repo()
+        """Step 4: Toci -> API (drei Phasen, nur die DB-Phasen in kurzen Transaktionen)"""
         temu_service = self._get_temu_service()
+
+        if TEMU_PUSH_MODE == "outbox":
+            # Intents aus Step 3 senden: parallel, idempotent, Retry pro Item
+            result = PushOutboxService(temu_service).drain(job_id=job_id, push_types=(PUSH_STOCK,))
+            log_service.count("skus_pushed", result.get('sent', 0))
+            return
+
         sync_service = self._get_stock_sync_service()
 
-        sync_service.sync_deltas_to_temu(
-            temu_service.inventory_api, 
-            inventory_repo, 
-            job_id=job_id
-        )
+        # 1. Snapshot der Deltas lesen
+        with db_connect(DB_TOCI) as toci_conn:
+            deltas = InventoryRepository(connection=toci_conn).get_needs_sync()
+
+        # 2. TEMU API außerhalb jeder Transaktion
+        updates = sync_service.push_deltas(temu_service.inventory_api, deltas, job_id=job_id)
+        log_service.count("skus_pushed", len(updates))
+
+        # 3. Ergebnis kompakt zurückschreiben
+        if updates:
+            with db_connect(DB_TOCI) as toci_conn:
+                InventoryRepository(connection=toci_conn).mark_synced(updates)
+            log_service.log(job_id, "inventory_to_api", "INFO", 
+                          f"✓ {len(updates)} Bestände in DB aktualisiert")
 
     # --- Lazy Loader Helpers (angepasst auf Injection) ---
 
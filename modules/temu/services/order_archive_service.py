@@ -0,0 +1,57 @@
+"""TEMU Order Archive Service - Abgeschlossene Orders batchweise in Archiv-Tabellen verschieben"""
+
+from typing import Dict, Optional
+
+from modules.shared.config.settings import DB_TOCI
+from modules.shared import log_service
+from modules.shared import db_connect
+from modules.shared.database.repositories.temu.order_repository import OrderRepository
+from modules.shared.database.repositories.temu.order_archive_repository import OrderArchiveRepository
+from .config import ORDER_ARCHIVE_AFTER_DAYS, ORDER_ARCHIVE_BATCH_SIZE, ORDER_ARCHIVE_MAX_BATCHES
+
+
+class OrderArchiveService:
+    """
+    Hot/Cold Archivierung: hält temu_orders, temu_order_items und temu_xml_export klein,
+    damit die Workflow-Queries (find_by_status, find_orders_for_tracking, ...) nicht mit
+    der Historie wachsen. Jeder Batch committet einzeln (kurze Locks, kleines Transaktionslog).
+    """
+
+    def __init__(self, older_than_days: int = ORDER_ARCHIVE_AFTER_DAYS,
+                 batch_size: int = ORDER_ARCHIVE_BATCH_SIZE,
+                 max_batches: int = ORDER_ARCHIVE_MAX_BATCHES):
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    def run(self, job_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Ein Archivierungs-Lauf (bis keine Kandidaten mehr da sind oder max_batches erreicht).
+
+        Returns:
+            {'orders': n, 'items': n, 'xml_exports': n}
+        """
+        totals = {'orders': 0, 'items': 0, 'xml_exports': 0}
+
+        # Archiv-Tabellen übernehmen die Spalten der Hot-Tabellen -> erst Migrationen anwenden
+        OrderRepository().ensure_xml_export_compression()
+        if not OrderArchiveRepository().ensure_archive_tables():
+            log_service.log(job_id, "order_archive", "ERROR", "✗ Archiv-Tabellen konnten nicht angelegt werden")
+            return totals
+
+        for _ in range(self.max_batches):
+            with db_connect(DB_TOCI) as conn:
+                moved = OrderArchiveRepository(connection=conn).archive_batch(
+                    self.older_than_days, self.batch_size
+                )
+
+            for key, value in moved.items():
+                totals[key] += value
+            if moved['orders'] < self.batch_size:
+                break
+
+        if totals['orders']:
+            log_service.log(job_id, "order_archive", "INFO",
+                            f"✓ {totals['orders']} Orders archiviert (älter als {self.older_than_days} Tage, "
+                            f"{totals['items']} Artikel, {totals['xml_exports']} XML-Exporte)")
+        return totals
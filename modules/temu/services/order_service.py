@@ -8,6 +8,7 @@ from typing import Dict, Optional
 from modules.shared.config.settings import DB_TOCI
 from .config import TEMU_API_RESPONSES_DIR
 from modules.shared import db_connect
+from modules.shared.database import is_deadlock
 from modules.shared.database.repositories.temu.order_repository import OrderRepository, Order
 from modules.shared.database.repositories.temu.order_item_repository import OrderItemRepository, OrderItem
 from modules.shared import log_service
@@ -184,7 +185,7 @@ class OrderService:
                         email=email,
                         telefon_empfaenger=telefon,
                         versandkosten=versandkosten_netto,
-                        status=existing_order.status, # Status nicht überschreiben!
+                        status=None, # Status nicht überschreiben (DB-Wert bleiben lassen, Tracking kann parallel laufen)!
                         xml_erstellt=existing_order.xml_erstellt,
                         trackingnummer=existing_order.trackingnummer,
                         versanddienstleister=existing_order.versanddienstleister
@@ -192,7 +193,7 @@ class OrderService:
                     order_repo.save(order)
                     updated_count += 1
                     log_service.log(job_id, "order_service", "INFO", 
-                                      f"  ↻ {parent_order_sn}: aktualisiert")
+                                      f"  ↻ {parent_order_sn}: aktualisiert", aggregate="order_updated")
                 else:
                     order = Order(
                         id=None,
@@ -271,6 +272,9 @@ class OrderService:
                     item_repo.save(item)
             
             except Exception as e:
+                if is_deadlock(e):
+                    # Transaktion ist serverseitig zurückgerollt - Workflow wiederholt Step 2 komplett
+                    raise
                 error_trace = traceback.format_exc()
                 parent_order_sn = order_item.get('parentOrderMap', {}).get('parentOrderSn', 'unknown')
                 log_service.log(job_id, "order_service", "ERROR", 
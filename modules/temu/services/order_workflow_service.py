@@ -1,7 +1,10 @@
 """TEMU Order Workflow Service - 5-Schritt Orchestrierung"""
 
+import contextvars
 import json
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, List
@@ -10,17 +13,29 @@ from modules.shared.config.settings import (
     TEMU_APP_KEY, TEMU_APP_SECRET, TEMU_ACCESS_TOKEN, TEMU_API_ENDPOINT,
     DB_TOCI, DB_JTL
 )
-from .config import TEMU_API_RESPONSES_DIR
+from sqlalchemy.exc import DBAPIError
+from .config import (
+    TEMU_API_RESPONSES_DIR, TEMU_PUSH_MODE, ORDER_WORKFLOW_PIPELINE,
+    XML_EXPORT_COMPRESS_BATCH_SIZE, XML_EXPORT_COMPRESS_MAX_BATCHES
+)
 from modules.shared import db_connect
+from modules.shared.database import is_deadlock
 from modules.shared.database.repositories.temu.order_repository import OrderRepository
 from modules.shared.database.repositories.temu.order_item_repository import OrderItemRepository
 from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
+from modules.shared.database.repositories.jtl_common.customer_mirror_repository import CustomerMirrorRepository
+from modules.shared.database.repositories.common.outbox_repository import OutboxRepository
 from modules.shared.connectors.temu.service import TemuMarketplaceService
 from .order_service import OrderService
-from modules.jtl.xml_export.xml_export_service import XmlExportService
+from modules.jtl.xml_export.xml_export_service import XmlExportService, create_render_pool
 from .tracking_service import TrackingService
+from .push_outbox_service import PushOutboxService, PUSH_TRACKING
 from modules.shared import log_service
 
+# Import- (Steps 2/3) und Tracking-Block (Step 4) konkurrieren im Pipeline-Modus um dieselben
+# temu_orders Zeilen (SQL Server Deadlock 1205) - die betroffene Step-Transaktion wird wiederholt
+DEADLOCK_RETRIES = 3
+
 
 class OrderWorkflowService:
     """
@@ -46,8 +61,16 @@ class OrderWorkflowService:
         self, 
         parent_order_status: int = 2, 
         days_back: int = 7, 
-        verbose: bool = False
+        verbose: bool = False,
+        pipeline: Optional[bool] = None
     ) -> bool:
+        """
+        Führe kompletten TEMU Order Sync aus (Import-Block Steps 1-3, Tracking-Block Steps 4-5)
+        
+        Args:
+            pipeline: Optional - Tracking-Block parallel zum Import-Block ausführen
+                      (None = ORDER_WORKFLOW_PIPELINE aus der Config)
+        """
         start_time = datetime.now()
         job_id = f"temu_orders_{int(start_time.timestamp())}"
         
@@ -60,112 +83,190 @@ class OrderWorkflowService:
             log_service.log(job_id, "order_workflow", "ERROR", "TEMU Credentials fehlen")
             return False
         
-        log_service.start_job_capture(job_id, "order_workflow")
+        log_service.start_job_capture(job_id, "order_workflow", verbose=verbose)
+        
+        use_pipeline = ORDER_WORKFLOW_PIPELINE if pipeline is None else pipeline
         
-        workflow_success = True
+        if use_pipeline:
+            # Pipeline: Tracking-Block arbeitet nur auf bereits exportierten Orders und läuft parallel
+            # zum Import-Block - eigene Service-Instanz = eigene Connections, Repos und Transaktionen
+            tracking_worker = OrderWorkflowService()
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                tracking_future = executor.submit(
+                    contextvars.copy_context().run, tracking_worker._run_tracking_block, job_id
+                )
+                import_success = self._run_import_block(parent_order_status, days_back, verbose, job_id)
+                tracking_success = tracking_future.result()
+        else:
+            import_success = self._run_import_block(parent_order_status, days_back, verbose, job_id)
+            if not import_success:
+                # Wir brechen hier ab, weil ohne Import auch kein Tracking Sinn macht
+                log_service.end_job_capture(success=False, duration=0, error="Import-Phase fehlgeschlagen")
+                return False
+            tracking_success = self._run_tracking_block(job_id)
         
-        # ==============================================================================
-        # BLOCK 1: IMPORT & XML (Kritisch - Neue Bestellungen anlegen)
-        # ==============================================================================
+        workflow_success = import_success and tracking_success
+
+        # Abschluss
+        duration = (datetime.now() - start_time).total_seconds()
+        status_msg = "erfolgreich" if workflow_success else "mit Fehlern beendet"
+        log_service.log(job_id, "order_workflow", "INFO", f"✓ Workflow {status_msg} ({duration:.1f}s)")
+        
+        log_service.end_job_capture(success=workflow_success, duration=duration)
+        return workflow_success
+
+    def _run_import_block(self, parent_order_status: int, days_back: int, verbose: bool, job_id: str) -> bool:
+        """
+        BLOCK 1: IMPORT & XML (Kritisch - Neue Bestellungen anlegen)
+        Steps 1-3, jede DB-Phase in eigener Transaktion (bei Deadlock komplett wiederholt).
+        """
         try:
             # Step 1: API → JSON (Keine DB notwendig)
             log_service.log(job_id, "order_workflow", "INFO", "[1/5] TEMU API → JSON")
-            if not self._step_1_api_to_json(parent_order_status, days_back, verbose, job_id):
+            with log_service.step_timer("api_to_json"):
+                fetched = self._step_1_api_to_json(parent_order_status, days_back, verbose, job_id)
+            if not fetched:
                 raise Exception("API Fetch fehlgeschlagen")
             
-            # DB Transaktion für Import (Step 2: JSON → DB)
-            with db_connect(DB_TOCI) as toci_conn:
-                self._toci_conn = toci_conn
-                
-                with db_connect(DB_JTL) as jtl_conn:
-                    self._jtl_conn = jtl_conn
+            # Schema-Migration temu_xml_export einmalig standalone (Sch-M Lock nicht in der Step-3 Transaktion)
+            if not OrderRepository().ensure_xml_export_compression():
+                log_service.log(job_id, "order_workflow", "WARNING",
+                                "⚠ xml_content_gz Migration fehlgeschlagen - XML Exporte werden unkomprimiert gespeichert")
 
-                    # Step 2: JSON → Database
-                    log_service.log(job_id, "order_workflow", "INFO", "[2/5] JSON → Datenbank")
-                    result = self._step_2_json_to_db(job_id)
-                    log_service.log(job_id, "order_workflow", "INFO", 
-                                  f"✓ [2/5] Import: {result.get('imported', 0)} neu, {result.get('updated', 0)} update")
+            # Step 2: JSON → Database (eigene Transaktion, bei Deadlock komplett wiederholt)
+            self._retry_on_deadlock("2/5", self._run_import_step_2, job_id)
             
             # COMMIT nach Step 2 - Daten sind jetzt in DB sichtbar!
             log_service.log(job_id, "order_workflow", "INFO", "✓ Step 2 committed - Daten persistent")
 
-            # Repositories/Services verwerfen, damit Step 3 frische Connections nutzt
-            self._reset_repos_and_services()
-            
-            # Neue Transaktion für XML Export (Step 3)
-            with db_connect(DB_TOCI) as toci_conn:
-                self._toci_conn = toci_conn
-                
-                with db_connect(DB_JTL) as jtl_conn:
-                    self._jtl_conn = jtl_conn
-                    
-                    # Step 3: Database → XML Export
-                    log_service.log(job_id, "order_workflow", "INFO", "[3/5] Datenbank → XML Export")
-                    xml_result = self._step_3_db_to_xml(job_id)
-                    if not xml_result.get('success'):
-                        log_service.log(job_id, "order_workflow", "WARNING", f"⚠ [3/5] XML: {xml_result.get('message')}")
-                    else:
-                        log_service.log(job_id, "order_workflow", "INFO", f"✓ [3/5] XML: {xml_result.get('exported', 0)} exportiert")
+            # Backlog-Modus: Process Pool VOR der Transaktion starten (spawn, keine offenen Locks/Connections)
+            render_pool = create_render_pool(OrderRepository().count_orders_to_export())
+            try:
+                # Step 3: Database → XML Export (neue Transaktion, bei Deadlock komplett wiederholt)
+                self._retry_on_deadlock("3/5", self._run_import_step_3, job_id, render_pool)
+            finally:
+                if render_pool is not None:
+                    render_pool.shutdown()
             
             # HIER COMMIT für Block 1 (automatisch durch with db_connect exit)
             log_service.log(job_id, "order_workflow", "INFO", "✓ Import-Phase abgeschlossen & gespeichert")
 
+            # Alt-Zeilen in temu_xml_export komprimieren (eigene kurze Transaktionen, nicht kritisch)
+            self._compress_xml_exports(job_id)
+            return True
+
         except Exception as e:
-            workflow_success = False
             error_trace = traceback.format_exc()
             log_service.log(job_id, "order_workflow", "ERROR", f"✗ Import-Phase fehlgeschlagen (Rollback): {str(e)}\n{error_trace}")
-            # Wir brechen hier ab, weil ohne Import auch kein Tracking Sinn macht
-            log_service.end_job_capture(success=False, duration=0, error=str(e))
             return False
         finally:
             self._cleanup_connections() # Clean für nächsten Block
 
-        # ==============================================================================
-        # BLOCK 2: TRACKING UPDATE (Unabhängig - Bestehende Bestellungen updaten)
-        # ==============================================================================
+    def _run_tracking_block(self, job_id: str) -> bool:
+        """
+        BLOCK 2: TRACKING UPDATE (Unabhängig - Bestehende Bestellungen updaten)
+        Steps 4-5; Step 4 wird bei Deadlock (parallel zum Import-Block) wiederholt.
+        """
         try:
-            # Neue Transaktion für Tracking
-            with db_connect(DB_TOCI) as toci_conn:
-                self._toci_conn = toci_conn
-                
-                with db_connect(DB_JTL) as jtl_conn:
-                    self._jtl_conn = jtl_conn
-            
-                    # Step 4: JTL → Tracking Update
-                    log_service.log(job_id, "order_workflow", "INFO", "[4/5] JTL → Tracking Update")
-                    tracking_result = self._step_4_tracking_to_db(job_id)
-                    
-                    # Wenn Fehler in Step 4, loggen wir, aber lassen Step 5 ggf. zu (falls Teilupdates möglich)
-                    if tracking_result.get('errors', 0) > 0:
-                         log_service.log(job_id, "order_workflow", "WARNING", f"⚠ [4/5] {tracking_result.get('errors')} Tracking Fehler")
-                    else:
-                         log_service.log(job_id, "order_workflow", "INFO", f"✓ [4/5] Tracking Update OK")
-
-                    # Step 5: Tracking → TEMU API
-                    log_service.log(job_id, "order_workflow", "INFO", "[5/5] Tracking → TEMU API")
-                    if not self._step_5_db_to_api(job_id):
-                        log_service.log(job_id, "order_workflow", "WARNING", "⚠ [5/5] API Upload fehlgeschlagen")
-                        # Hier kein 'raise', damit DB-Updates aus Step 4 (JTL->DB) trotzdem committet werden!
-                    else:
-                        log_service.log(job_id, "order_workflow", "INFO", "✓ [5/5] API Upload erfolgreich")
-
-            # HIER COMMIT für Block 2
+            self._retry_on_deadlock("4/5", self._run_tracking_step_4, job_id)
+
+            # Step 5: Tracking → TEMU API (Upload außerhalb jeder offenen Transaktion)
+            log_service.log(job_id, "order_workflow", "INFO", "[5/5] Tracking → TEMU API")
+            with log_service.step_timer("tracking_to_api"):
+                uploaded = self._step_5_db_to_api(job_id)
+            if not uploaded:
+                log_service.log(job_id, "order_workflow", "WARNING", "⚠ [5/5] API Upload fehlgeschlagen")
+            else:
+                log_service.log(job_id, "order_workflow", "INFO", "✓ [5/5] API Upload erfolgreich")
+            return True
             
         except Exception as e:
             # Fehler im Tracking-Block gefährdet nicht den Import-Block
-            workflow_success = False 
-            error_trace = traceback.format_exc()
             log_service.log(job_id, "order_workflow", "ERROR", f"✗ Tracking-Phase fehlgeschlagen: {str(e)}")
+            return False
         finally:
             self._cleanup_connections()
 
-        # Abschluss
-        duration = (datetime.now() - start_time).total_seconds()
-        status_msg = "erfolgreich" if workflow_success else "mit Fehlern beendet"
-        log_service.log(job_id, "order_workflow", "INFO", f"✓ Workflow {status_msg} ({duration:.1f}s)")
+    def _retry_on_deadlock(self, step: str, run_step, job_id: str, *args) -> None:
+        """
+        Führt eine Step-Transaktion aus und wiederholt sie bei Deadlock (1205) komplett.
+        SQL Server rollt das Opfer bereits zurück; Repositories/Services lassen nur Deadlocks
+        durch, alle anderen Fehler gehen unverändert an den Aufrufer.
+        """
+        for attempt in range(1, DEADLOCK_RETRIES + 1):
+            try:
+                run_step(job_id, *args)
+                return
+            except DBAPIError as e:
+                if attempt == DEADLOCK_RETRIES or not is_deadlock(e):
+                    raise
+                log_service.log(job_id, "order_workflow", "WARNING", 
+                              f"⚠ [{step}] Deadlock, Wiederholung {attempt}/{DEADLOCK_RETRIES - 1}")
+                time.sleep(attempt)
+            finally:
+                self._cleanup_connections()
+
+    def _run_import_step_2(self, job_id: str) -> None:
+        """Transaktion für Step 2 (JSON → TOCI)"""
+        with db_connect(DB_TOCI) as toci_conn:
+            self._toci_conn = toci_conn
+            
+            with db_connect(DB_JTL) as jtl_conn:
+                self._jtl_conn = jtl_conn
+
+                log_service.log(job_id, "order_workflow", "INFO", "[2/5] JSON → Datenbank")
+                with log_service.step_timer("json_to_db"):
+                    result = self._step_2_json_to_db(job_id)
+                log_service.log(job_id, "order_workflow", "INFO", 
+                              f"✓ [2/5] Import: {result.get('imported', 0)} neu, {result.get('updated', 0)} update")
+
+        # Zähler erst nach dem Commit (eine Wiederholung zählt nicht doppelt)
+        log_service.count("orders_imported", result.get('imported', 0))
+        log_service.count("orders_updated", result.get('updated', 0))
+
+    def _run_import_step_3(self, job_id: str, render_pool=None) -> None:
+        """Transaktion für Step 3 (TOCI → XML → JTL); render_pool wurde außerhalb gestartet"""
+        with db_connect(DB_TOCI) as toci_conn:
+            self._toci_conn = toci_conn
+            
+            with db_connect(DB_JTL) as jtl_conn:
+                self._jtl_conn = jtl_conn
+                self._get_xml_service().render_pool = render_pool
+                
+                log_service.log(job_id, "order_workflow", "INFO", "[3/5] Datenbank → XML Export")
+                with log_service.step_timer("db_to_xml"):
+                    xml_result = self._step_3_db_to_xml(job_id)
+                if not xml_result.get('success'):
+                    log_service.log(job_id, "order_workflow", "WARNING", f"⚠ [3/5] XML: {xml_result.get('message')}")
+                else:
+                    log_service.log(job_id, "order_workflow", "INFO", f"✓ [3/5] XML: {xml_result.get('exported', 0)} exportiert")
+
+        log_service.count("xml_exported", xml_result.get('exported', 0))
+
+    def _run_tracking_step_4(self, job_id: str) -> None:
+        """Kurze Transaktion nur für Step 4 (reine DB-Arbeit JTL → TOCI)"""
+        with db_connect(DB_TOCI) as toci_conn:
+            self._toci_conn = toci_conn
+            
+            with db_connect(DB_JTL) as jtl_conn:
+                self._jtl_conn = jtl_conn
         
-        log_service.end_job_capture(success=workflow_success, duration=duration)
-        return workflow_success
+                # Step 4: JTL → Tracking Update
+                log_service.log(job_id, "order_workflow", "INFO", "[4/5] JTL → Tracking Update")
+                with log_service.step_timer("tracking_to_db"):
+                    tracking_result = self._step_4_tracking_to_db(job_id)
+                
+                # Wenn Fehler in Step 4, loggen wir, aber lassen Step 5 ggf. zu (falls Teilupdates möglich)
+                if tracking_result.get('errors', 0) > 0:
+                     log_service.log(job_id, "order_workflow", "WARNING", f"⚠ [4/5] {tracking_result.get('errors')} Tracking Fehler")
+                else:
+                     log_service.log(job_id, "order_workflow", "INFO", f"✓ [4/5] Tracking Update OK")
+
+                if TEMU_PUSH_MODE == "outbox":
+                    # Tracking-Intents in derselben Transaktion wie das Tracking aus JTL
+                    self._enqueue_tracking_pushes(job_id)
+
+        # HIER COMMIT für Step 4 - Tracking ist gespeichert, bevor TEMU angefragt wird
 
     def _cleanup_connections(self):
         """Hilfsmethode zum Zurücksetzen der Referenzen"""
@@ -224,7 +325,8 @@ class OrderWorkflowService:
                 job_id=job_id
             )
         except Exception as e:
-            log_service.log(job_id, "json_to_db", "ERROR", f"Import Error: {e}")
+            if not is_deadlock(e):
+                log_service.log(job_id, "json_to_db", "ERROR", f"Import Error: {e}")
             raise # Re-raise für Rollback
 
     def _step_3_db_to_xml(self, job_id: str) -> Dict:
@@ -233,7 +335,8 @@ class OrderWorkflowService:
             # Nutzt automatisch die injizierten Repos aus __init__ (via _get_xml_service)
             return xml_srv.export_to_xml(save_to_disk=True, import_to_jtl=True, job_id=job_id)
         except Exception as e:
-            log_service.log(job_id, "db_to_xml", "ERROR", f"XML Error: {e}")
+            if not is_deadlock(e):
+                log_service.log(job_id, "db_to_xml", "ERROR", f"XML Error: {e}")
             raise
 
     def _step_4_tracking_to_db(self, job_id: str) -> Dict:
@@ -241,16 +344,26 @@ class OrderWorkflowService:
             tracking_srv = self._get_tracking_service()
             return tracking_srv.update_tracking_from_jtl(job_id)
         except Exception as e:
-            log_service.log(job_id, "tracking_to_db", "ERROR", f"Tracking Update Error: {e}")
+            if not is_deadlock(e):
+                log_service.log(job_id, "tracking_to_db", "ERROR", f"Tracking Update Error: {e}")
             raise
 
     def _step_5_db_to_api(self, job_id: str) -> bool:
+        """
+        Step 5: Snapshot lesen (kurze Transaktion) → Upload ohne Transaktion (Chunks, parallel) →
+        Bestätigungen pro Order in EINEM Bulk-Update schreiben. Ein langsamer TEMU Endpoint hält so keine Locks.
+        """
         try:
-            order_repo = self._get_order_repo()
             tracking_srv = self._get_tracking_service()
             temu_srv = self._get_temu_service()
+
+            if TEMU_PUSH_MODE == "outbox":
+                # Intents aus Step 4 senden, temu_gemeldet setzt der Dispatcher pro Order
+                result = PushOutboxService(temu_srv).drain(job_id=job_id, push_types=(PUSH_TRACKING,))
+                return result['failed'] == 0
             
-            orders_data = order_repo.get_orders_for_tracking_export()
+            with db_connect(DB_TOCI) as toci_conn:
+                orders_data = OrderRepository(connection=toci_conn).get_orders_for_tracking_export()
             if not orders_data:
                 return True
                 
@@ -258,16 +371,53 @@ class OrderWorkflowService:
             if not payload:
                 return True
                 
-            success, code, msg = temu_srv.upload_tracking(payload, job_id)
+            result = temu_srv.upload_tracking_items(payload, job_id)
+            
+            # Order gilt als gemeldet, wenn alle ihre Artikel durch sind - Fehler blockieren nur die eigene Order
+            failed_orders = {it['order_id'] for it in result['failed']}
+            reported = {it['order_id'] for it in result['succeeded']} - failed_orders
             
-            if success:
-                for o in orders_data:
-                    order_repo.update_temu_tracking_status(o['order_id'])
-            return success
+            if reported:
+                with db_connect(DB_TOCI) as toci_conn:
+                    OrderRepository(connection=toci_conn).mark_temu_tracking_reported(list(reported))
+            
+            if failed_orders:
+                log_service.log(job_id, "tracking_to_api", "WARNING", 
+                              f"⚠ {len(failed_orders)} Orders nicht gemeldet (Retry im nächsten Lauf): "
+                              f"{result['error_code']} {result['error_msg']}")
+            return not failed_orders
         except Exception as e:
             log_service.log(job_id, "tracking_to_api", "ERROR", f"Upload Error: {e}")
             return False # Hier kein Raise, damit DB-Updates (Tracking aus JTL) erhalten bleiben
 
+    def _compress_xml_exports(self, job_id: str) -> int:
+        """Migriert unkomprimierte temu_xml_export Zeilen batchweise (jeder Batch committet einzeln)"""
+        migrated = 0
+        try:
+            order_repo = OrderRepository()
+            if not order_repo.ensure_xml_export_compression():
+                return 0
+            for _ in range(XML_EXPORT_COMPRESS_MAX_BATCHES):
+                count = order_repo.compress_xml_exports(XML_EXPORT_COMPRESS_BATCH_SIZE)
+                migrated += count
+                if count < XML_EXPORT_COMPRESS_BATCH_SIZE:
+                    break
+            if migrated:
+                log_service.log(job_id, "order_workflow", "INFO", f"  ✓ {migrated} XML-Exporte komprimiert")
+        except Exception as e:
+            log_service.log(job_id, "order_workflow", "WARNING", f"⚠ XML-Komprimierung: {e}")
+        return migrated
+
+    def _enqueue_tracking_pushes(self, job_id: str) -> int:
+        """Reiht Tracking-Pushes für alle noch nicht gemeldeten Orders ein (Workflow-Transaktion)"""
+        orders_data = self._get_order_repo().get_orders_for_tracking_export()
+        if not orders_data:
+            return 0
+        payload = self._get_tracking_service().prepare_tracking_for_api(orders_data, job_id)
+        return PushOutboxService().enqueue_tracking(
+            OutboxRepository(connection=self._toci_conn), payload, job_id=job_id
+        )
+
     # --- LAZY LOADERS (Dependency Injection) ---
 
     def _get_order_repo(self):
@@ -300,7 +450,8 @@ class OrderWorkflowService:
     def _get_xml_service(self):
         if not self._xml_service:
             self._xml_service = XmlExportService(
-                self._get_order_repo(), self._get_item_repo(), self._get_jtl_repo()
+                self._get_order_repo(), self._get_item_repo(), self._get_jtl_repo(),
+                CustomerMirrorRepository(connection=self._toci_conn)
             )
         return self._xml_service
 
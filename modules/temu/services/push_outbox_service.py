@@ -0,0 +1,237 @@
+"""TEMU Push Outbox Service - Intents einreihen und parallel an TEMU dispatchen"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from modules.shared.config.settings import TEMU_APP_KEY, TEMU_APP_SECRET, TEMU_ACCESS_TOKEN, TEMU_API_ENDPOINT, DB_TOCI
+from modules.shared import log_service
+from modules.shared import db_connect
+from modules.shared.database.repositories.common.outbox_repository import OutboxRepository
+from modules.shared.database.repositories.temu.inventory_repository import InventoryRepository
+from modules.shared.database.repositories.temu.order_repository import OrderRepository
+from modules.shared.connectors.temu.service import TemuMarketplaceService
+from .config import OUTBOX_BATCH_SIZE, OUTBOX_DISPATCH_WORKERS, OUTBOX_MAX_ATTEMPTS
+
+PUSH_STOCK = 'stock'
+PUSH_TRACKING = 'tracking'
+
+
+class PushOutboxService:
+    """
+    Transactional Outbox für TEMU Pushes.
+    Workflows reihen Intents in ihrer DB-Transaktion ein (billig, rollt mit zurück),
+    der Dispatcher sendet sie außerhalb jeder Transaktion parallel und hält den Status pro Item.
+    """
+
+    def __init__(self, temu_service: TemuMarketplaceService | None = None,
+                 batch_size: int = OUTBOX_BATCH_SIZE,
+                 max_workers: int = OUTBOX_DISPATCH_WORKERS,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self._temu_service = temu_service
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+
+    # --- Enqueue (läuft in der Transaktion des Aufrufers) ---
+
+    def enqueue_stock(self, outbox_repo: OutboxRepository, deltas: List[Dict],
+                      job_id: Optional[str] = None) -> int:
+        """
+        Reiht Bestands-Pushes ein. Key = Inventory-ID + Zielbestand, d.h. ein unveränderter
+        Delta wird bei jedem Lauf dedupliziert, ein neuer Bestand ersetzt den alten Intent.
+        Dedupliziert wird nur gegen offene Intents: kehrt ein Bestand zu einem früher
+        gesendeten Wert zurück (5 -> 3 -> 5), entsteht ein neuer Intent.
+
+        Args:
+            outbox_repo: OutboxRepository auf der Workflow-Connection
+            deltas: Ergebnis von InventoryRepository.get_needs_sync()
+        """
+        intents = [
+            {
+                "ref_id": d["id"],
+                "ref_key": d["id"],
+                "idempotency_key": f"{PUSH_STOCK}:{d['id']}:{d['jtl_stock']}",
+                "payload": {
+                    "goods_id": d["goods_id"],
+                    "sku_id": d["sku_id"],
+                    "stock_target": d["jtl_stock"]
+                }
+            }
+            for d in deltas
+            if d.get("goods_id") and d.get("sku_id")
+        ]
+        return self._enqueue(outbox_repo, PUSH_STOCK, intents, job_id)
+
+    def enqueue_tracking(self, outbox_repo: OutboxRepository, tracking_data: List[Dict],
+                         job_id: Optional[str] = None) -> int:
+        """
+        Reiht Tracking-Pushes ein (ein Intent pro Bestellartikel). Key = orderSn + Trackingnummer,
+        ersetzt wird pro orderSn - die Intents der übrigen Artikel derselben Order bleiben offen.
+
+        Args:
+            outbox_repo: OutboxRepository auf der Workflow-Connection
+            tracking_data: Ergebnis von TrackingService.prepare_tracking_for_api()
+        """
+        intents = [
+            {
+                "ref_id": t["order_id"],
+                "ref_key": t["order_sn"],
+                "idempotency_key": f"{PUSH_TRACKING}:{t['order_sn']}:{t['tracking_number']}",
+                "payload": t
+            }
+            for t in tracking_data
+        ]
+        return self._enqueue(outbox_repo, PUSH_TRACKING, intents, job_id)
+
+    def _enqueue(self, outbox_repo: OutboxRepository, push_type: str, intents: List[Dict],
+                 job_id: Optional[str]) -> int:
+        if not intents:
+            return 0
+        outbox_repo.ensure_table_exists()
+        count = outbox_repo.enqueue(push_type, intents)
+        log_service.log(job_id, "push_outbox", "INFO", f"  → {count} {push_type} Intents in Outbox")
+        return count
+
+    def redrive_dead(self, push_type: str, ref_ids: Optional[List[int]] = None,
+                     job_id: Optional[str] = None) -> int:
+        """
+        Aufgegebene ('dead') Intents sofort erneut senden lassen. Ohne Redrive reiht der nächste
+        Workflow-Lauf denselben Wert neu ein; bis dahin halten tote Tracking-Intents temu_gemeldet zurück.
+        """
+        with db_connect(DB_TOCI) as toci_conn:
+            count = OutboxRepository(connection=toci_conn).redrive_dead(push_type, ref_ids)
+        log_service.log(job_id, "push_outbox", "INFO", f"✓ {count} {push_type} Intents re-driven")
+        return count
+
+    # --- Dispatch (außerhalb jeder Transaktion) ---
+
+    def drain(self, job_id: Optional[str] = None,
+              push_types: Sequence[str] = (PUSH_STOCK, PUSH_TRACKING)) -> Dict:
+        """
+        Leert alle fälligen Intents: Claim (kurze Transaktion) → paralleler API Upload →
+        Ergebnis + Folge-Updates (temu_stock / temu_gemeldet) in einer kurzen Transaktion.
+
+        Returns:
+            dict mit sent/failed
+        """
+        sent = 0
+        failed = 0
+
+        with db_connect(DB_TOCI) as toci_conn:
+            OutboxRepository(connection=toci_conn).ensure_table_exists()
+
+        for push_type in push_types:
+            while True:
+                with db_connect(DB_TOCI) as toci_conn:
+                    claimed = OutboxRepository(connection=toci_conn).claim_batch(push_type, limit=self.batch_size)
+                if not claimed:
+                    break
+
+                done, errors = self._dispatch(push_type, claimed, job_id)
+                self._record_results(push_type, done, errors, job_id)
+                sent += len(done)
+                failed += sum(len(items) for items, _ in errors)
+
+                if len(claimed) < self.batch_size:
+                    break
+
+        if sent or failed:
+            log_service.log(job_id, "push_outbox", "INFO",
+                            f"✓ Outbox: {sent} gesendet, {failed} fehlgeschlagen (Retry mit Backoff)")
+        return {'sent': sent, 'failed': failed}
+
+    def _dispatch(self, push_type: str, claimed: List[Dict],
+                  job_id: Optional[str]) -> Tuple[List[Dict], List[Tuple[List[Dict], str]]]:
+        """Gruppiert Intents pro API-Call und sendet die Gruppen parallel"""
+        groups: Dict = {}
+        for item in claimed:
+            payload = item["payload"]
+            key = payload["goods_id"] if push_type == PUSH_STOCK else payload["bestell_id"]
+            groups.setdefault(key, []).append(item)
+
+        send = self._send_stock_group if push_type == PUSH_STOCK else self._send_tracking_group
+
+        done: List[Dict] = []
+        errors: List[Tuple[List[Dict], str]] = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(send, key, items, job_id) for key, items in groups.items()]
+            for future in futures:
+                items, error = future.result()
+                if error is None:
+                    done.extend(items)
+                else:
+                    errors.append((items, error))
+
+        return done, errors
+
+    def _send_stock_group(self, goods_id: int, items: List[Dict],
+                          job_id: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """Ein goodsId = ein API-Call (wie StockSyncService.push_deltas)"""
+        payload_items = [
+            {
+                "goodsId": goods_id,
+                "skuId": it["payload"]["sku_id"],
+                "stockTarget": it["payload"]["stock_target"]
+            } for it in items
+        ]
+        try:
+            resp = self._get_temu_service().inventory_api.update_stock_target(
+                payload_items, stock_type=0, job_id=job_id
+            )
+            if resp and resp.get("success"):
+                return items, None
+            return items, str(resp)
+        except Exception as e:
+            return items, str(e)
+
+    def _send_tracking_group(self, bestell_id: str, items: List[Dict],
+                             job_id: Optional[str]) -> Tuple[List[Dict], Optional[str]]:
+        """Eine Bestellung = ein Upload, damit Erfolg/Fehler pro Bestellung eindeutig ist"""
+        try:
+            success, code, msg = self._get_temu_service().upload_tracking(
+                [it["payload"] for it in items], job_id
+            )
+            if success:
+                return items, None
+            return items, f"{code}: {msg}"
+        except Exception as e:
+            return items, str(e)
+
+    def _record_results(self, push_type: str, done: List[Dict],
+                        errors: List[Tuple[List[Dict], str]], job_id: Optional[str]) -> None:
+        """Status pro Item und Folge-Updates atomar in einer kurzen Transaktion schreiben"""
+        with db_connect(DB_TOCI) as toci_conn:
+            outbox_repo = OutboxRepository(connection=toci_conn)
+
+            outbox_repo.mark_done([it["id"] for it in done])
+            for items, error in errors:
+                outbox_repo.mark_failed([it["id"] for it in items], error, max_attempts=self.max_attempts)
+                log_service.log(job_id, "push_outbox", "WARNING",
+                                f"⚠ {len(items)} {push_type} Intents fehlgeschlagen: {error}")
+
+            if not done:
+                return
+
+            if push_type == PUSH_STOCK:
+                # temu_stock = gesendeter Wert (mark_synced lässt needs_sync stehen, falls JTL inzwischen abweicht)
+                InventoryRepository(connection=toci_conn).mark_synced([
+                    {"id": it["ref_id"], "temu_stock": it["payload"]["stock_target"]} for it in done
+                ])
+            else:
+                # Order erst als gemeldet markieren, wenn alle ihre Artikel durch sind
+                order_ids = list({it["ref_id"] for it in done})
+                open_refs = outbox_repo.get_open_refs(PUSH_TRACKING, order_ids)
+                OrderRepository(connection=toci_conn).mark_temu_tracking_reported(
+                    [oid for oid in order_ids if oid not in open_refs]
+                )
+
+    def _get_temu_service(self) -> TemuMarketplaceService:
+        if self._temu_service is None:
+            self._temu_service = TemuMarketplaceService(
+                app_key=TEMU_APP_KEY,
+                app_secret=TEMU_APP_SECRET,
+                access_token=TEMU_ACCESS_TOKEN,
+                endpoint=TEMU_API_ENDPOINT,
+            )
+        return self._temu_service
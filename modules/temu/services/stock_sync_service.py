@@ -13,6 +13,8 @@ class StockSyncService:
     def sync_deltas_to_temu(self, temu_inventory_api, inventory_repo, job_id: str) -> None:
         """
         Sendet Delta-Bestände an TEMU (nur needs_sync=1).
+        Liest, pusht und markiert mit demselben Repository (eine Transaktion).
+        Der Inventory Workflow nutzt stattdessen push_deltas mit getrennten kurzen Transaktionen.
         
         Args:
             temu_inventory_api: TemuInventoryApi Instanz
@@ -20,9 +22,28 @@ class StockSyncService:
             job_id: für Logging
         """
         deltas = inventory_repo.get_needs_sync()
+        updates = self.push_deltas(temu_inventory_api, deltas, job_id)
+        
+        if updates:
+            inventory_repo.mark_synced(updates)
+            log_service.log(job_id, "inventory_to_api", "INFO", 
+                          f"✓ {len(updates)} Bestände in DB aktualisiert")
+    
+    def push_deltas(self, temu_inventory_api, deltas: List[Dict], job_id: str) -> List[Dict]:
+        """
+        Sendet Deltas an TEMU, ohne die Datenbank anzufassen.
+        
+        Args:
+            temu_inventory_api: TemuInventoryApi Instanz
+            deltas: Ergebnis von InventoryRepository.get_needs_sync()
+            job_id: für Logging
+        
+        Returns:
+            Updates für InventoryRepository.mark_synced ([{'id': 1, 'temu_stock': 5}, ...])
+        """
         if not deltas:
             log_service.log(job_id, "inventory_to_api", "INFO", "Keine Deltas zu synchronisieren")
-            return
+            return []
         
         # Gruppiere nach goodsId (jede goodsId ein API-Call)
         by_goods_id: Dict[int, List] = {}
@@ -44,7 +65,7 @@ class StockSyncService:
             log_service.log(job_id, "inventory_to_api", "WARNING", 
                           f"Überspringe {skipped} Einträge ohne goods_id/sku_id")
         
-        synced_ids: List[int] = []
+        updates: List[Dict] = []
         
         # Sende Updates gruppiert
         for goods_id, items in by_goods_id.items():
@@ -59,26 +80,12 @@ class StockSyncService:
             resp = temu_inventory_api.update_stock_target(payload_items, stock_type=0, job_id=job_id)
             
             if resp and resp.get("success"):
-                synced_ids.extend([it["id"] for it in items])
+                # temu_stock = gesendeter Wert, damit er dem jtl_stock entspricht (sonst loop!)
+                updates.extend({"id": it["id"], "temu_stock": it["jtl_stock"]} for it in items)
                 log_service.log(job_id, "inventory_to_api", "INFO", 
                               f"✓ goodsId {goods_id}: {len(items)} SKUs aktualisiert")
             else:
                 log_service.log(job_id, "inventory_to_api", "ERROR", 
                               f"✗ goodsId {goods_id}: {resp}")
         
-        # Datenbank Update: Markiere erfolgreich gesendete als synchronisiert
-        if synced_ids:
-            # Wir müssen auch den temu_stock in unserer DB aktualisieren, 
-            # damit er dem jtl_stock entspricht (sonst loop!).
-            updates = [
-                {
-                    "id": d["id"], 
-                    "temu_stock": d["jtl_stock"]
-                } 
-                for d in deltas if d["id"] in synced_ids
-            ]
-            
-            inventory_repo.mark_synced(updates)
-            
-            log_service.log(job_id, "inventory_to_api", "INFO", 
-                          f"✓ {len(synced_ids)} Bestände in DB aktualisiert")
+        return updates
@@ -4,6 +4,8 @@ from typing import Dict, List, Optional
 from modules.shared.database.repositories.temu.order_repository import OrderRepository
 from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
 from modules.shared import log_service
+from modules.shared.database import is_deadlock
+from .config import TRACKING_IMPORT_ENGINE
 
 class TrackingService:
     """
@@ -39,6 +41,9 @@ class TrackingService:
                     'tracking_data': []
                 }
 
+            if TRACKING_IMPORT_ENGINE == "sql":
+                return self._update_tracking_set_based(job_id)
+
             log_service.log(job_id, "tracking_service", "INFO", 
                               "→ Hole Orders ohne Tracking...")
             
@@ -88,7 +93,7 @@ class TrackingService:
                     if success:
 
                         log_service.log(job_id, "tracking_service", "INFO", 
-                                      f"✓ {order.bestell_id}: {tracking_info['tracking_number']}")
+                                      f"✓ {order.bestell_id}: {tracking_info['tracking_number']}", aggregate="tracking_updated")
                         updated_count += 1
                     else:
 
@@ -97,6 +102,8 @@ class TrackingService:
                         error_count += 1
                 
                 except Exception as e:
+                    if is_deadlock(e):
+                        raise
 
                     log_service.log(job_id, "tracking_service", "ERROR", 
                                       f"✗ {order.bestell_id}: {str(e)}")
@@ -118,6 +125,9 @@ class TrackingService:
             }
         
         except Exception as e:
+            if is_deadlock(e):
+                # Transaktion wurde zurückgerollt - der Workflow wiederholt Step 4 als Ganzes
+                raise
             import traceback
             error_trace = traceback.format_exc()
             
@@ -133,6 +143,40 @@ class TrackingService:
                 'tracking_data': []
             }
     
+    def _update_tracking_set_based(self, job_id: Optional[str] = None) -> Dict:
+        """
+        Set-basierte Variante: ein Cross-DB UPDATE für alle offenen Orders.
+        Orders ohne Tracking in JTL bleiben einfach offen (kein Fehler); schlägt das UPDATE
+        fehl, meldet das Ergebnis success False und einen Fehler wie die Order-Variante.
+        """
+        log_service.log(job_id, "tracking_service", "INFO", 
+                          "→ Übernehme Tracking set-basiert aus JTL...")
+
+        updated_orders = self.order_repo.import_tracking_from_jtl_set_based()
+        if updated_orders is None:
+            log_service.log(job_id, "tracking_service", "ERROR", 
+                              "✗ Set-basierter Tracking-Import fehlgeschlagen")
+            return {
+                'updated': 0,
+                'errors': 1,
+                'success': False,
+                'tracking_data': []
+            }
+
+        for o in updated_orders:
+            log_service.log(job_id, "tracking_service", "INFO", 
+                          f"✓ {o['bestell_id']}: {o['trackingnummer']}", aggregate="tracking_updated")
+
+        log_service.log(job_id, "tracking_service", "INFO", 
+                          f"✓ Tracking-Sync: {len(updated_orders)} aktualisiert")
+
+        return {
+            'updated': len(updated_orders),
+            'errors': 0,
+            'success': True,
+            'tracking_data': updated_orders
+        }
+    
     def prepare_tracking_for_api(self, orders_data: List[Dict], job_id: Optional[str] = None) -> List[Dict]:
         """
         Konvertiere Tracking-Daten für TEMU API Format
@@ -175,6 +219,7 @@ class TrackingService:
                 # Für jeden Artikel
                 for item in order_data['items']:
                     tracking_data_for_api.append({
+                        'order_id': order_data.get('order_id'),
                         'bestell_id': bestell_id,
                         'order_sn': item['bestellartikel_id'],
                         'quantity': item['menge'],
@@ -0,0 +1,102 @@
+"""Stock Change Watcher - Event-getriebener Inventory Push bei JTL Bestandsänderungen"""
+
+import asyncio
+import time
+from typing import Callable, Optional
+
+from modules.shared.logging.log_service import log_service
+from modules.shared.database.repositories.jtl_common.jtl_repository import JtlRepository
+from modules.temu.services.config import (
+    JTL_STOCK_CHANGE_TABLES,
+    STOCK_WATCHER_DEBOUNCE_SECONDS,
+    STOCK_WATCHER_MAX_DELAY_SECONDS
+)
+
+
+class StockChangeWatcher:
+    """
+    Pollt alle paar Sekunden die JTL Change Tracking Version (praktisch kostenlos).
+    Nur wenn sie sich bewegt, wird geprüft ob Bestands-Tabellen betroffen sind.
+    Änderungen werden entprellt (Bursts zusammenfassen) und lösen einen Quick-Lauf
+    mit Change Feed aus, der nur die betroffenen SKUs abgleicht und pusht.
+    """
+
+    def __init__(self, is_enabled: Callable[[], bool] = None,
+                 debounce_seconds: int = STOCK_WATCHER_DEBOUNCE_SECONDS,
+                 max_delay_seconds: int = STOCK_WATCHER_MAX_DELAY_SECONDS):
+        """
+        Args:
+            is_enabled: Optional - Callback, ob der sync_inventory Job aktiv ist
+            debounce_seconds: Ruhezeit nach der letzten Änderung bis zum Push
+            max_delay_seconds: Spätester Push nach der ersten Änderung (bei Dauer-Änderungen)
+        """
+        self.is_enabled = is_enabled or (lambda: True)
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+        self._last_version: Optional[int] = None
+        self._first_change_at: Optional[float] = None
+        self._last_change_at: Optional[float] = None
+        self._push_running = False
+
+    async def poll(self):
+        """Ein Poll-Zyklus (wird vom Scheduler alle paar Sekunden aufgerufen)"""
+        if self._push_running or not self.is_enabled():
+            return
+
+        loop = asyncio.get_event_loop()
+        changed = await loop.run_in_executor(None, self._check_for_changes)
+
+        now = time.monotonic()
+        if changed:
+            self._last_change_at = now
+            if self._first_change_at is None:
+                self._first_change_at = now
+
+        if self._first_change_at is None:
+            return
+
+        quiet = now - self._last_change_at >= self.debounce_seconds
+        overdue = now - self._first_change_at >= self.max_delay_seconds
+        if quiet or overdue:
+            self._first_change_at = None
+            self._last_change_at = None
+            await self._push(loop)
+
+    def _check_for_changes(self) -> bool:
+        """True wenn seit dem letzten Poll Bestands-Tabellen in JTL geändert wurden"""
+        try:
+            jtl_repo = JtlRepository()
+            version = jtl_repo.get_change_tracking_version()
+            if version is None:
+                return False
+
+            # Erster Poll: nur Version merken, den Rest erledigt der Intervall-Job
+            if self._last_version is None or version == self._last_version:
+                self._last_version = version
+                return False
+
+            changed_ids = jtl_repo.get_changed_article_ids(self._last_version, JTL_STOCK_CHANGE_TABLES)
+            self._last_version = version
+
+            # None = Watermark ungültig -> sicherheitshalber pushen (Change Feed macht dann Vollabgleich)
+            return changed_ids is None or len(changed_ids) > 0
+
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "stock_change_watcher", "ERROR", f"StockChangeWatcher poll: {e}")
+            return False
+
+    async def _push(self, loop):
+        """Gezielter Push: Quick Mode mit Change Feed (nur geänderte Artikel)"""
+        self._push_running = True
+        try:
+            from modules.temu.services.inventory_workflow_service import InventoryWorkflowService
+            service = InventoryWorkflowService()
+            await loop.run_in_executor(
+                None,
+                lambda: service.run_complete_workflow(mode="quick", change_feed=True)
+            )
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "stock_change_watcher", "ERROR", f"StockChangeWatcher push: {e}")
+        finally:
+            self._push_running = False
@@ -5,12 +5,22 @@ from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 from typing import Dict, List
 import asyncio
+import contextvars
 import sys
 from pathlib import Path
 
 from workers.workers_config import WorkersConfig
 from workers.job_models import JobType, JobStatusEnum, JobConfig, JobSchedule  # ← KORRIGIERT: job_models statt jobs!
 from modules.shared.logging.log_service import log_service
+from modules.shared.config.settings import (
+    LOG_RETENTION_ENABLED, LOG_RETENTION_DAYS, LOG_RETENTION_MAX_BATCHES, LOG_RETENTION_INTERVAL_HOURS,
+    CUSTOMER_MIRROR_FULL_SYNC_HOURS
+)
+from modules.temu.services.config import (
+    STOCK_WATCHER_ENABLED, STOCK_WATCHER_POLL_SECONDS, TEMU_PUSH_MODE, OUTBOX_DISPATCH_SECONDS,
+    ORDER_ARCHIVE_ENABLED, ORDER_ARCHIVE_INTERVAL_HOURS
+)
+from workers.stock_change_watcher import StockChangeWatcher
 
 
 class SchedulerService:
@@ -82,9 +92,10 @@ class SchedulerService:
         return job_id
     
     async def _async_wrapper(self, sync_func, *args, **kwargs):
-        """Wrapper für synchrone Funktionen mit Arguments"""
+        """Wrapper für synchrone Funktionen mit Arguments (Job-Log-Kontext wird in den Thread übernommen)"""
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: sync_func(*args, **kwargs))
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(None, lambda: ctx.run(sync_func, *args, **kwargs))
     
     async def _run_job(self, job_id: str, parent_order_status: int = 2, 
                        days_back: int = 7, verbose: bool = False, 
@@ -96,7 +107,7 @@ class SchedulerService:
         job_type = self.jobs[job_id].job_type
         
         # ✅ Starte Log-Capturing in SQL Server
-        log_service.start_job_capture(job_id, job_type.value)
+        log_service.start_job_capture(job_id, job_type.value, verbose=verbose)
         
         try:
             # Füge root-Ordner zum Path hinzu (BEVOR wir importieren!)
@@ -149,8 +160,8 @@ class SchedulerService:
 
         
         finally:
-            # ✅ Aktualisiere recent_logs aus DB
-            self.job_logs[job_id] = log_service.get_recent_logs(job_id, 50)
+            # ✅ Aktualisiere recent_logs aus DB (flusht den Log-Writer -> im Thread, nicht auf dem Event Loop)
+            self.job_logs[job_id] = await asyncio.to_thread(log_service.get_recent_logs, job_id, 50)
             
             self.job_status[job_id]["last_run"] = start_time
             job = self.scheduler.get_job(job_id)
@@ -166,8 +177,109 @@ class SchedulerService:
     
     def start(self):
         """Starte Scheduler"""
+        if STOCK_WATCHER_ENABLED:
+            self._add_stock_watcher()
+        if TEMU_PUSH_MODE == "outbox":
+            self._add_outbox_dispatcher()
+        if ORDER_ARCHIVE_ENABLED:
+            self._add_order_archiver()
+        if LOG_RETENTION_ENABLED:
+            self._add_log_retention()
+        if CUSTOMER_MIRROR_FULL_SYNC_HOURS > 0:
+            self._add_customer_mirror_reconcile()
         self.scheduler.start()
     
+    def _add_stock_watcher(self):
+        """Registriert den Stock Change Watcher (pollt JTL, pusht Bestandsänderungen sofort)"""
+        watcher = StockChangeWatcher(is_enabled=self._is_inventory_sync_enabled)
+        self.scheduler.add_job(
+            watcher.poll,
+            trigger=IntervalTrigger(seconds=STOCK_WATCHER_POLL_SECONDS),
+            id="stock_change_watcher",
+            coalesce=True,
+            max_instances=1
+        )
+    
+    def _add_outbox_dispatcher(self):
+        """Registriert den Outbox Dispatcher (sendet fällige Retries, auch ohne laufenden Workflow)"""
+        self.scheduler.add_job(
+            self._drain_outbox,
+            trigger=IntervalTrigger(seconds=OUTBOX_DISPATCH_SECONDS),
+            id="temu_push_dispatcher",
+            coalesce=True,
+            max_instances=1
+        )
+    
+    async def _drain_outbox(self):
+        """Ein Dispatcher-Lauf im Executor (Claim mit READPAST, parallel zu Workflows sicher)"""
+        try:
+            from modules.temu.services.push_outbox_service import PushOutboxService
+            await self._async_wrapper(PushOutboxService().drain, job_id="temu_push_dispatcher")
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "push_outbox", "ERROR", f"Outbox Dispatcher: {e}")
+    
+    def _add_order_archiver(self):
+        """Registriert die Order-Archivierung (Wartungsjob, verschiebt abgeschlossene Orders ins Archiv)"""
+        self.scheduler.add_job(
+            self._archive_orders,
+            trigger=IntervalTrigger(hours=ORDER_ARCHIVE_INTERVAL_HOURS),
+            id="temu_order_archiver",
+            coalesce=True,
+            max_instances=1
+        )
+    
+    async def _archive_orders(self):
+        """Ein Archivierungs-Lauf im Executor (READPAST, parallel zu Workflows sicher)"""
+        try:
+            from modules.temu.services.order_archive_service import OrderArchiveService
+            await self._async_wrapper(OrderArchiveService().run, job_id="temu_order_archiver")
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "order_archive", "ERROR", f"Order Archivierung: {e}")
+    
+    def _add_log_retention(self):
+        """Registriert die Log-Retention (Wartungsjob, löscht alte scheduler_logs batchweise)"""
+        self.scheduler.add_job(
+            self._clean_logs,
+            trigger=IntervalTrigger(hours=LOG_RETENTION_INTERVAL_HOURS),
+            id="log_retention",
+            coalesce=True,
+            max_instances=1
+        )
+    
+    async def _clean_logs(self):
+        """Ein Retention-Lauf im Executor (kleine Batches mit Pausen, Inserts laufen weiter)"""
+        try:
+            await self._async_wrapper(
+                log_service.cleanup_old_logs, LOG_RETENTION_DAYS, max_batches=LOG_RETENTION_MAX_BATCHES
+            )
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "log_retention", "ERROR", f"Log Retention: {e}")
+    
+    def _add_customer_mirror_reconcile(self):
+        """Registriert den Voll-Abgleich des Kunden-Spiegels (Wartungsjob, stündlich geprüft, läuft wenn fällig)"""
+        self.scheduler.add_job(
+            self._reconcile_customer_mirror,
+            trigger=IntervalTrigger(hours=1),
+            id="customer_mirror_reconcile",
+            coalesce=True,
+            max_instances=1
+        )
+    
+    async def _reconcile_customer_mirror(self):
+        """Ein Voll-Abgleich im Executor (eigene Connections, Seiten committen einzeln)"""
+        try:
+            from modules.jtl.customer_mirror.customer_mirror_service import CustomerMirrorService
+            await self._async_wrapper(CustomerMirrorService.reconcile_if_due, job_id="customer_mirror_reconcile")
+        except Exception as e:
+            log_service.log("SYSTEM_ERROR", "customer_mirror", "ERROR", f"Kunden-Spiegel Voll-Abgleich: {e}")
+    
+    def _is_inventory_sync_enabled(self) -> bool:
+        """Watcher nur aktiv, wenn der sync_inventory Job aktiviert ist"""
+        return any(
+            cfg.job_type == JobType.SYNC_INVENTORY and cfg.schedule.enabled
+            for cfg in self.jobs.values()
+        )
+    
     def stop(self):
         """Stoppe Scheduler"""
         self.scheduler.shutdown()